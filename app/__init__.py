@@ -1,19 +1,50 @@
 import logging
 import logging.config
 import os
+from contextlib import asynccontextmanager
 
-from dotenv import load_dotenv
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.cors import CORSMiddleware
 
 from app.config import config as app_config
 from app.core.environment import get_environment
 from app.core.logger import get_logger
+from app.core.log_handlers import start_queue_logging
+from app.core.metrics import MetricsMiddleware
 
 from app.utils.file_system_utils import create_directory
 
-from app.routers.status_router import status_router
-from app.routers.incident_router import incident_router
+# Routers and services (which pull in LangChain) are imported when the app is
+# created, so that importing any app module for a script or a test stays cheap.
+
+@asynccontextmanager
+async def lifespan(app_: FastAPI):
+    """
+    Application lifespan: builds long-lived services once at startup, opens
+    connections to the LLM APIs, and starts the background job workers and incident
+    store writer until shutdown.
+
+    Args:
+        app_ (FastAPI): The FastAPI application instance.
+    """
+    from app.core.llm_http import warm_up_llm_http_clients
+    from app.services.incident_service import IncidentService
+    from app.services.incident_store_service import IncidentStoreService
+    from app.services.job_service import JobService
+
+    app_.state.incident_service = IncidentService()
+    # Runs in each worker: a pre-forking master builds the HTTP clients but opens no
+    # connection. Given up after LLM_HTTP_WARMUP_TIMEOUT, a slow API only delays startup that long.
+    await warm_up_llm_http_clients()
+    app_.state.incident_store_service = IncidentStoreService()
+    app_.state.incident_store_service.start()
+    app_.state.job_service = JobService(app_.state.incident_service, app_.state.incident_store_service)
+    app_.state.job_service.start()
+    yield
+    # In-flight requests have been answered; running jobs get JOB_DRAIN_TIMEOUT to finish
+    await app_.state.job_service.stop(app_config[get_environment()].JOB_DRAIN_TIMEOUT)
+    await app_.state.incident_store_service.stop()
 
 def create_app() -> FastAPI:
     """
@@ -40,6 +71,9 @@ def create_app() -> FastAPI:
             version=app_config[APP_ENVIRONMENT].APP_VERSION,
             docs_url=None if APP_ENVIRONMENT == "production" else "/docs",
             redoc_url=None if APP_ENVIRONMENT == "production" else "/redoc",
+            lifespan=lifespan,
+            # Responses are encoded with orjson, several times faster than json.dumps
+            default_response_class=ORJSONResponse,
         )
 
         # Register routers
@@ -72,8 +106,17 @@ def init_routers(
         ImportError: If an error occurs while importing or including routers.
     """
     try:
+        from app.routers.metrics_router import metrics_router
+        from app.routers.status_router import status_router
+        from app.routers.incident_router import incident_router
+        from app.routers.job_router import job_router
+        from app.routers.incident_store_router import incident_store_router
+
         app_.include_router(status_router)
+        app_.include_router(metrics_router)
         app_.include_router(incident_router)
+        app_.include_router(job_router)
+        app_.include_router(incident_store_router)
         logger.info("Registered routes for app!")
     except ImportError as e:
         logger.error(f"Error registering routes: {e}")
@@ -89,7 +132,8 @@ def make_middleware(
     Configure middleware for the FastAPI application.
 
     This function adds middleware to the FastAPI application, such as CORS middleware,
-    based on the application configuration for the current environment.
+    based on the application configuration for the current environment, and the
+    middleware timing requests for /metrics.
 
     Args:
         app_ (FastAPI): The FastAPI application instance.
@@ -107,6 +151,7 @@ def make_middleware(
             allow_methods=app_config[environment].ALLOWED_METHODS,
             allow_headers=app_config[environment].ALLOWED_HEADERS,
         )
+        app_.add_middleware(MetricsMiddleware)
         logger.info("Completed making middleware!")
     except ImportError as e:
         logger.error(f"An error occurred during making of middleware: {e}")
@@ -120,7 +165,8 @@ def register_logging(
     Configure logging for the application.
 
     This function sets up logging based on the application configuration for the current
-    environment, and ensures the log directory exists.
+    environment, and ensures the log directory exists. The handlers are then moved
+    behind a queue, so that requests never wait for console or file writes.
 
     Args:
         logger (logging.Logger): The logger instance for logging.
@@ -133,6 +179,10 @@ def register_logging(
         logging.config.dictConfig(app_config[environment].LOGGING)
         log_directory_path = os.environ.get("APP_LOGGING_DIR") or "logs"
         create_directory("", log_directory_path)
+        start_queue_logging(
+            logging.getLogger(app_config[environment].APP_NAME),
+            app_config[environment].LOG_QUEUE_MAX_SIZE
+        )
 
         logger.info("Logging configuration was successfully registered.")
         logger.info(f"Directory for logging created at: {log_directory_path}")
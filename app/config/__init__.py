@@ -1,16 +1,17 @@
 """ Configuration for app environment """
 
 from os import environ, path
-from typing import Final
+from typing import Final, Optional
 
 from dotenv import load_dotenv
 
-from app.config.llm_config import LLMConfig, OpenAIConfig
+# loading env vars from .env file, once for the whole app: every module reading
+# the environment imports this package first
+load_dotenv()
 
-basedir = path.abspath(path.join(path.dirname(__file__), '../../'))
+from app.config.llm_config import LLM_BACKENDS, LLMConfig
 
-# loading env vars from .env file
-load_dotenv()
+basedir = path.abspath(path.join(path.dirname(__file__), '../../'))
 
 class BaseConfig(object):
     """ Base config class. """
@@ -20,11 +21,103 @@ class BaseConfig(object):
     APP_NAME: Final = environ.get('APP_NAME') or 'LangChain LLM classifications demo'
     APP_DESCRIPTION: Final = "Description of technical interview"
 
+    # Production server (python server.py --production): pre-forked worker processes
+    SERVER_BIND: str = environ.get('APP_SERVER_BIND') or '0.0.0.0:8000'
+    SERVER_WORKERS: int = int(environ.get('APP_SERVER_WORKERS') or 0)  # Worker processes, 0 is one per available CPU
+    SERVER_GRACEFUL_TIMEOUT: int = int(environ.get('APP_SERVER_GRACEFUL_TIMEOUT') or 30)  # Seconds a worker has to shut down before it is killed
+
     # LLM configuration
-    LLM: LLMConfig = OpenAIConfig()
+    LLM_BACKEND: str = environ.get('APP_LLM_BACKEND') or 'openai'  # openai, fake or router
+    LLM: LLMConfig = LLM_BACKENDS[LLM_BACKEND]()
+    LLM_MAX_CONCURRENCY: int = int(environ.get('APP_LLM_MAX_CONCURRENCY') or 100)  # Concurrent LLM calls per worker
+    LLM_BATCH_MAX_CONCURRENCY: int = int(environ.get('APP_LLM_BATCH_MAX_CONCURRENCY') or 10)  # Default concurrency of a batch
+    LLM_BATCH_MAX_SIZE: int = int(environ.get('APP_LLM_BATCH_MAX_SIZE') or 1000)  # Maximum incident reports per batch request
+    STREAM_MAX_LINE_BYTES: int = int(environ.get('APP_STREAM_MAX_LINE_BYTES') or 1048576)  # Maximum length of an incident report in an NDJSON stream
+
+    # Shared HTTP clients of the OpenAI-compatible backends (see app.core.llm_http)
+    LLM_HTTP_MAX_CONNECTIONS: int = int(environ.get('APP_LLM_HTTP_MAX_CONNECTIONS') or 100)  # Per worker and client
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(environ.get('APP_LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS') or 100)  # Idle connections kept open
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = float(environ.get('APP_LLM_HTTP_KEEPALIVE_EXPIRY') or 60)  # Seconds before an idle connection is closed
+    LLM_HTTP_CONNECT_TIMEOUT: float = float(environ.get('APP_LLM_HTTP_CONNECT_TIMEOUT') or 5)  # Seconds
+    LLM_HTTP_READ_TIMEOUT: float = float(environ.get('APP_LLM_HTTP_READ_TIMEOUT') or 60)  # Seconds between two received chunks
+    LLM_HTTP_WRITE_TIMEOUT: float = float(environ.get('APP_LLM_HTTP_WRITE_TIMEOUT') or 10)  # Seconds
+    LLM_HTTP_POOL_TIMEOUT: float = float(environ.get('APP_LLM_HTTP_POOL_TIMEOUT') or 10)  # Seconds waiting for a pooled connection
+    LLM_HTTP2: str = (environ.get('APP_LLM_HTTP2') or 'auto').lower()  # auto (if the h2 package is installed), true or false
+    LLM_HTTP_WARMUP_CONNECTIONS: int = int(environ.get('APP_LLM_HTTP_WARMUP_CONNECTIONS') or 2)  # Opened per API origin at startup, 0 disables
+    LLM_HTTP_WARMUP_TIMEOUT: float = float(environ.get('APP_LLM_HTTP_WARMUP_TIMEOUT') or 2)  # Seconds the startup waits for the warm-up
+
+    # LLM rate limits of the server, shared equally by its workers: calls exceeding them
+    # wait in a queue by priority, 0 is unlimited
+    LLM_REQUESTS_PER_MINUTE: int = int(environ.get('APP_LLM_REQUESTS_PER_MINUTE') or 0)
+    LLM_TOKENS_PER_MINUTE: int = int(environ.get('APP_LLM_TOKENS_PER_MINUTE') or 0)
+    LLM_MIN_CONCURRENCY: int = int(environ.get('APP_LLM_MIN_CONCURRENCY') or 1)  # Lower bound when backing off on HTTP 429
+    LLM_RATE_LIMIT_RETRIES: int = int(environ.get('APP_LLM_RATE_LIMIT_RETRIES') or 2)  # Requeues of a call rejected with HTTP 429
+
+    # Retries of LLM calls failing with a timeout or server error, with jittered exponential backoff
+    LLM_RETRY_MAX_ATTEMPTS: int = int(environ.get('APP_LLM_RETRY_MAX_ATTEMPTS') or 3)
+    LLM_RETRY_BASE_DELAY: float = float(environ.get('APP_LLM_RETRY_BASE_DELAY') or 0.5)  # Seconds, doubled at each retry
+    LLM_RETRY_MAX_DELAY: float = float(environ.get('APP_LLM_RETRY_MAX_DELAY') or 8)  # Seconds
+    LLM_RETRY_DEADLINE: float = float(environ.get('APP_LLM_RETRY_DEADLINE') or 60)  # Seconds for all attempts, queueing included, 0 is none
+    # Ask the LLM again, with a short prompt, for the fields whose values cannot be snapped to the schema
+    LLM_REPAIR_PROMPT_ENABLED: bool = (environ.get('APP_LLM_REPAIR_PROMPT_ENABLED') or 'true').lower() == 'true'
+
+    # Number of most similar few-shot examples included in each prompt
+    FEW_SHOT_EXAMPLES_K: int = int(environ.get('APP_FEW_SHOT_EXAMPLES_K') or 4)
+
+    # Incident report fields rendered in prompts (dotted paths, * is all) and their format: json or text
+    PROMPT_INCIDENT_FIELDS: str = environ.get('APP_PROMPT_INCIDENT_FIELDS') or 'incident_datetime,location,description,witnesses.name'
+    PROMPT_FORMAT: str = environ.get('APP_PROMPT_FORMAT') or 'json'
 
-    # Logging
+    # Token budget of a call (prompt and completion), 0 is unlimited: examples are dropped, then descriptions truncated
+    PROMPT_MAX_TOKENS: int = int(environ.get('APP_PROMPT_MAX_TOKENS') or 4096)
+    PROMPT_TOKENIZER: str = environ.get('APP_PROMPT_TOKENIZER') or ''  # tiktoken encoding (e.g. o200k_base) if available offline, else estimated
+
+    # Local pre-classifier skipping the LLM for high-confidence cases
+    LOCAL_CLASSIFIER_ENABLED: bool = (environ.get('APP_LOCAL_CLASSIFIER_ENABLED') or 'true').lower() == 'true'
+    LOCAL_CLASSIFIER_THRESHOLD: float = float(environ.get('APP_LOCAL_CLASSIFIER_THRESHOLD') or 0.9)
+    LOCAL_CLASSIFIER_MODEL_PATH: Optional[str] = environ.get('APP_LOCAL_CLASSIFIER_MODEL_PATH')  # Trained weights (.npz), optional
+
+    # Classification cache
+    CLASSIFICATION_CACHE_BACKEND: str = environ.get('APP_CLASSIFICATION_CACHE_BACKEND') or 'memory'  # memory, sqlite or none
+    CLASSIFICATION_CACHE_MAX_ENTRIES: int = int(environ.get('APP_CLASSIFICATION_CACHE_MAX_ENTRIES') or 10000)
+    CLASSIFICATION_CACHE_TTL: int = int(environ.get('APP_CLASSIFICATION_CACHE_TTL') or 86400)  # Seconds
+    CLASSIFICATION_CACHE_PATH: str = environ.get('APP_CLASSIFICATION_CACHE_PATH') or path.join(basedir, 'cache', 'classifications.sqlite3')
+
+    # Near-duplicate detection: reports similar to one classified recently reuse its classification
+    # Off by default: a small wording change ("no fire" / "fire") can flip the severity
+    NEAR_DUPLICATE_ENABLED: bool = (environ.get('APP_NEAR_DUPLICATE_ENABLED') or 'false').lower() == 'true'
+    NEAR_DUPLICATE_THRESHOLD: float = float(environ.get('APP_NEAR_DUPLICATE_THRESHOLD') or 0.8)  # Minimum estimated Jaccard similarity
+    NEAR_DUPLICATE_WINDOW: int = int(environ.get('APP_NEAR_DUPLICATE_WINDOW') or 3600)  # Seconds
+    NEAR_DUPLICATE_MAX_ENTRIES: int = int(environ.get('APP_NEAR_DUPLICATE_MAX_ENTRIES') or 10000)
+
+    # Asynchronous job API: queued classifications done by a pool of background workers
+    JOB_QUEUE_BACKEND: str = environ.get('APP_JOB_QUEUE_BACKEND') or 'memory'  # memory or sqlite (survives restarts)
+    JOB_QUEUE_PATH: str = environ.get('APP_JOB_QUEUE_PATH') or path.join(basedir, 'cache', 'jobs.sqlite3')
+    JOB_QUEUE_MAX_SIZE: int = int(environ.get('APP_JOB_QUEUE_MAX_SIZE') or 10000)  # Queued jobs before new ones are rejected, 0 is unlimited
+    JOB_WORKERS: int = int(environ.get('APP_JOB_WORKERS') or 16)  # Jobs classified concurrently per worker process
+    JOB_RESULT_TTL: int = int(environ.get('APP_JOB_RESULT_TTL') or 86400)  # Seconds finished jobs can be polled
+    JOB_CALLBACK_TIMEOUT: float = float(environ.get('APP_JOB_CALLBACK_TIMEOUT') or 10)  # Seconds
+    JOB_CALLBACK_ATTEMPTS: int = int(environ.get('APP_JOB_CALLBACK_ATTEMPTS') or 3)
+    # Comma-separated hosts (and their subdomains) callbacks may be posted to. Empty allows any
+    # host whose addresses are all public, not private, loopback or link-local ones
+    JOB_CALLBACK_ALLOWED_HOSTS: str = environ.get('APP_JOB_CALLBACK_ALLOWED_HOSTS') or ''
+    JOB_STALE_TIMEOUT: float = float(environ.get('APP_JOB_STALE_TIMEOUT') or 900)  # Seconds a job may run before it is queued again, its worker presumed lost
+    JOB_DRAIN_TIMEOUT: float = float(environ.get('APP_JOB_DRAIN_TIMEOUT') or 10)  # Seconds running jobs have to finish at shutdown
+
+    # Store of classified incident reports for analytics, written in batches off the request path
+    # Off by default: rows hold the whole report, witness contacts included
+    INCIDENT_STORE_BACKEND: str = environ.get('APP_INCIDENT_STORE_BACKEND') or 'none'  # sqlite or none
+    INCIDENT_STORE_PATH: str = environ.get('APP_INCIDENT_STORE_PATH') or path.join(basedir, 'data', 'incidents.sqlite3')
+    INCIDENT_STORE_BATCH_SIZE: int = int(environ.get('APP_INCIDENT_STORE_BATCH_SIZE') or 500)  # Rows per transaction
+    INCIDENT_STORE_FLUSH_INTERVAL: float = float(environ.get('APP_INCIDENT_STORE_FLUSH_INTERVAL') or 1.0)  # Seconds
+    INCIDENT_STORE_MAX_PENDING: int = int(environ.get('APP_INCIDENT_STORE_MAX_PENDING') or 50000)  # Rows buffered before new ones are dropped
+
+    # Logging: records are written by a background thread (see app.core.log_handlers)
     LOG_INFO_FILE: str = path.join(basedir, 'logs', 'info.log')
+    LOG_FORMAT: str = environ.get('APP_LOG_FORMAT') or 'text'  # text or json (JSON lines)
+    LOG_PAYLOAD_SAMPLE_RATE: float = float(environ.get('APP_LOG_PAYLOAD_SAMPLE_RATE') or 1.0)  # Fraction of per-request payload logs kept
+    LOG_PAYLOAD_MAX_PER_SECOND: float = float(environ.get('APP_LOG_PAYLOAD_MAX_PER_SECOND') or 10)  # 0 is unlimited
+    LOG_QUEUE_MAX_SIZE: int = int(environ.get('APP_LOG_QUEUE_MAX_SIZE') or 10000)  # Queued records before new ones are dropped
     LOGGING: dict = {
         'version': 1,
         'disable_existing_loggers': False,
@@ -36,19 +129,29 @@ class BaseConfig(object):
             'simple': {
                 'format': '%(levelname)s - %(message)s'
             },
+            'json': {
+                '()': 'app.core.log_handlers.JsonFormatter'
+            },
+        },
+        'filters': {
+            'payload_sampling': {
+                '()': 'app.core.log_handlers.SamplingFilter',
+                'sample_rate': LOG_PAYLOAD_SAMPLE_RATE,
+                'max_per_second': LOG_PAYLOAD_MAX_PER_SECOND
+            },
         },
         'handlers': {
             'console': {
                 'level': 'INFO',
                 'class': 'logging.StreamHandler',  # Add StreamHandler for console output, this is important for Docker
-                'formatter': 'simple'
+                'formatter': 'json' if LOG_FORMAT == 'json' else 'simple'
             },
             'log_info_file': {
                 'level': 'INFO',
                 'class': 'logging.handlers.RotatingFileHandler',
                 'filename': LOG_INFO_FILE,
                 'maxBytes': 16777216,  # 16 megabytes
-                'formatter': 'standard',
+                'formatter': 'json' if LOG_FORMAT == 'json' else 'standard',
                 'backupCount': 5
             },
         },
@@ -57,6 +160,9 @@ class BaseConfig(object):
                 'level': 'DEBUG',
                 'handlers': ['console', 'log_info_file'],  # Add console handler
             },
+            f'{APP_NAME}.payload': {  # Per-request payloads (LLM responses), sampled
+                'filters': ['payload_sampling'],
+            },
         },
     }
 
@@ -1,25 +1,155 @@
-""" LLM configuration. """
+""" LLM configuration.
 
+The LLM clients, and the LangChain and OpenAI modules behind them, are only
+imported and built on first use of LLMConfig.llm, so that importing the
+configuration stays cheap and other backends need no OpenAI settings.
+"""
+
+from abc import ABC, abstractmethod
+import json
 import os
-from dotenv import load_dotenv
 
-from langchain_openai import ChatOpenAI
+def _shared_http_kwargs(base_url, api_key) -> dict:
+    """ ChatOpenAI arguments sending its requests through the shared, pooled HTTP clients. """
+    # Imported late, like the LLM modules: app.core.llm_http reads this configuration
+    from app.core.llm_http import get_llm_http_clients, get_llm_http_timeout, register_llm_origin
 
-load_dotenv()
+    register_llm_origin(base_url, api_key)
+    http_client, http_async_client = get_llm_http_clients()
+    return {
+        "http_client": http_client,
+        "http_async_client": http_async_client,
+        # Without it, the OpenAI client would apply no timeout at all
+        "request_timeout": get_llm_http_timeout(),
+    }
 
-class LLMConfig(object):
+class LLMConfig(ABC):
     """ Backend LLM configuration parameters. """
-    pass
+    _llm = None
+
+    @property
+    def llm(self):
+        """ The chat model of the backend, built on first use. """
+        if self._llm is None:
+            self._llm = self._build_llm()
+        return self._llm
+
+    @abstractmethod
+    def _build_llm(self):
+        """ Build the chat model of the backend. """
 
 class OpenAIConfig(LLMConfig):
     """ Configuration for OpenAI LLM. """
     OPENAI_API_KEY = os.getenv('APP_OPENAI_API_KEY')
     OPENAI_ORGANIZATION = os.getenv('APP_OPENAI_ORGANIZATION')
     OPENAI_LLM_MODEL = os.getenv('APP_OPENAI_LLM_MODEL')
+    OPENAI_BASE_URL = os.getenv('APP_OPENAI_BASE_URL') or None  # OpenAI-compatible API, OpenAI's by default
+
+    def _build_llm(self):
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(
+            api_key=self.OPENAI_API_KEY,
+            organization=self.OPENAI_ORGANIZATION,
+            model=self.OPENAI_LLM_MODEL,
+            base_url=self.OPENAI_BASE_URL,
+            temperature=0,
+            **_shared_http_kwargs(self.OPENAI_BASE_URL, self.OPENAI_API_KEY)
+        )
+
+class FakeLLMConfig(LLMConfig):
+    """ Configuration for the local fake LLM, used for load tests and benchmarks. """
+    FAKE_LLM_LATENCY_DISTRIBUTION = os.getenv('APP_FAKE_LLM_LATENCY_DISTRIBUTION') or 'lognormal'
+    FAKE_LLM_LATENCY_MS = float(os.getenv('APP_FAKE_LLM_LATENCY_MS') or 200)  # Mean latency
+    FAKE_LLM_LATENCY_JITTER = float(os.getenv('APP_FAKE_LLM_LATENCY_JITTER') or 0.5)
+    FAKE_LLM_ERROR_RATE = float(os.getenv('APP_FAKE_LLM_ERROR_RATE') or 0)
+    FAKE_LLM_INVALID_OUTPUT_RATE = float(os.getenv('APP_FAKE_LLM_INVALID_OUTPUT_RATE') or 0)
+    FAKE_LLM_REQUESTS_PER_MINUTE = int(os.getenv('APP_FAKE_LLM_REQUESTS_PER_MINUTE') or 0)
+    FAKE_LLM_SEED = int(os.getenv('APP_FAKE_LLM_SEED') or 0)
+
+    def _build_llm(self):
+        from app.core.fake_llm import FakeChatModel
+
+        return FakeChatModel(
+            latency_distribution=self.FAKE_LLM_LATENCY_DISTRIBUTION,
+            latency_mean=self.FAKE_LLM_LATENCY_MS / 1000,
+            latency_jitter=self.FAKE_LLM_LATENCY_JITTER,
+            error_rate=self.FAKE_LLM_ERROR_RATE,
+            invalid_output_rate=self.FAKE_LLM_INVALID_OUTPUT_RATE,
+            requests_per_minute=self.FAKE_LLM_REQUESTS_PER_MINUTE,
+            seed=self.FAKE_LLM_SEED
+        )
+
+class RouterLLMConfig(LLMConfig):
+    """
+    Configuration for routing LLM calls over several backends, with failover, hedged
+    requests and a circuit breaker per backend.
+
+    APP_LLM_ROUTER_BACKENDS is a JSON list of backends, e.g.
+    [{"provider": "openai", "model": "gpt-4o-mini", "weight": 3},
+     {"provider": "openai", "model": "gpt-4o-mini", "base_url": "https://...", "api_key_env": "APP_AZURE_KEY"},
+     {"provider": "fake", "latency_mean": 0.1}]
+    """
+    LLM_ROUTER_BACKENDS = os.getenv('APP_LLM_ROUTER_BACKENDS') or '[]'
+    LLM_ROUTER_HEDGE_PERCENTILE = float(os.getenv('APP_LLM_ROUTER_HEDGE_PERCENTILE') or 0.95)  # 0 disables hedging
+    LLM_ROUTER_TIMEOUT = float(os.getenv('APP_LLM_ROUTER_TIMEOUT') or 60)  # Seconds per backend call
+    # Threads of the synchronous calls, as many as the LLM calls allowed at the same time
+    LLM_ROUTER_MAX_CONCURRENCY = int(os.getenv('APP_LLM_MAX_CONCURRENCY') or 100)
+    LLM_ROUTER_FAILURE_THRESHOLD = int(os.getenv('APP_LLM_ROUTER_FAILURE_THRESHOLD') or 5)
+    LLM_ROUTER_RESET_TIMEOUT = float(os.getenv('APP_LLM_ROUTER_RESET_TIMEOUT') or 30)  # Seconds
+
+    def _build_llm(self):
+        # Also imported late because the router logs through app.core.logger, which
+        # reads the configuration being defined here
+        from app.core.llm_router import RoutedChatModel
+
+        backends = [self._build_backend(index, spec) for index, spec in enumerate(json.loads(self.LLM_ROUTER_BACKENDS))]
+        if not backends:
+            raise ValueError("APP_LLM_ROUTER_BACKENDS must list at least one backend")
+        return RoutedChatModel(
+            backends=backends,
+            hedge_percentile=self.LLM_ROUTER_HEDGE_PERCENTILE,
+            timeout=self.LLM_ROUTER_TIMEOUT,
+            max_concurrency=self.LLM_ROUTER_MAX_CONCURRENCY
+        )
+
+    def _build_backend(self, index: int, spec: dict):
+        """ Build a RouterBackend from its JSON specification. """
+        from app.core.fake_llm import FakeChatModel
+        from app.core.llm_router import RouterBackend
+
+        spec = dict(spec)
+        provider = spec.pop('provider', 'openai')
+        weight = float(spec.pop('weight', 1))
+        name = spec.pop('name', None)
+        if provider == 'openai':
+            from langchain_openai import ChatOpenAI
+
+            api_key = os.getenv(spec.get('api_key_env') or 'APP_OPENAI_API_KEY')
+            llm = ChatOpenAI(
+                api_key=api_key,
+                organization=os.getenv('APP_OPENAI_ORGANIZATION'),
+                model=spec['model'],
+                base_url=spec.get('base_url'),
+                temperature=0,
+                **_shared_http_kwargs(spec.get('base_url'), api_key)
+            )
+            name = name or f"{spec['model']}@{spec.get('base_url') or 'openai'}"
+        elif provider == 'fake':
+            llm = FakeChatModel(**spec)
+            name = name or f"fake-{index}"
+        else:
+            raise ValueError(f"Unknown LLM router provider: {provider}")
+        return RouterBackend(
+            name,
+            llm,
+            weight=weight,
+            failure_threshold=self.LLM_ROUTER_FAILURE_THRESHOLD,
+            reset_timeout=self.LLM_ROUTER_RESET_TIMEOUT
+        )
 
-    llm = ChatOpenAI(
-        api_key=OPENAI_API_KEY,
-        organization=OPENAI_ORGANIZATION,
-        model=OPENAI_LLM_MODEL,
-        temperature=0
-    )
+LLM_BACKENDS = {
+    'openai': OpenAIConfig,
+    'fake': FakeLLMConfig,
+    'router': RouterLLMConfig,
+}
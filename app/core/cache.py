@@ -0,0 +1,263 @@
+"""Key-value caches with LRU and TTL eviction.
+
+This module provides the backends used to cache classifications of incident reports.
+Values are JSON-serializable dictionaries stored under string keys.
+
+Classes:
+- CacheBackend: Interface shared by all cache backends, with hit/miss counters.
+- InMemoryCache: Process-local LRU cache with per-entry TTL.
+- SQLiteCache: LRU cache with per-entry TTL persisted in a local SQLite file.
+
+Functions:
+- create_cache: Build the cache backend selected by name.
+"""
+
+from collections import OrderedDict
+from typing import Optional
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app.core.logger import get_logger
+logger = get_logger(__name__)
+
+class CacheBackend(object):
+    """ Interface for caches of JSON-serializable values. """
+
+    name = "none"
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        """
+        Parameters:
+        - max_entries (int): Maximum number of entries before least recently used
+                             entries are evicted.
+        - ttl_seconds (float): Time to live of an entry, in seconds.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # The async methods of I/O backends run get in threads
+        self._counters_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        """ Returns the cached value for key, or None if it is missing or expired. """
+        value = self._get(key)
+        with self._counters_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: dict) -> None:
+        """ Stores value under key, evicting the least recently used entries if full. """
+        self._set(key, value)
+
+    async def aget(self, key: str) -> Optional[dict]:
+        """ Asynchronous get, for backends doing I/O. Runs get inline by default. """
+        return self.get(key)
+
+    async def aset(self, key: str, value: dict) -> None:
+        """ Asynchronous set, for backends doing I/O. Runs set inline by default. """
+        self.set(key, value)
+
+    def stats(self) -> dict:
+        """ Returns the counters of the cache. """
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self),
+        }
+
+    def _get(self, key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: dict) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+class InMemoryCache(CacheBackend):
+    """ Process-local LRU cache with per-entry TTL. """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        super().__init__(max_entries, ttl_seconds)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteCache(CacheBackend):
+    """
+    LRU cache with per-entry TTL persisted in a local SQLite file.
+
+    Entries survive restarts. Entries written under another namespace (e.g. a
+    previous schema or example set, or another process sharing the file with a
+    different configuration) are never read; they are left to expire or to be
+    evicted as least recently used. Expired entries are purged when the cache is opened.
+
+    The number of entries is tracked incrementally and only recounted when it exceeds
+    max_entries; the least recently used entries are then evicted in a batch, down to
+    a few percent below max_entries, so that inserts do not scan the table. The async
+    methods run the queries in a thread, off the event loop.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float, namespace: str = ""):
+        """
+        Parameters:
+        - path (str): Path of the SQLite database file.
+        - max_entries (int): Maximum number of entries before least recently used
+                             entries are evicted.
+        - ttl_seconds (float): Time to live of an entry, in seconds.
+        - namespace (str): Only entries stored under this namespace are read.
+        """
+        super().__init__(max_entries, ttl_seconds)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)")
+        purged = self._connection.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        if purged:
+            logger.info(f"Purged {purged} expired entries from classification cache at {path}")
+        self.namespace = namespace
+        # Evicted at once when full, so that the table is only counted once per batch
+        self.eviction_batch = max(1, max_entries // 20)
+        # Estimate: other processes sharing the file are only seen when recounting
+        self._size = self._count()
+
+    def _get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ? AND namespace = ?", (key, self.namespace)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._size -= self._connection.execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount
+                return None
+            self._connection.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def _set(self, key: str, value: dict) -> None:
+        now = time.time()
+        row = (self.namespace, json.dumps(value), now + self.ttl_seconds, now, key)
+        with self._lock:
+            # Updating first tells new keys apart, which grow the entry count
+            updated = self._connection.execute(
+                "UPDATE cache SET namespace = ?, value = ?, expires_at = ?, last_access = ? WHERE key = ?", row
+            ).rowcount
+            if updated:
+                return
+            self._connection.execute(
+                "INSERT OR REPLACE INTO cache (namespace, value, expires_at, last_access, key) "
+                "VALUES (?, ?, ?, ?, ?)", row
+            )
+            self._size += 1
+            if self._size > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        """ Evict the least recently used entries down to max_entries - eviction_batch. """
+        self._size = self._count()
+        overflow = self._size - max(self.max_entries - self.eviction_batch, 0)
+        if self._size > self.max_entries and overflow > 0:
+            evicted = self._connection.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY last_access LIMIT ?)", (overflow,)
+            ).rowcount
+            self._size -= evicted
+            self.evictions += evicted
+
+    async def aget(self, key: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: dict) -> None:
+        await asyncio.to_thread(self.set, key, value)
+
+    def _count(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._size
+
+def create_cache(
+    backend: str,
+    max_entries: int,
+    ttl_seconds: float,
+    path: Optional[str] = None,
+    namespace: str = ""
+) -> Optional[CacheBackend]:
+    """
+    Build the cache backend selected by name.
+
+    Parameters:
+    - backend (str): One of "memory", "sqlite" or "none".
+    - max_entries (int): Maximum number of entries in the cache.
+    - ttl_seconds (float): Time to live of an entry, in seconds.
+    - path (str, optional): Database file, required by the "sqlite" backend.
+    - namespace (str): Namespace of the entries, used by persistent backends to
+                       ignore entries written by an incompatible configuration.
+
+    Returns:
+    - Optional[CacheBackend]: The cache, or None if caching is disabled.
+
+    Raises:
+    - ValueError: If the backend is unknown.
+    """
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return InMemoryCache(max_entries, ttl_seconds)
+    if backend == "sqlite":
+        return SQLiteCache(path, max_entries, ttl_seconds, namespace)
+    raise ValueError(f"Unknown cache backend: {backend}")
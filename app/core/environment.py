@@ -1,8 +1,9 @@
 from os import environ
-from dotenv import load_dotenv
-
-load_dotenv()
 
 def get_environment() -> str:
     """ Gets application environment """
     return environ.get('APP_ENV') or 'development'
+
+def get_worker_processes() -> int:
+    """ Gets the number of worker processes serving the app, set by the production server """
+    return int(environ.get('APP_SERVER_WORKER_PROCESSES') or 1)
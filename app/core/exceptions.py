@@ -1,41 +1,134 @@
-"""Utility functions for handling exceptions with logging.
+"""Utility functions and types for handling exceptions with logging.
 
-This module provides functions for raising HTTP exceptions with logging capabilities.
+This module provides functions for raising HTTP exceptions with logging capabilities,
+and the typed errors of the classification path with the HTTP status they map to.
+
+Classes:
+- ClassificationError: Base of the classification errors, unexpected ones (500).
+- LLMTimeoutError: The LLM did not answer in time (504).
+- LLMRateLimitedError: The LLM provider's rate limits were reached (429).
+- LLMInvalidOutputError: The LLM answered with no valid classification (422).
+- LLMUpstreamError: The LLM provider failed or is unreachable (503).
 
 Functions:
 - raise_with_log: Wrapper function for logging and raising HTTP exceptions.
 - runner_info: Retrieve information about the caller of a function.
+- to_classification_error: Map any exception of the classification path to a typed error.
 """
 
-import inspect
+import asyncio
+import sys
+from typing import Dict, Optional
+
+from fastapi import status
 from fastapi.exceptions import HTTPException
+from langchain_core.exceptions import OutputParserException
+from langchain_core.pydantic_v1 import ValidationError
+
+from app.core import metrics
 
 from app.core.logger import get_logger
 logger = get_logger(__name__)
 
-def raise_with_log(status_code: int, detail: str) -> None:
+class ClassificationError(Exception):
+    """ An incident report could not be classified, for an unexpected reason. """
+    kind = "unknown"
+    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    detail = "Could not classify incident report."
+
+    def __init__(self, message: str = "", headers: Optional[Dict[str, str]] = None):
+        super().__init__(message or self.detail)
+        self.headers = headers
+
+class LLMTimeoutError(ClassificationError):
+    """ The LLM did not answer in time. """
+    kind = "timeout"
+    status_code = status.HTTP_504_GATEWAY_TIMEOUT
+    detail = "The language model did not answer in time."
+
+class LLMRateLimitedError(ClassificationError):
+    """ The LLM provider rejected the call because of its rate limits. """
+    kind = "rate_limited"
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    detail = "Too many classifications at the moment, please retry later."
+
+class LLMInvalidOutputError(ClassificationError):
+    """ The LLM answered without a valid classification. """
+    kind = "invalid_output"
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    detail = "Could not classify incident report."
+
+class LLMUpstreamError(ClassificationError):
+    """ The LLM provider failed or could not be reached. """
+    kind = "upstream"
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    detail = "The language model is unavailable, please retry later."
+
+def to_classification_error(error: BaseException) -> ClassificationError:
+    """
+    Map an exception raised while classifying to a typed ClassificationError.
+
+    Parameters:
+    - error (BaseException): The exception.
+
+    Returns:
+    - ClassificationError: The typed error, error itself if it already is one. Only
+      the parsing and validation errors of the LLM output are invalid outputs (422):
+      any other error, e.g. a ValueError of a bug, is unexpected (500).
+    """
+    if isinstance(error, ClassificationError):
+        return error
+    # The OpenAI client is only imported with an OpenAI backend, and cannot have raised otherwise
+    openai = sys.modules.get("openai")
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)) or (
+        openai is not None and isinstance(error, openai.APITimeoutError)
+    ):
+        return LLMTimeoutError(str(error))
+
+    status_code = getattr(error, "status_code", None)
+    if status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        return LLMRateLimitedError(str(error), headers={"Retry-After": retry_after} if retry_after else None)
+    if (openai is not None and isinstance(error, openai.APIConnectionError)) or (
+        isinstance(status_code, int) and status_code >= 500
+    ):
+        return LLMUpstreamError(str(error))
+    if isinstance(error, (OutputParserException, ValidationError)):
+        return LLMInvalidOutputError(str(error))
+    return ClassificationError(str(error))
+
+def raise_with_log(status_code: int, detail: str, headers: Optional[Dict[str, str]] = None) -> None:
     """
     Wrapper function for logging and raising exceptions.
 
     Parameters:
     - status_code (int): The HTTP status code of the exception.
     - detail (str): A detailed message describing the exception.
+    - headers (Dict[str, str], optional): Headers of the response, e.g. Retry-After.
 
     Raises:
     - HTTPException: An HTTP exception with the specified status code and detail message.
     """
-
-    desc = f"<HTTPException status_code={status_code} detail={detail}>"
-    logger.info(f"{desc} | runner={runner_info()}")
-    raise HTTPException(status_code, detail)
+    metrics.HTTP_ERRORS.labels(str(status_code)).inc()
+    logger.info("<HTTPException status_code=%s detail=%s> | runner=%s", status_code, detail, runner_info())
+    raise HTTPException(status_code, detail, headers=headers)
 
 def runner_info() -> str:
     """
     Retrieve information about the caller of the function.
 
+    The caller is the first frame outside of this module, whichever function of the
+    module is called. Frames are walked from sys._getframe, which only touches the
+    frames it skips, unlike inspect.stack() which reads the source of every frame.
+
     Returns:
     - str: A    string containing information about the caller's filename,
                 function name, and line number.
     """
-    info = inspect.getframeinfo(inspect.stack()[2][0])
-    return f"{info.filename}:{info.function}:{info.lineno}"
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_filename == __file__:
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    return f"{frame.f_code.co_filename}:{frame.f_code.co_name}:{frame.f_lineno}"
@@ -0,0 +1,170 @@
+""" Deterministic fake chat model.
+
+This module provides a local stand-in for the OpenAI chat model, used to measure the
+overhead of the service itself without network access or API costs. It answers every
+structured output request with a valid tool call for the bound schema, after a
+simulated latency, and fails a configurable fraction of the calls. A requests-per-minute
+quota can be simulated, rejecting calls above it like OpenAI does (HTTP 429).
+
+Classes:
+- FakeLLMError: Simulated LLM failure.
+- FakeRateLimitError: Simulated rate limit rejection.
+- FakeChatModel: Chat model returning schema-valid tool calls.
+"""
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import uuid
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.pydantic_v1 import PrivateAttr
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "exponential", "lognormal")
+
+class FakeLLMError(RuntimeError):
+    """ Simulated failure of an LLM call, answered like a server error. """
+    status_code = 500
+
+class FakeRateLimitError(FakeLLMError):
+    """ Simulated rejection of an LLM call above the quota. """
+    status_code = 429
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model answering tool-calling requests locally.
+
+    The tool call arguments depend only on the last message, so identical reports
+    always get identical classifications. Latencies and failures are drawn from a
+    random generator seeded with seed.
+    """
+    model_name: str = "fake-incident-classifier"
+    latency_distribution: str = "lognormal"  # One of LATENCY_DISTRIBUTIONS
+    latency_mean: float = 0.2  # Seconds
+    latency_jitter: float = 0.5  # Relative spread (uniform) or sigma (lognormal)
+    error_rate: float = 0.0  # Fraction of failed calls
+    invalid_output_rate: float = 0.0  # Fraction of answers with a misspelled or missing field
+    requests_per_minute: int = 0  # Simulated quota, 0 is unlimited
+    seed: Optional[int] = None
+
+    _random: random.Random = PrivateAttr()
+    _request_times: Deque[float] = PrivateAttr(default_factory=deque)
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown latency distribution {self.latency_distribution!r}, "
+                f"expected one of {', '.join(LATENCY_DISTRIBUTIONS)}"
+            )
+        self._random = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any):
+        """ Bind tools in the OpenAI format, as ChatOpenAI does. """
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _sample_latency(self) -> float:
+        """ Draw the latency of a call in seconds. """
+        mean = self.latency_mean
+        if self.latency_distribution == "uniform":
+            return self._random.uniform(mean * (1 - self.latency_jitter), mean * (1 + self.latency_jitter))
+        if self.latency_distribution == "exponential":
+            return self._random.expovariate(1 / mean) if mean > 0 else 0.0
+        if self.latency_distribution == "lognormal" and mean > 0:
+            sigma = self.latency_jitter
+            return self._random.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+        return mean
+
+    def _corrupt(self, args: Dict[str, Any]) -> None:
+        """ Misspell the value of one field (half of the time) or leave it out. """
+        name = self._random.choice(list(args))
+        if self._random.random() < 0.5:
+            args[name] = args[name].upper()[:-1]
+        else:
+            del args[name]
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[dict]]) -> ChatResult:
+        """
+        Build the response to messages: a tool call for the first bound tool.
+
+        Raises:
+        - FakeRateLimitError: If the call exceeds the requests-per-minute quota.
+        - FakeLLMError: For a fraction error_rate of the calls.
+        """
+        if self.requests_per_minute:
+            now = time.monotonic()
+            while self._request_times and self._request_times[0] <= now - 60:
+                self._request_times.popleft()
+            if len(self._request_times) >= self.requests_per_minute:
+                raise FakeRateLimitError("Simulated rate limit reached")
+            self._request_times.append(now)
+
+        if self._random.random() < self.error_rate:
+            raise FakeLLMError("Simulated LLM failure")
+
+        prompt = messages[-1].content if messages else ""
+        digest = hashlib.sha256(str(prompt).encode()).digest()
+
+        tool_calls = []
+        args: Dict[str, Any] = {}
+        if tools:
+            function = tools[0]["function"]
+            properties = function.get("parameters", {}).get("properties", {})
+            for position, (name, schema) in enumerate(properties.items()):
+                choices = schema.get("enum")
+                args[name] = choices[digest[position % len(digest)] % len(choices)] if choices else "unknown"
+            if args and self._random.random() < self.invalid_output_rate:
+                self._corrupt(args)
+            tool_calls.append({"name": function["name"], "args": args, "id": f"call_{uuid.uuid4().hex}"})
+
+        # Roughly four characters per token
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4 + 1
+        output_tokens = len(json.dumps(args)) // 4 + 1
+        message = AIMessage(
+            content="",
+            tool_calls=tool_calls,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        tools: Optional[List[dict]] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        time.sleep(self._sample_latency())
+        return self._respond(messages, tools)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        tools: Optional[List[dict]] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        await asyncio.sleep(self._sample_latency())
+        return self._respond(messages, tools)
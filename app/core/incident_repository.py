@@ -0,0 +1,287 @@
+"""Storage of classified incident reports for analytics.
+
+This module provides the repositories storing incident reports with their
+classification, and the queries behind the dashboards: filtered listing with
+keyset pagination and aggregate counts. Rows are written in batches.
+
+Classes:
+- IncidentRepository: Interface shared by all incident repositories.
+- SQLiteIncidentRepository: Repository in a local SQLite file.
+
+Functions:
+- build_incident_row: Build the row of a classified incident report.
+- create_incident_repository: Build the incident repository selected by name.
+- encode_cursor: Encode the position of a row as an opaque pagination cursor.
+- decode_cursor: Decode a pagination cursor.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app.core.logger import get_logger
+logger = get_logger(__name__)
+
+# Columns incidents can be filtered and counted by
+FILTER_COLUMNS = ("language", "urgency", "breach", "category", "asset")
+
+# Groupings of the aggregate counts: a column, or the day of the incident
+GROUP_BY_EXPRESSIONS = {
+    **{column: column for column in FILTER_COLUMNS},
+    "day": "substr(incident_datetime, 1, 10)",
+}
+
+ROW_COLUMNS = (
+    "id", "incident_datetime", "location", "description", "report",
+    "language", "urgency", "breach", "category", "asset", "stored_at"
+)
+
+def to_sortable_datetime(value: datetime) -> str:
+    """
+    Format a datetime as fixed-width ISO 8601 in UTC (naive datetimes are taken as
+    UTC), so that stored datetimes compare correctly as text.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+def encode_cursor(incident_datetime: str, row_id: int) -> str:
+    """ Encode the sort key of a row as an opaque, URL-safe pagination cursor. """
+    return base64.urlsafe_b64encode(f"{incident_datetime}|{row_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Decode a pagination cursor into the sort key of the last row of a page.
+
+    Raises:
+    - ValueError: If the cursor is malformed.
+    """
+    try:
+        incident_datetime, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return incident_datetime, int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+class IncidentRepository(object):
+    """
+    Interface for stores of classified incident reports. A row is a dictionary with
+    the keys of ROW_COLUMNS except id; report is the JSON of the incident report.
+    """
+
+    name = "none"
+
+    def add_many(self, rows: Sequence[dict]) -> None:
+        """ Store rows in a single transaction. """
+        raise NotImplementedError
+
+    def list(
+        self,
+        filters: Dict[str, str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        List incidents, most recent incident_datetime first.
+
+        Parameters:
+        - filters (Dict[str, str]): Required values by column of FILTER_COLUMNS.
+        - since (datetime, optional): Earliest incident_datetime, inclusive.
+        - until (datetime, optional): Latest incident_datetime, exclusive.
+        - limit (int): Maximum number of incidents.
+        - cursor (str, optional): next_cursor of the previous page.
+
+        Returns:
+        - Tuple[List[dict], Optional[str]]: The page of incidents, and the cursor of
+          the next page, None on the last page.
+        """
+        raise NotImplementedError
+
+    def count(
+        self,
+        group_by: str,
+        filters: Dict[str, str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> List[Tuple[str, int]]:
+        """
+        Count incidents by a key of GROUP_BY_EXPRESSIONS, largest counts first, or in
+        chronological order by day.
+        """
+        raise NotImplementedError
+
+class SQLiteIncidentRepository(IncidentRepository):
+    """
+    Incident repository in a local SQLite file.
+
+    Listing pages by (incident_datetime, id) from the cursor instead of an OFFSET,
+    so every page costs the same however deep it is. The urgency, category and
+    asset columns, the common dashboard filters, have an index on (column,
+    incident_datetime, id) serving both the filter and the order.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        """
+        Parameters:
+        - path (str): Path of the SQLite database file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Batches are written and queries read on separate connections, so that WAL
+        # readers do not wait for a batch being written
+        self._write_lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._writer = sqlite3.connect(path, check_same_thread=False)
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.execute("PRAGMA synchronous=NORMAL")
+        self._writer.execute(
+            """
+            CREATE TABLE IF NOT EXISTS incidents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                incident_datetime TEXT NOT NULL,
+                location TEXT NOT NULL,
+                description TEXT NOT NULL,
+                report TEXT NOT NULL,
+                language TEXT,
+                urgency TEXT,
+                breach TEXT,
+                category TEXT,
+                asset TEXT,
+                stored_at REAL NOT NULL
+            )
+            """
+        )
+        self._writer.execute(
+            "CREATE INDEX IF NOT EXISTS incidents_datetime ON incidents (incident_datetime, id)"
+        )
+        for column in ("urgency", "category", "asset"):
+            self._writer.execute(
+                f"CREATE INDEX IF NOT EXISTS incidents_{column} ON incidents ({column}, incident_datetime, id)"
+            )
+        self._writer.commit()
+        self._reader = sqlite3.connect(path, check_same_thread=False)
+
+    def add_many(self, rows: Sequence[dict]) -> None:
+        columns = ROW_COLUMNS[1:]
+        with self._write_lock, self._writer:
+            self._writer.executemany(
+                f"INSERT INTO incidents ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [tuple(row[column] for column in columns) for row in rows]
+            )
+
+    def list(
+        self,
+        filters: Dict[str, str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        where, parameters = self._where(filters, since, until)
+        if cursor is not None:
+            where.append("(incident_datetime, id) < (?, ?)")
+            parameters.extend(decode_cursor(cursor))
+        query = (
+            f"SELECT {', '.join(ROW_COLUMNS)} FROM incidents"
+            f"{' WHERE ' + ' AND '.join(where) if where else ''}"
+            " ORDER BY incident_datetime DESC, id DESC LIMIT ?"
+        )
+        with self._read_lock:
+            rows = self._reader.execute(query, (*parameters, limit + 1)).fetchall()
+
+        incidents = [dict(zip(ROW_COLUMNS, row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = incidents[-1]
+            next_cursor = encode_cursor(last["incident_datetime"], last["id"])
+        return incidents, next_cursor
+
+    def count(
+        self,
+        group_by: str,
+        filters: Dict[str, str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> List[Tuple[str, int]]:
+        expression = GROUP_BY_EXPRESSIONS[group_by]
+        where, parameters = self._where(filters, since, until)
+        query = (
+            f"SELECT {expression} AS value, COUNT(*) AS count FROM incidents"
+            f"{' WHERE ' + ' AND '.join(where) if where else ''}"
+            f" GROUP BY value ORDER BY {'value' if group_by == 'day' else 'count DESC, value'}"
+        )
+        with self._read_lock:
+            return self._reader.execute(query, parameters).fetchall()
+
+    @staticmethod
+    def _where(
+        filters: Dict[str, str],
+        since: Optional[datetime],
+        until: Optional[datetime]
+    ) -> Tuple[List[str], list]:
+        """ Build the WHERE conditions and their parameters of the filters. """
+        where = []
+        parameters: list = []
+        for column, value in filters.items():
+            if column not in FILTER_COLUMNS:
+                raise ValueError(f"Unknown filter: {column}")
+            where.append(f"{column} = ?")
+            parameters.append(value)
+        if since is not None:
+            where.append("incident_datetime >= ?")
+            parameters.append(to_sortable_datetime(since))
+        if until is not None:
+            where.append("incident_datetime < ?")
+            parameters.append(to_sortable_datetime(until))
+        return where, parameters
+
+def build_incident_row(incident_report: dict, incident_datetime: datetime, classification: dict) -> dict:
+    """
+    Build the row of a classified incident report.
+
+    Parameters:
+    - incident_report (dict): The incident report, JSON-serializable.
+    - incident_datetime (datetime): The datetime of the incident.
+    - classification (dict): The classification of the incident report.
+
+    Returns:
+    - dict: The row, for IncidentRepository.add_many.
+    """
+    return {
+        "incident_datetime": to_sortable_datetime(incident_datetime),
+        "location": incident_report["location"],
+        "description": incident_report["description"],
+        "report": json.dumps(incident_report),
+        **{column: classification.get(column) for column in FILTER_COLUMNS},
+        "stored_at": time.time(),
+    }
+
+def create_incident_repository(backend: str, path: Optional[str] = None) -> Optional[IncidentRepository]:
+    """
+    Build the incident repository selected by name.
+
+    Parameters:
+    - backend (str): One of "sqlite" or "none".
+    - path (str, optional): Database file, required by the "sqlite" backend.
+
+    Returns:
+    - Optional[IncidentRepository]: The repository, or None if storage is disabled.
+
+    Raises:
+    - ValueError: If the backend is unknown.
+    """
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        return SQLiteIncidentRepository(path)
+    raise ValueError(f"Unknown incident store backend: {backend}")
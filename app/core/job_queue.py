@@ -0,0 +1,470 @@
+"""Queues of classification jobs.
+
+This module provides the backends holding the jobs of the asynchronous job API:
+incident reports waiting to be classified, being classified, and their results.
+Jobs are claimed by priority, then in submission order. Finished jobs are kept for
+a time to live so that clients can poll their result. Jobs running for longer than
+a worker could take (e.g. their worker crashed) can be queued again.
+
+Classes:
+- JobQueue: Interface shared by all job queue backends.
+- InMemoryJobQueue: Process-local queue, lost on restart.
+- SQLiteJobQueue: Queue persisted in a local SQLite file, surviving restarts.
+
+Functions:
+- create_job_queue: Build the job queue backend selected by name.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from app.core.logger import get_logger
+logger = get_logger(__name__)
+
+# Job statuses, in lifecycle order
+JOB_STATUSES = ("queued", "running", "succeeded", "failed")
+
+class JobQueue(object):
+    """
+    Interface for queues of jobs. A job is a dictionary with the keys id, status,
+    priority, payload, callback_url, result, error, status_code, created_at,
+    started_at and finished_at (seconds since the epoch).
+    """
+
+    name = "none"
+
+    def __init__(self, max_size: int, result_ttl: float):
+        """
+        Parameters:
+        - max_size (int): Maximum number of queued jobs, 0 is unlimited.
+        - result_ttl (float): Seconds finished jobs are kept for polling.
+        """
+        self.max_size = max_size
+        self.result_ttl = result_ttl
+
+    def put(self, job_id: str, payload: dict, priority: int = 0, callback_url: Optional[str] = None) -> dict:
+        """
+        Queue a job.
+
+        Returns:
+        - dict: The queued job.
+
+        Raises:
+        - OverflowError: If max_size jobs are already queued.
+        """
+        raise NotImplementedError
+
+    def claim(self) -> Optional[dict]:
+        """ Mark the next queued job as running and return it, None if no job is queued. """
+        raise NotImplementedError
+
+    def finish(
+        self,
+        job_id: str,
+        result: Optional[dict] = None,
+        error: Optional[str] = None,
+        status_code: Optional[int] = None
+    ) -> Optional[dict]:
+        """
+        Record the result of a running job, or its error if result is None.
+
+        Returns:
+        - Optional[dict]: The finished job, None if it no longer exists.
+        """
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """ Returns the job, None if it does not exist or has expired. """
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        """ Returns the number of jobs by status. """
+        raise NotImplementedError
+
+    def requeue_stale(self, running_for: float) -> int:
+        """
+        Queue again the jobs running for more than running_for seconds, whose worker
+        is presumed lost, and returns their number.
+        """
+        raise NotImplementedError
+
+    async def aput(self, job_id: str, payload: dict, priority: int = 0, callback_url: Optional[str] = None) -> dict:
+        """ Asynchronous put, for backends doing I/O. Runs put inline by default. """
+        return self.put(job_id, payload, priority, callback_url)
+
+    async def aclaim(self) -> Optional[dict]:
+        """ Asynchronous claim, for backends doing I/O. Runs claim inline by default. """
+        return self.claim()
+
+    async def afinish(
+        self,
+        job_id: str,
+        result: Optional[dict] = None,
+        error: Optional[str] = None,
+        status_code: Optional[int] = None
+    ) -> Optional[dict]:
+        """ Asynchronous finish, for backends doing I/O. Runs finish inline by default. """
+        return self.finish(job_id, result, error, status_code)
+
+    async def aget(self, job_id: str) -> Optional[dict]:
+        """ Asynchronous get, for backends doing I/O. Runs get inline by default. """
+        return self.get(job_id)
+
+    async def acounts(self) -> Dict[str, int]:
+        """ Asynchronous counts, for backends doing I/O. Runs counts inline by default. """
+        return self.counts()
+
+    async def arequeue_stale(self, running_for: float) -> int:
+        """ Asynchronous requeue_stale, for backends doing I/O. Runs it inline by default. """
+        return self.requeue_stale(running_for)
+
+    def _check_size(self, queued: int) -> None:
+        if self.max_size and queued >= self.max_size:
+            raise OverflowError(f"The job queue is full ({self.max_size} jobs)")
+
+    @staticmethod
+    def _new_job(job_id: str, payload: dict, priority: int, callback_url: Optional[str]) -> dict:
+        return {
+            "id": job_id,
+            "status": "queued",
+            "priority": priority,
+            "payload": payload,
+            "callback_url": callback_url,
+            "result": None,
+            "error": None,
+            "status_code": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+
+class InMemoryJobQueue(JobQueue):
+    """ Process-local job queue. Queued and finished jobs are lost on restart. """
+
+    name = "memory"
+
+    def __init__(self, max_size: int, result_ttl: float):
+        super().__init__(max_size, result_ttl)
+        self._jobs: Dict[str, dict] = {}
+        self._queued: List[Tuple[int, int, str]] = []  # Heap of (-priority, sequence, job id)
+        self._finished: List[Tuple[float, str]] = []  # Heap of (finished_at, job id)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def put(self, job_id: str, payload: dict, priority: int = 0, callback_url: Optional[str] = None) -> dict:
+        with self._lock:
+            self._purge()
+            self._check_size(len(self._queued))
+            job = self._new_job(job_id, payload, priority, callback_url)
+            self._jobs[job_id] = job
+            heapq.heappush(self._queued, (-priority, next(self._sequence), job_id))
+            return dict(job)
+
+    def claim(self) -> Optional[dict]:
+        with self._lock:
+            while self._queued:
+                job = self._jobs.get(heapq.heappop(self._queued)[2])
+                # Queued again as stale, then finished by its first worker after all
+                if job is None or job["status"] != "queued":
+                    continue
+                job["status"] = "running"
+                job["started_at"] = time.time()
+                return dict(job)
+            return None
+
+    def finish(
+        self,
+        job_id: str,
+        result: Optional[dict] = None,
+        error: Optional[str] = None,
+        status_code: Optional[int] = None
+    ) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(
+                status="failed" if result is None else "succeeded",
+                result=result,
+                error=error,
+                status_code=status_code,
+                finished_at=time.time()
+            )
+            heapq.heappush(self._finished, (job["finished_at"], job_id))
+            return dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict.fromkeys(JOB_STATUSES, 0)
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+            return counts
+
+    def requeue_stale(self, running_for: float) -> int:
+        started_before = time.time() - running_for
+        with self._lock:
+            stale = [
+                job for job in self._jobs.values()
+                if job["status"] == "running" and job["started_at"] <= started_before
+            ]
+            for job in stale:
+                job.update(status="queued", started_at=None)
+                heapq.heappush(self._queued, (-job["priority"], next(self._sequence), job["id"]))
+            return len(stale)
+
+    def _purge(self) -> None:
+        """ Drop the jobs finished more than result_ttl seconds ago. """
+        expired_before = time.time() - self.result_ttl
+        while self._finished and self._finished[0][0] <= expired_before:
+            self._jobs.pop(heapq.heappop(self._finished)[1], None)
+
+class SQLiteJobQueue(JobQueue):
+    """
+    Job queue persisted in a local SQLite file.
+
+    Queued jobs survive restarts. Jobs that were running when the process stopped
+    are queued again when the queue is opened. Several processes (e.g. server
+    workers) can share the file: each job is claimed by exactly one of them, and a
+    process opening the queue only queues again the jobs of processes that are gone.
+    The async methods run the queries in a thread, off the event loop.
+    """
+
+    name = "sqlite"
+
+    _COLUMNS = (
+        "id", "status", "priority", "payload", "callback_url", "result", "error",
+        "status_code", "created_at", "started_at", "finished_at"
+    )
+
+    def __init__(self, path: str, max_size: int, result_ttl: float):
+        """
+        Parameters:
+        - path (str): Path of the SQLite database file.
+        - max_size (int): Maximum number of queued jobs, 0 is unlimited.
+        - result_ttl (float): Seconds finished jobs are kept for polling.
+        """
+        super().__init__(max_size, result_ttl)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                callback_url TEXT,
+                result TEXT,
+                error TEXT,
+                status_code INTEGER,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                claimed_by INTEGER
+            )
+            """
+        )
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(jobs)")}
+        if "claimed_by" not in columns:  # Queue files created before claims recorded the process
+            self._connection.execute("ALTER TABLE jobs ADD COLUMN claimed_by INTEGER")
+        # Claims scan the queued jobs by priority and submission order only
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (priority DESC, seq) WHERE status = 'queued'"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)")
+        with self._lock:
+            requeued = self._requeue_interrupted()
+        if requeued:
+            logger.info(f"Queued again {requeued} interrupted jobs from {path}")
+
+    def put(self, job_id: str, payload: dict, priority: int = 0, callback_url: Optional[str] = None) -> dict:
+        job = self._new_job(job_id, payload, priority, callback_url)
+        with self._lock:
+            self._purge()
+            self._check_size(self._count("queued"))
+            self._connection.execute(
+                "INSERT INTO jobs (id, status, priority, payload, callback_url, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, "queued", priority, json.dumps(payload), callback_url, job["created_at"])
+            )
+        return job
+
+    def claim(self) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            while True:
+                row = self._connection.execute(
+                    f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE status = 'queued' "
+                    "ORDER BY priority DESC, seq LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                # Another process may have claimed the job since the select
+                claimed = self._connection.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ?, claimed_by = ? "
+                    "WHERE id = ? AND status = 'queued'",
+                    (now, os.getpid(), row[0])
+                ).rowcount
+                if claimed:
+                    break
+        job = self._to_job(row)
+        job.update(status="running", started_at=now)
+        return job
+
+    def finish(
+        self,
+        job_id: str,
+        result: Optional[dict] = None,
+        error: Optional[str] = None,
+        status_code: Optional[int] = None
+    ) -> Optional[dict]:
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, status_code = ?, finished_at = ? WHERE id = ?",
+                (
+                    "failed" if result is None else "succeeded",
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    status_code,
+                    time.time(),
+                    job_id
+                )
+            )
+            return self._get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            self._purge()
+            return self._get(job_id)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict.fromkeys(JOB_STATUSES, 0)
+            counts.update(self._connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            return counts
+
+    def requeue_stale(self, running_for: float) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL, claimed_by = NULL "
+                "WHERE status = 'running' AND started_at <= ?",
+                (time.time() - running_for,)
+            ).rowcount
+
+    async def aput(self, job_id: str, payload: dict, priority: int = 0, callback_url: Optional[str] = None) -> dict:
+        return await asyncio.to_thread(self.put, job_id, payload, priority, callback_url)
+
+    async def aclaim(self) -> Optional[dict]:
+        return await asyncio.to_thread(self.claim)
+
+    async def afinish(
+        self,
+        job_id: str,
+        result: Optional[dict] = None,
+        error: Optional[str] = None,
+        status_code: Optional[int] = None
+    ) -> Optional[dict]:
+        return await asyncio.to_thread(self.finish, job_id, result, error, status_code)
+
+    async def aget(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.get, job_id)
+
+    async def acounts(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self.counts)
+
+    async def arequeue_stale(self, running_for: float) -> int:
+        return await asyncio.to_thread(self.requeue_stale, running_for)
+
+    def _requeue_interrupted(self) -> int:
+        """
+        Queue again the running jobs whose process has exited, and returns their number.
+        """
+        pids = [
+            pid for (pid,) in self._connection.execute(
+                "SELECT DISTINCT claimed_by FROM jobs WHERE status = 'running'"
+            )
+        ]
+        dead = [pid for pid in pids if pid is None or pid == os.getpid() or not _process_exists(pid)]
+        requeued = 0
+        for pid in dead:
+            requeued += self._connection.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL, claimed_by = NULL "
+                "WHERE status = 'running' AND claimed_by IS ?",
+                (pid,)
+            ).rowcount
+        return requeued
+
+    def _get(self, job_id: str) -> Optional[dict]:
+        row = self._connection.execute(
+            f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return self._to_job(row) if row is not None else None
+
+    def _count(self, status: str) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def _purge(self) -> None:
+        """ Delete the jobs finished more than result_ttl seconds ago. """
+        self._connection.execute("DELETE FROM jobs WHERE finished_at <= ?", (time.time() - self.result_ttl,))
+
+    def _to_job(self, row: tuple) -> dict:
+        job = dict(zip(self._COLUMNS, row))
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+def _process_exists(pid: int) -> bool:
+    """ Returns whether a process with this pid is running. """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Running, as another user
+        return True
+    return True
+
+def create_job_queue(
+    backend: str,
+    max_size: int,
+    result_ttl: float,
+    path: Optional[str] = None
+) -> JobQueue:
+    """
+    Build the job queue backend selected by name.
+
+    Parameters:
+    - backend (str): One of "memory" or "sqlite".
+    - max_size (int): Maximum number of queued jobs, 0 is unlimited.
+    - result_ttl (float): Seconds finished jobs are kept for polling.
+    - path (str, optional): Database file, required by the "sqlite" backend.
+
+    Returns:
+    - JobQueue: The job queue.
+
+    Raises:
+    - ValueError: If the backend is unknown.
+    """
+    if backend == "memory":
+        return InMemoryJobQueue(max_size, result_ttl)
+    if backend == "sqlite":
+        return SQLiteJobQueue(path, max_size, result_ttl)
+    raise ValueError(f"Unknown job queue backend: {backend}")
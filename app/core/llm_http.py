@@ -0,0 +1,243 @@
+"""Shared HTTP clients of the LLM backends.
+
+All OpenAI-compatible backends of a process send their requests through one sync and
+one async httpx client, sized and timed from the configuration: a bounded pool of
+keep-alive connections (HTTP/2 when the h2 package is installed), and separate
+connect, read, write and pool timeouts. Connections can be opened at startup, so
+that the first reports do not pay for DNS, TCP and TLS handshakes.
+
+The clients are built lazily and hold no connection until used: a pre-forking
+server builds them in the master, and each worker warms up its own copy.
+
+Classes:
+- MeteredAsyncTransport: Async transport recording pool saturation metrics.
+- MeteredTransport: Sync transport recording pool saturation metrics.
+
+Functions:
+- get_llm_http_clients: The shared sync and async clients of the process.
+- register_llm_origin: Record an API base URL to warm up at startup.
+- warm_up_llm_http_clients: Open keep-alive connections to the registered origins.
+"""
+
+from importlib.util import find_spec
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import threading
+
+import httpx
+
+from app.config import config as app_config
+from app.core import metrics
+from app.core.environment import get_environment
+
+from app.core.logger import get_logger
+logger = get_logger(__name__)
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+_clients: Optional[Tuple[httpx.Client, httpx.AsyncClient]] = None
+_clients_lock = threading.Lock()
+
+# Base URL -> API key of the backends using the shared clients
+_origins: Dict[str, Optional[str]] = {}
+
+def _update_pool_metrics(client: str, transport: httpx.BaseTransport) -> None:
+    """
+    Record the open and idle connections of the connection pool of a transport.
+
+    httpx does not expose the pool of its transports, only httpcore's pool has a
+    public list of connections: if a version of httpx stores it differently, the
+    connection gauges are left as they are instead of failing the request.
+    """
+    connections = getattr(getattr(transport, "_pool", None), "connections", None)
+    if connections is None:
+        return
+    idle = sum(1 for connection in connections if connection.is_idle())
+    metrics.LLM_HTTP_CONNECTIONS.labels(client, "active").set(len(connections) - idle)
+    metrics.LLM_HTTP_CONNECTIONS.labels(client, "idle").set(idle)
+
+class _MeteredAsyncStream(httpx.AsyncByteStream):
+    """ Response body that marks the end of its request when closed. """
+
+    def __init__(self, stream: httpx.AsyncByteStream, transport: "MeteredAsyncTransport"):
+        self._stream = stream
+        self._transport = transport
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._transport._finish()
+
+class MeteredAsyncTransport(httpx.AsyncHTTPTransport):
+    """
+    Async transport recording the requests in flight (from sending the request to
+    closing the response, waiting for a connection included), the connections of
+    its pool and the requests that timed out waiting for a connection.
+    """
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        metrics.LLM_HTTP_REQUESTS_IN_FLIGHT.labels("async").inc()
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException as e:
+            if isinstance(e, httpx.PoolTimeout):
+                metrics.LLM_HTTP_POOL_TIMEOUTS.labels("async").inc()
+            self._finish()
+            raise
+        _update_pool_metrics("async", self)
+        response.stream = _MeteredAsyncStream(response.stream, self)
+        return response
+
+    def _finish(self) -> None:
+        metrics.LLM_HTTP_REQUESTS_IN_FLIGHT.labels("async").dec()
+        _update_pool_metrics("async", self)
+
+class _MeteredStream(httpx.SyncByteStream):
+    """ Response body that marks the end of its request when closed. """
+
+    def __init__(self, stream: httpx.SyncByteStream, transport: "MeteredTransport"):
+        self._stream = stream
+        self._transport = transport
+        self._closed = False
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._transport._finish()
+
+class MeteredTransport(httpx.HTTPTransport):
+    """ Sync transport recording the same metrics as MeteredAsyncTransport. """
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        metrics.LLM_HTTP_REQUESTS_IN_FLIGHT.labels("sync").inc()
+        try:
+            response = super().handle_request(request)
+        except BaseException as e:
+            if isinstance(e, httpx.PoolTimeout):
+                metrics.LLM_HTTP_POOL_TIMEOUTS.labels("sync").inc()
+            self._finish()
+            raise
+        _update_pool_metrics("sync", self)
+        response.stream = _MeteredStream(response.stream, self)
+        return response
+
+    def _finish(self) -> None:
+        metrics.LLM_HTTP_REQUESTS_IN_FLIGHT.labels("sync").dec()
+        _update_pool_metrics("sync", self)
+
+def _http2_enabled(setting: str) -> bool:
+    if setting == "auto":
+        return find_spec("h2") is not None
+    return setting == "true"
+
+def get_llm_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    Returns the sync and async HTTP clients shared by the LLM backends of the process,
+    built on first use with the LLM_HTTP_* settings.
+    """
+    global _clients
+    if _clients is None:
+        with _clients_lock:
+            if _clients is None:
+                env_config = app_config[get_environment()]
+                limits = httpx.Limits(
+                    max_connections=env_config.LLM_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=env_config.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=env_config.LLM_HTTP_KEEPALIVE_EXPIRY
+                )
+                http2 = _http2_enabled(env_config.LLM_HTTP2)
+                timeout = get_llm_http_timeout()
+                metrics.LLM_HTTP_POOL_SIZE.set(env_config.LLM_HTTP_MAX_CONNECTIONS)
+                _clients = (
+                    httpx.Client(
+                        transport=MeteredTransport(limits=limits, http2=http2),
+                        timeout=timeout
+                    ),
+                    httpx.AsyncClient(
+                        transport=MeteredAsyncTransport(limits=limits, http2=http2),
+                        timeout=timeout
+                    )
+                )
+                logger.info(
+                    f"Built the LLM HTTP clients: {env_config.LLM_HTTP_MAX_CONNECTIONS} connections, "
+                    f"HTTP/2 {'enabled' if http2 else 'disabled'}"
+                )
+    return _clients
+
+def get_llm_http_timeout() -> httpx.Timeout:
+    """ Returns the connect, read, write and pool timeouts of the LLM requests. """
+    env_config = app_config[get_environment()]
+    return httpx.Timeout(
+        connect=env_config.LLM_HTTP_CONNECT_TIMEOUT,
+        read=env_config.LLM_HTTP_READ_TIMEOUT,
+        write=env_config.LLM_HTTP_WRITE_TIMEOUT,
+        pool=env_config.LLM_HTTP_POOL_TIMEOUT
+    )
+
+def register_llm_origin(base_url: Optional[str], api_key: Optional[str]) -> None:
+    """
+    Record the base URL of a backend using the shared clients, to be warmed up.
+
+    Parameters:
+    - base_url (str, optional): API base URL, OpenAI's by default.
+    - api_key (str, optional): API key sent with the warm-up requests.
+    """
+    _origins[(base_url or DEFAULT_BASE_URL).rstrip("/")] = api_key
+
+async def warm_up_llm_http_clients(connections: Optional[int] = None, timeout: Optional[float] = None) -> int:
+    """
+    Open keep-alive connections of the async client to every registered origin, with
+    concurrent GET /models requests. Failures are logged, never raised: a cold
+    connection only costs latency. The warm-up is given up after timeout seconds, so
+    that a slow or unreachable API does not hold the startup of the worker.
+
+    Parameters:
+    - connections (int, optional): Connections per origin, LLM_HTTP_WARMUP_CONNECTIONS by default.
+    - timeout (float, optional): Seconds for the whole warm-up, LLM_HTTP_WARMUP_TIMEOUT by default.
+
+    Returns:
+    - int: Number of warm-up requests that got a response, whatever its status.
+    """
+    env_config = app_config[get_environment()]
+    connections = env_config.LLM_HTTP_WARMUP_CONNECTIONS if connections is None else connections
+    timeout = env_config.LLM_HTTP_WARMUP_TIMEOUT if timeout is None else timeout
+    if not _origins or connections <= 0:
+        return 0
+    _, async_client = get_llm_http_clients()
+    warmed = 0
+
+    async def warm_up(base_url: str, api_key: Optional[str]) -> None:
+        nonlocal warmed
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        try:
+            await async_client.get(f"{base_url}/models", headers=headers)
+            warmed += 1
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not warm up a connection to {base_url}: {e!r}")
+
+    # With HTTP/1.1 each concurrent request opens its own connection
+    requests: List = [
+        warm_up(base_url, api_key)
+        for base_url, api_key in _origins.items()
+        for _ in range(connections)
+    ]
+    try:
+        await asyncio.wait_for(asyncio.gather(*requests), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"LLM connection warm-up given up after {timeout}s")
+    logger.info(f"Warmed up {warmed} LLM connections to {len(_origins)} origins")
+    return warmed
@@ -0,0 +1,378 @@
+"""Routing of LLM calls over several backends.
+
+This module provides a chat model that spreads calls over weighted backends (models
+or endpoints), fails over to another backend on timeouts, rate limits, server and
+connection errors, and cuts tail latency with hedged requests: when the first
+backend has not answered within a high percentile of its recent latencies, a
+duplicate request is sent to a second backend and the first answer wins. Each
+backend has a circuit breaker, so a failing backend stops receiving calls until it
+has had time to recover. Client errors (e.g. a request too long for the model) would
+fail on every backend: they are raised at once and do not count against the breaker.
+
+Classes:
+- CircuitBreaker: Closed/open/half-open state of a backend.
+- RouterBackend: A backend chat model with its weight, breaker and latency window.
+- RoutedChatModel: Chat model routing each call over the backends.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Deque, Dict, List, Optional
+import asyncio
+import random
+import threading
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.pydantic_v1 import PrivateAttr
+
+from app.core.exceptions import LLMTimeoutError, LLMUpstreamError
+from app.core.retry import is_transient_error
+from app.core.logger import get_logger
+logger = get_logger(__name__)
+
+class CircuitBreaker(object):
+    """
+    Circuit breaker of one backend.
+
+    After failure_threshold consecutive failures the breaker opens and the backend
+    gets no calls for reset_timeout seconds. Then a single trial call is let through
+    (half-open): its success closes the breaker, its failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self.state = self.CLOSED
+        self.trial_in_flight = False
+
+    def allows(self, now: float) -> bool:
+        """ Whether a call may be sent to the backend now. """
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.trial_in_flight = False
+        if self.state == self.HALF_OPEN:
+            return not self.trial_in_flight
+        return self.state == self.CLOSED
+
+    def on_call(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self.trial_in_flight = True
+
+    def on_success(self) -> None:
+        self.failures = 0
+        self.state = self.CLOSED
+        self.trial_in_flight = False
+
+    def on_failure(self, now: float) -> None:
+        self.failures += 1
+        self.trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit breaker opened after {self.failures} consecutive failures")
+            self.state = self.OPEN
+            self.opened_at = now
+
+    def on_cancel(self) -> None:
+        """ A call abandoned by the router (lost hedge) is neither success nor failure. """
+        self.trial_in_flight = False
+
+class RouterBackend(object):
+    """ A backend of RoutedChatModel with its routing state and counters. """
+
+    def __init__(
+        self,
+        name: str,
+        llm: BaseChatModel,
+        weight: float = 1.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        latency_window: int = 200
+    ):
+        """
+        Parameters:
+        - name (str): Name of the backend in logs and stats.
+        - llm (BaseChatModel): The chat model, supporting bind_tools.
+        - weight (float): Relative share of the calls sent to this backend.
+        - failure_threshold (int): Consecutive failures opening the circuit breaker.
+        - reset_timeout (float): Seconds before an open breaker lets a trial call through.
+        - latency_window (int): Number of recent latencies kept for hedging.
+        """
+        self.name = name
+        self.llm = llm
+        self.weight = weight
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latencies: Deque[float] = deque(maxlen=latency_window)
+        self.calls = 0
+        self.failures = 0
+        self.wins = 0
+
+    def latency_percentile(self, fraction: float) -> Optional[float]:
+        """ Percentile of the recent latencies in seconds, None without samples. """
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "state": self.breaker.state,
+            "calls": self.calls,
+            "failures": self.failures,
+            "wins": self.wins,
+            "p50_ms": round((self.latency_percentile(0.5) or 0.0) * 1000, 1),
+            "p95_ms": round((self.latency_percentile(0.95) or 0.0) * 1000, 1),
+        }
+
+class RoutedChatModel(BaseChatModel):
+    """
+    Chat model routing each call to one of several backends.
+
+    Asynchronous calls are hedged and fail over; synchronous calls only fail over.
+    Tools are bound on the chosen backend with its own bind_tools, so backends of
+    different providers can be mixed.
+    """
+    backends: List[RouterBackend]
+    hedge_percentile: float = 0.95  # 0 disables hedging
+    hedge_min_samples: int = 20  # Latencies needed before hedging a backend
+    hedge_min_delay: float = 0.05  # Seconds
+    timeout: float = 60.0  # Seconds per backend call
+    max_concurrency: int = 100  # Synchronous calls running at the same time
+    seed: Optional[int] = None
+
+    _random: random.Random = PrivateAttr()
+    _executor: ThreadPoolExecutor = PrivateAttr()
+    _hedged: int = PrivateAttr(default=0)
+    _failovers: int = PrivateAttr(default=0)
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        if not self.backends:
+            raise ValueError("RoutedChatModel needs at least one backend")
+        self._random = random.Random(self.seed)
+        # Threads of the synchronous calls, so that they can be abandoned after the timeout
+        self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="llm-router")
+
+    @property
+    def model_name(self) -> str:
+        return "router(" + ",".join(backend.name for backend in self.backends) + ")"
+
+    @property
+    def _llm_type(self) -> str:
+        return "router"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    def bind_tools(self, tools: List[Any], **kwargs: Any):
+        """ Bind tools; they are bound on the chosen backend for every call. """
+        return self.bind(tools=tools, tool_kwargs=kwargs)
+
+    def _choose(self, excluded: List[RouterBackend]) -> Optional[RouterBackend]:
+        """ Pick a backend by weight among those not excluded whose breaker allows a call. """
+        now = time.monotonic()
+        candidates = [
+            backend for backend in self.backends
+            if backend not in excluded and backend.breaker.allows(now)
+        ]
+        if not candidates:
+            return None
+        return self._random.choices(candidates, weights=[backend.weight for backend in candidates])[0]
+
+    def _hedge_delay(self, backend: RouterBackend) -> Optional[float]:
+        """ Seconds to wait for backend before sending a hedged request, None for no hedging. """
+        if not self.hedge_percentile or len(backend.latencies) < self.hedge_min_samples:
+            return None
+        return max(backend.latency_percentile(self.hedge_percentile), self.hedge_min_delay)
+
+    @staticmethod
+    def _bound(backend: RouterBackend, tools: Optional[List[Any]], tool_kwargs: Optional[dict]):
+        return backend.llm.bind_tools(tools, **(tool_kwargs or {})) if tools else backend.llm
+
+    def _on_result(self, backend: RouterBackend, started: float, error: Optional[BaseException]) -> None:
+        """
+        Update the breaker and counters of backend after a finished call. Only
+        transient errors are failures of the backend: a client error means that it
+        answered, so it counts as a success of the breaker.
+        """
+        now = time.monotonic()
+        if error is None:
+            backend.latencies.append(now - started)
+            backend.breaker.on_success()
+        elif is_transient_error(error):
+            backend.failures += 1
+            backend.breaker.on_failure(now)
+            logger.warning(f"LLM backend {backend.name} failed: {type(error).__name__}: {error}")
+        else:
+            backend.breaker.on_success()
+
+    async def _acall_backend(
+        self,
+        backend: RouterBackend,
+        messages: List[BaseMessage],
+        tools: Optional[List[Any]],
+        tool_kwargs: Optional[dict],
+        stop: Optional[List[str]]
+    ) -> BaseMessage:
+        """ Call one backend within the timeout, recording the outcome. """
+        backend.calls += 1
+        backend.breaker.on_call()
+        started = time.monotonic()
+        try:
+            message = await asyncio.wait_for(
+                self._bound(backend, tools, tool_kwargs).ainvoke(messages, stop=stop),
+                self.timeout
+            )
+        except asyncio.CancelledError:
+            # Lost hedges are the slow calls; their elapsed time is kept as a lower
+            # bound so that the hedge percentile does not drift down.
+            backend.latencies.append(time.monotonic() - started)
+            backend.breaker.on_cancel()
+            raise
+        except Exception as e:
+            self._on_result(backend, started, e)
+            raise
+        self._on_result(backend, started, None)
+        return message
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        tools: Optional[List[Any]] = None,
+        tool_kwargs: Optional[dict] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        """
+        Call a backend, hedging it once with a second backend when it is slower than
+        its hedge percentile, and failing over to the other backends on transient errors.
+
+        Raises:
+        - Exception: A client error of a backend, or the last backend error when
+          every available backend failed.
+        """
+        tried: List[RouterBackend] = []
+        pending: Dict[asyncio.Task, RouterBackend] = {}
+        last_error: Optional[BaseException] = None
+        hedge_allowed = True
+
+        def start(backend: RouterBackend) -> None:
+            tried.append(backend)
+            task = asyncio.ensure_future(self._acall_backend(backend, messages, tools, tool_kwargs, stop))
+            pending[task] = backend
+
+        try:
+            while True:
+                if not pending:
+                    backend = self._choose(tried)
+                    if backend is None:
+                        raise last_error or LLMUpstreamError("No LLM backend available")
+                    if tried:
+                        self._failovers += 1
+                        logger.warning(f"Failing over to LLM backend {backend.name}")
+                    start(backend)
+
+                hedge_delay = self._hedge_delay(tried[-1]) if hedge_allowed else None
+                done, _ = await asyncio.wait(
+                    pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedge_allowed = False
+                    backend = self._choose(tried)
+                    if backend is not None:
+                        self._hedged += 1
+                        start(backend)
+                    continue
+
+                # Several calls can finish in the same wakeup: an answer wins over errors
+                for task in done:
+                    if task.exception() is None:
+                        pending.pop(task).wins += 1
+                        return ChatResult(generations=[ChatGeneration(message=task.result())])
+                for task in done:
+                    pending.pop(task)
+                    last_error = task.exception()
+                    if not is_transient_error(last_error):
+                        raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        tools: Optional[List[Any]] = None,
+        tool_kwargs: Optional[dict] = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        """
+        Call the backends one after the other until one succeeds, without hedging.
+
+        Calls run on at most max_concurrency threads. The timeout counts from the start
+        of the call in its thread, not from its submission, so that waiting for a free
+        thread does not time calls out; a call still running after the timeout is
+        abandoned to its thread, until the HTTP client's own timeout ends it.
+
+        Raises:
+        - Exception: A client error of a backend, or the last backend error when
+          every available backend failed.
+        """
+        tried: List[RouterBackend] = []
+        last_error: Optional[BaseException] = None
+        while True:
+            backend = self._choose(tried)
+            if backend is None:
+                raise last_error or LLMUpstreamError("No LLM backend available")
+            if tried:
+                self._failovers += 1
+            tried.append(backend)
+            backend.calls += 1
+            backend.breaker.on_call()
+            running = threading.Event()
+            started = [0.0]
+
+            def call(llm=self._bound(backend, tools, tool_kwargs)) -> BaseMessage:
+                started[0] = time.monotonic()
+                running.set()
+                return llm.invoke(messages, stop=stop)
+
+            future = self._executor.submit(call)
+            try:
+                # Wait for a free thread, then for the call within the timeout
+                while not running.wait(0.05) and not future.done():
+                    pass
+                message = future.result(timeout=max(started[0] + self.timeout - time.monotonic(), 0))
+            except FutureTimeoutError:
+                last_error = LLMTimeoutError(f"LLM backend {backend.name} timed out after {self.timeout}s")
+                self._on_result(backend, started[0], last_error)
+                continue
+            except Exception as e:
+                self._on_result(backend, started[0], e)
+                if not is_transient_error(e):
+                    raise
+                last_error = e
+                continue
+            self._on_result(backend, started[0], None)
+            backend.wins += 1
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def stats(self) -> dict:
+        """ Returns the counters of the router and its backends. """
+        return {
+            "hedged": self._hedged,
+            "failovers": self._failovers,
+            "backends": [backend.stats() for backend in self.backends],
+        }
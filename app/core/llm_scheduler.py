@@ -0,0 +1,216 @@
+"""Scheduling of outbound LLM calls within rate limits.
+
+This module keeps the LLM calls of a worker within the provider's requests-per-minute
+and tokens-per-minute quotas. Calls that would exceed a budget wait in a priority
+queue instead of failing, and the number of concurrent calls adapts to rate limit
+errors (HTTP 429) with additive increase, multiplicative decrease (AIMD).
+
+Classes:
+- TokenBucket: Budget refilled at a constant rate.
+- SchedulerTicket: Permission to make one LLM call.
+- LLMScheduler: Priority queue admitting LLM calls within the budgets.
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import time
+
+from app.core.logger import get_logger
+logger = get_logger(__name__)
+
+# Scheduling priorities of incident reports, higher is scheduled first
+REPORT_PRIORITIES = {
+    "low": 0,
+    "normal": 1,
+    "high": 2,
+    "critical": 3,
+}
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """ Whether an LLM call failed because of the provider's rate limits (HTTP 429). """
+    return getattr(error, "status_code", None) == 429
+
+class TokenBucket(object):
+    """
+    Budget of units refilled continuously at rate_per_minute, holding at most
+    capacity units.
+
+    A take larger than the capacity is allowed once the bucket is full and leaves it
+    in debt, so oversized requests are delayed but never starved.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """ Seconds until amount units can be taken, 0 if they can be taken now. """
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(missing / self.rate, 0.0)
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level -= amount
+
+    def give(self, amount: float, now: float) -> None:
+        """ Return units, e.g. when fewer tokens were used than estimated. """
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+@dataclass
+class SchedulerTicket:
+    """ Permission to make one LLM call, returned to LLMScheduler.release. """
+    tokens: int
+    priority: int
+    dispatched: float = field(default_factory=time.monotonic)
+
+class LLMScheduler(object):
+    """
+    Admits LLM calls in priority order within requests-per-minute and tokens-per-minute
+    budgets and an adaptive concurrency limit.
+
+    Budgets of 0 are unlimited. The concurrency limit starts at max_concurrency, is
+    halved when a call is rate limited (at most once per round of calls) and grows
+    by about one per round of successful calls.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        min_concurrency: int = 1,
+        burst_seconds: float = 10.0
+    ):
+        """
+        Parameters:
+        - max_concurrency (int): Upper bound of concurrent LLM calls.
+        - requests_per_minute (float): Request budget, 0 for unlimited.
+        - tokens_per_minute (float): Token budget (prompt and completion), 0 for unlimited.
+        - min_concurrency (int): Lower bound of the adaptive concurrency limit.
+        - burst_seconds (float): Seconds of budget that can be spent at once.
+        """
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = max(1, min(min_concurrency, max_concurrency))
+        self.limit = float(max_concurrency)
+        self.requests: Optional[TokenBucket] = (
+            TokenBucket(requests_per_minute, max(1.0, requests_per_minute * burst_seconds / 60))
+            if requests_per_minute else None
+        )
+        self.tokens: Optional[TokenBucket] = (
+            TokenBucket(tokens_per_minute, max(1.0, tokens_per_minute * burst_seconds / 60))
+            if tokens_per_minute else None
+        )
+        self.in_flight = 0
+        self.rate_limited = 0
+        self.dispatched = 0
+        self._last_decrease = 0.0
+        self._queue: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def acquire(self, tokens: int, priority: int = REPORT_PRIORITIES["normal"]) -> SchedulerTicket:
+        """
+        Wait until an LLM call may be made.
+
+        Parameters:
+        - tokens (int): Estimated tokens of the call (prompt and completion).
+        - priority (int): Priority of the call, higher is admitted first.
+
+        Returns:
+        - SchedulerTicket: The ticket to pass to release once the call has finished.
+        """
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (-priority, next(self._sequence), tokens, future))
+        self._dispatch()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # Admitted just before the caller was cancelled: give the slot back
+            if future.done() and not future.cancelled():
+                self.release(future.result(), used_tokens=0)
+            raise
+
+    def release(
+        self,
+        ticket: SchedulerTicket,
+        used_tokens: Optional[int] = None,
+        rate_limited: bool = False
+    ) -> None:
+        """
+        Report that an admitted LLM call has finished.
+
+        Parameters:
+        - ticket (SchedulerTicket): The ticket returned by acquire.
+        - used_tokens (int, optional): Tokens actually used, if known, to correct the
+          estimate in the token budget.
+        - rate_limited (bool): Whether the call was rejected with HTTP 429.
+        """
+        self.in_flight -= 1
+        now = time.monotonic()
+        if self.tokens is not None and used_tokens is not None:
+            self.tokens.give(ticket.tokens - used_tokens, now)
+
+        if rate_limited:
+            self.rate_limited += 1
+            # Calls dispatched before the last decrease saw the old limit; ignoring
+            # them halves the limit once per round instead of once per failed call.
+            if ticket.dispatched >= self._last_decrease:
+                self.limit = max(float(self.min_concurrency), self.limit / 2)
+                self._last_decrease = now
+                logger.warning(f"LLM rate limited, concurrency limit lowered to {int(self.limit)}")
+        else:
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """ Admit queued calls while the concurrency limit and budgets allow. """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._queue:
+            priority, _, tokens, future = self._queue[0]
+            if future.done():  # Cancelled while waiting
+                heapq.heappop(self._queue)
+                continue
+            if self.in_flight >= int(self.limit):
+                return
+
+            now = time.monotonic()
+            wait = max(
+                self.requests.wait_time(1, now) if self.requests is not None else 0.0,
+                self.tokens.wait_time(tokens, now) if self.tokens is not None else 0.0
+            )
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+
+            heapq.heappop(self._queue)
+            if self.requests is not None:
+                self.requests.take(1, now)
+            if self.tokens is not None:
+                self.tokens.take(tokens, now)
+            self.in_flight += 1
+            self.dispatched += 1
+            future.set_result(SchedulerTicket(tokens=tokens, priority=-priority, dispatched=now))
+
+    def stats(self) -> dict:
+        """ Returns the counters of the scheduler. """
+        return {
+            "in_flight": self.in_flight,
+            "queued": sum(1 for *_, future in self._queue if not future.done()),
+            "concurrency_limit": int(self.limit),
+            "dispatched": self.dispatched,
+            "rate_limited": self.rate_limited,
+        }
@@ -0,0 +1,146 @@
+"""Non-blocking logging: queue-based handlers, JSON lines and sampling.
+
+Log records are put on a bounded in-memory queue by the request path and written to
+the console and files by a background thread, so disk writes and rotation never run
+on the event loop. When the writer falls behind (e.g. a slow disk) and the queue is
+full, records are dropped and counted rather than blocking requests or growing memory.
+Per-request payload logs are sampled and rate limited so that their cost stays
+constant as the request rate grows.
+
+Classes:
+- JsonFormatter: Formats records as single-line JSON objects.
+- SamplingFilter: Keeps a fraction of the records, at most N per second.
+- DroppingQueueHandler: Queues records, dropping and counting them when the queue is full.
+
+Functions:
+- start_queue_logging: Move the handlers of a logger behind a queue and background writer.
+- stop_queue_logging: Flush the queue and stop the background writer.
+"""
+
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+from app.core import metrics
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+
+class JsonFormatter(logging.Formatter):
+    """ Formats log records as JSON lines with time, level, logger and message. """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a random fraction sample_rate of the records, and at most max_per_second
+    records per second (0 is unlimited).
+    """
+
+    def __init__(self, sample_rate: float = 1.0, max_per_second: float = 0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self._window = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return False
+        if not self.max_per_second:
+            return True
+        window = int(time.monotonic())
+        with self._lock:
+            if window != self._window:
+                self._window = window
+                self._count = 0
+            self._count += 1
+            return self._count <= self.max_per_second
+
+class DroppingQueueHandler(QueueHandler):
+    """ Queues records without blocking: when the queue is full, the record is dropped and counted. """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            metrics.LOG_RECORDS_DROPPED.inc()
+
+class _QueueListener(QueueListener):
+    """ QueueListener waiting for room in a bounded queue to signal the writer to stop. """
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+def start_queue_logging(logger: logging.Logger, max_size: int = 10000) -> QueueListener:
+    """
+    Replace the handlers of logger with a DroppingQueueHandler, and write the queued
+    records to the original handlers from a background thread.
+
+    Parameters:
+    - logger (logging.Logger): Logger whose handlers do blocking I/O.
+    - max_size (int): Maximum number of queued records, beyond which records are dropped.
+
+    Returns:
+    - QueueListener: The started background writer.
+    """
+    global _listener, _queue_handler
+    stop_queue_logging()
+
+    handlers = [handler for handler in logger.handlers if not isinstance(handler, QueueHandler)]
+    _queue_handler = DroppingQueueHandler(queue.Queue(max_size))
+    # Records no handler would write are dropped before they are queued
+    _queue_handler.setLevel(min((handler.level for handler in handlers), default=logging.NOTSET))
+
+    _listener = _QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    logger.handlers = [_queue_handler]
+    _listener.start()
+    return _listener
+
+def stop_queue_logging() -> None:
+    """ Write the queued records and stop the background writer, if started. """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def _restart_listener_after_fork() -> None:
+    """
+    Start a new background writer in a forked child (e.g. a pre-forked server worker):
+    threads do not survive fork, and the records of the child would otherwise stay in
+    its queue. The child gets a new queue too: its copy of the parent's queue holds
+    records the parent writes, and its lock may have been held by the parent's writer.
+    """
+    global _listener
+    if _listener is None or _queue_handler is None:
+        return
+    _queue_handler.queue = queue.Queue(_queue_handler.queue.maxsize)
+    _listener = _QueueListener(_queue_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+# The writer is a daemon thread: write what is still queued when the process exits
+atexit.register(stop_queue_logging)
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
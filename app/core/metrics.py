@@ -0,0 +1,377 @@
+"""In-process metrics in the Prometheus text format.
+
+This module aggregates counters, gauges and histograms in memory and renders them
+in the Prometheus text exposition format for the /metrics endpoint. Recording is a
+few additions under the series' lock (batch classifications record from threads):
+labelled series are created once per label value and cached, so no label
+dictionaries are allocated per request.
+
+Metrics are kept in the memory of each process. When several worker processes
+serve the app, every sample is labelled with the worker's pid, so that the series
+of different workers are told apart instead of looking like counter resets.
+
+Classes:
+- Counter: Monotonic counter, optionally labelled.
+- Gauge: Value that goes up and down.
+- Histogram: Distribution of observations over fixed buckets.
+- MetricsMiddleware: ASGI middleware timing HTTP requests.
+
+Functions:
+- render_metrics: Render all metrics in the Prometheus text format.
+"""
+
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+import os
+import threading
+import time
+
+from app.core.environment import get_worker_processes
+
+# Buckets in seconds for network-bound stages (requests, LLM calls, queue waits)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Buckets in seconds for CPU-bound stages (prompt building, parsing)
+CPU_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+# HTTP methods labelled as such, any other method is labelled "other"
+HTTP_METHODS = frozenset(["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
+
+_REGISTRY: List["_Metric"] = []
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], *extra: str) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    pairs.extend(label for label in extra if label)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric(object):
+    """ Base of labelled metrics: one child series per combination of label values. """
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        _REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """
+        Returns the series for the given label values, created on first use.
+
+        Bind the series once (e.g. at module level) when the values are known in
+        advance, to keep the recording path free of lookups.
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _render_samples(self, lines: List[str], worker: str) -> None:
+        raise NotImplementedError
+
+    def render(self, lines: List[str], worker: str = "") -> None:
+        """
+        Parameters:
+        - lines (List[str]): Lines of the exposition, appended to.
+        - worker (str): Worker label added to every sample, e.g. 'worker="1234"', or "".
+        """
+        lines.append(f"# HELP {self.name} {self.documentation}")
+        lines.append(f"# TYPE {self.name} {self.kind}")
+        self._render_samples(lines, worker)
+
+class _Value(object):
+    """ A single counter or gauge series. """
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+class Counter(_Metric):
+    """ Monotonic counter. Unlabelled counters are incremented directly with inc. """
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        self._children[()].inc(amount)
+
+    def _render_samples(self, lines: List[str], worker: str) -> None:
+        for values, child in list(self._children.items()):
+            lines.append(f"{self.name}_total{_format_labels(self.labelnames, values, worker)} {_format_value(child.value)}")
+
+class Gauge(Counter):
+    """ Value that goes up and down, e.g. requests in flight. """
+    kind = "gauge"
+
+    def dec(self, amount: float = 1) -> None:
+        self._children[()].dec(amount)
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+    def _render_samples(self, lines: List[str], worker: str) -> None:
+        for values, child in list(self._children.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values, worker)} {_format_value(child.value)}")
+
+class _HistogramSeries(object):
+    """ Bucket counts, sum and count of one histogram series. """
+    __slots__ = ("upper_bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)  # Last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        bucket = bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.sum += value
+            self.count += 1
+
+class Histogram(_Metric):
+    """ Distribution of observations (e.g. durations in seconds) over fixed buckets. """
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramSeries:
+        return _HistogramSeries(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def _render_samples(self, lines: List[str], worker: str) -> None:
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for upper_bound, count in zip(self.upper_bounds + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(upper_bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, worker, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, values, worker)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+
+def render_metrics() -> str:
+    """
+    Render all metrics in the Prometheus text exposition format (version 0.0.4),
+    labelled with the pid of the worker when several worker processes serve the app.
+    """
+    worker = f'worker="{os.getpid()}"' if get_worker_processes() > 1 else ""
+    lines: List[str] = []
+    for metric in _REGISTRY:
+        metric.render(lines, worker)
+    return "\n".join(lines) + "\n"
+
+# HTTP
+HTTP_REQUEST_SECONDS = Histogram(
+    "incident_http_request_duration_seconds",
+    "Duration of HTTP requests by route.",
+    labelnames=("method", "route")
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "incident_http_requests_in_flight",
+    "HTTP requests currently being handled."
+)
+
+# Classification stages
+PROMPT_BUILD_SECONDS = Histogram(
+    "incident_prompt_build_duration_seconds",
+    "Time spent building the LLM input (report serialization and few-shot selection).",
+    buckets=CPU_BUCKETS
+)
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "incident_llm_queue_wait_seconds",
+    "Time LLM calls waited in the scheduler for the rate and concurrency limits."
+)
+LLM_CALL_SECONDS = Histogram(
+    "incident_llm_call_duration_seconds",
+    "Duration of LLM call attempts, prompt formatting and output parsing included."
+)
+PARSE_SECONDS = Histogram(
+    "incident_parse_duration_seconds",
+    "Time spent parsing and validating LLM responses into classifications.",
+    buckets=CPU_BUCKETS
+)
+LLM_CALLS_IN_FLIGHT = Gauge(
+    "incident_llm_calls_in_flight",
+    "LLM calls currently running."
+)
+LLM_HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "incident_llm_http_requests_in_flight",
+    "HTTP requests to the LLM APIs sent or waiting for a pooled connection, by client (sync, async).",
+    labelnames=("client",)
+)
+LLM_HTTP_CONNECTIONS = Gauge(
+    "incident_llm_http_connections",
+    "Open connections of the LLM HTTP client pools, by client and state (active, idle).",
+    labelnames=("client", "state")
+)
+LLM_HTTP_POOL_SIZE = Gauge(
+    "incident_llm_http_pool_max_connections",
+    "Maximum connections of each LLM HTTP client pool."
+)
+
+# Counters
+LLM_TOKENS = Counter(
+    "incident_llm_tokens",
+    "Tokens reported by the LLM, by direction.",
+    labelnames=("direction",)
+)
+LLM_INPUT_TOKENS = LLM_TOKENS.labels("input")
+LLM_OUTPUT_TOKENS = LLM_TOKENS.labels("output")
+CACHE_LOOKUPS = Counter(
+    "incident_cache_lookups",
+    "Classification cache lookups, by result.",
+    labelnames=("result",)
+)
+CACHE_HITS = CACHE_LOOKUPS.labels("hit")
+CACHE_MISSES = CACHE_LOOKUPS.labels("miss")
+NEAR_DUPLICATE_LOOKUPS = Counter(
+    "incident_near_duplicate_lookups",
+    "Lookups of recently classified near-duplicate reports, by result.",
+    labelnames=("result",)
+)
+NEAR_DUPLICATE_HITS = NEAR_DUPLICATE_LOOKUPS.labels("hit")
+NEAR_DUPLICATE_MISSES = NEAR_DUPLICATE_LOOKUPS.labels("miss")
+LOCAL_CLASSIFICATIONS = Counter(
+    "incident_local_classifications",
+    "Classifications by the fields known without the LLM: all (resolved), some (partial) or none (full LLM call).",
+    labelnames=("result",)
+)
+LOCAL_RESOLVED = LOCAL_CLASSIFICATIONS.labels("resolved")
+LOCAL_PARTIAL = LOCAL_CLASSIFICATIONS.labels("partial")
+LOCAL_DEFERRED = LOCAL_CLASSIFICATIONS.labels("full")
+PROMPT_SHRINKS = Counter(
+    "incident_prompt_shrinks",
+    "Prompts shrunk to fit the token budget, by action (examples_dropped, description_truncated).",
+    labelnames=("action",)
+)
+LLM_HTTP_POOL_TIMEOUTS = Counter(
+    "incident_llm_http_pool_timeouts",
+    "LLM HTTP requests that timed out waiting for a pooled connection, by client (sync, async).",
+    labelnames=("client",)
+)
+LLM_RETRIES = Counter(
+    "incident_llm_retries",
+    "LLM calls sent again after a failure."
+)
+LLM_REPAIRS = Counter(
+    "incident_llm_repairs",
+    "Invalid structured outputs by repair: snapped to the schema locally, fixed by a follow-up prompt, or failed.",
+    labelnames=("result",)
+)
+LLM_REPAIRS_SNAPPED = LLM_REPAIRS.labels("snapped")
+LLM_REPAIRS_PROMPTED = LLM_REPAIRS.labels("prompted")
+LLM_REPAIRS_FAILED = LLM_REPAIRS.labels("failed")
+CLASSIFICATION_ERRORS = Counter(
+    "incident_classification_errors",
+    "Failed classifications, by error kind (timeout, rate_limited, invalid_output, upstream, unknown).",
+    labelnames=("kind",)
+)
+HTTP_ERRORS = Counter(
+    "incident_http_errors",
+    "HTTP errors raised by the application, by status code.",
+    labelnames=("status",)
+)
+
+# Job API
+JOBS = Counter(
+    "incident_jobs",
+    "Classification jobs, by event (submitted, rejected, succeeded, failed, callback_failed).",
+    labelnames=("event",)
+)
+JOB_QUEUE_DEPTH = Gauge(
+    "incident_job_queue_depth",
+    "Jobs waiting for a worker."
+)
+JOB_WAIT_SECONDS = Histogram(
+    "incident_job_wait_seconds",
+    "Time jobs waited in the queue before a worker started them."
+)
+
+# Logging
+LOG_RECORDS_DROPPED = Counter(
+    "incident_log_records_dropped",
+    "Log records dropped because the queue of the background log writer was full."
+)
+
+# Incident store
+INCIDENTS_STORED = Counter(
+    "incident_store_rows",
+    "Classified incident reports by storage result (written, dropped).",
+    labelnames=("result",)
+)
+INCIDENT_STORE_FLUSH_SECONDS = Histogram(
+    "incident_store_flush_duration_seconds",
+    "Time spent writing a batch of incident reports to the incident store."
+)
+
+class MetricsMiddleware(object):
+    """
+    ASGI middleware recording the duration of HTTP requests by method and route
+    template, and the number of requests in flight.
+
+    Requests that match no route are recorded under the route "unmatched", and
+    unknown methods under the method "other", so that scanners cannot create one
+    series per probed path or method.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            method = scope["method"] if scope["method"] in HTTP_METHODS else "other"
+            HTTP_REQUEST_SECONDS.labels(
+                method, getattr(route, "path", "unmatched")
+            ).observe(time.perf_counter() - started)
@@ -0,0 +1,65 @@
+"""Retries of failed LLM calls with jittered exponential backoff.
+
+This module decides whether a failed LLM call is worth retrying and how long to
+wait before the next attempt. Transient errors (timeouts, rate limits, server
+errors) are retried; invalid answers are not, they go to the repair step of the
+classification service instead. All attempts of a call share a deadline.
+
+Classes:
+- RetryPolicy: Attempt count, backoff and deadline of an LLM call.
+
+Functions:
+- is_transient_error: Whether an LLM call failed for a reason that may not recur.
+"""
+
+from typing import Optional
+import random
+import time
+
+from app.core.exceptions import to_classification_error
+
+# Kinds of classification errors (see app.core.exceptions) worth retrying
+TRANSIENT_ERROR_KINDS = frozenset({"timeout", "rate_limited", "upstream"})
+
+def is_transient_error(error: BaseException) -> bool:
+    """ Whether an LLM call failed with a timeout, a rate limit or a server error. """
+    return to_classification_error(error).kind in TRANSIENT_ERROR_KINDS
+
+class RetryPolicy(object):
+    """
+    At most max_attempts attempts of a call, waiting a random delay between 0 and
+    base_delay * 2 ** (retry - 1) seconds (at most max_delay) before each retry
+    ("full jitter", so that calls failing together do not retry together). All
+    attempts must end within deadline seconds of the first one (0 is no deadline).
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        deadline: float = 60.0,
+        seed: Optional[int] = None
+    ):
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self._random = random.Random(seed)
+
+    def start(self) -> Optional[float]:
+        """ Returns the deadline (time.monotonic) of a call starting now, None if unbounded. """
+        return time.monotonic() + self.deadline if self.deadline > 0 else None
+
+    def remaining(self, deadline_at: Optional[float]) -> Optional[float]:
+        """ Returns the seconds left before deadline_at, None if unbounded. """
+        return None if deadline_at is None else max(deadline_at - time.monotonic(), 0.0)
+
+    def backoff(self, retry: int) -> float:
+        """ Returns the delay in seconds before the given retry (1 for the first one). """
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+    def allows(self, deadline_at: Optional[float], delay: float) -> bool:
+        """ Whether an attempt can still start after waiting delay seconds. """
+        remaining = self.remaining(deadline_at)
+        return remaining is None or delay < remaining
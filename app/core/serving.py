@@ -0,0 +1,129 @@
+"""Production serving: pre-forked uvicorn workers under gunicorn.
+
+The master process imports the application and builds its read-only state before
+forking the workers, which then share it copy-on-write instead of each building it.
+Workers run uvicorn on uvloop and httptools when they are installed, and are given
+time to finish in-flight requests and LLM calls when they are stopped.
+
+Classes:
+- ProductionUvicornWorker: Gunicorn worker running uvicorn with the fastest available event loop and HTTP parser.
+- ProductionServer: Gunicorn application serving an already created ASGI app.
+
+Functions:
+- get_worker_count: Number of worker processes from the configuration and the available CPUs.
+- run_production_server: Serve an app with pre-forked workers until the master is stopped.
+"""
+
+from importlib.util import find_spec
+from typing import Any, Dict
+import gc
+import os
+import warnings
+
+from gunicorn.app.base import BaseApplication
+
+from app.config import config as app_config
+from app.core.environment import get_environment
+
+with warnings.catch_warnings():
+    # uvicorn.workers warns that it will move to the uvicorn-worker package
+    warnings.simplefilter("ignore", DeprecationWarning)
+    from uvicorn.workers import UvicornWorker
+
+from app.core.logger import get_logger
+logger = get_logger(__name__)
+
+EVENT_LOOP = "uvloop" if find_spec("uvloop") else "asyncio"
+HTTP_PROTOCOL = "httptools" if find_spec("httptools") else "h11"
+
+class ProductionUvicornWorker(UvicornWorker):
+    """
+    Gunicorn worker running uvicorn on uvloop and httptools when they are installed.
+
+    On SIGTERM the worker stops accepting connections, waits for the in-flight requests
+    for what is left of SERVER_GRACEFUL_TIMEOUT after JOB_DRAIN_TIMEOUT, then runs the
+    application shutdown, which gives the running jobs JOB_DRAIN_TIMEOUT to finish.
+    Gunicorn kills workers still running after SERVER_GRACEFUL_TIMEOUT.
+    """
+
+    _env_config = app_config[get_environment()]
+    CONFIG_KWARGS: Dict[str, Any] = {
+        "loop": EVENT_LOOP,
+        "http": HTTP_PROTOCOL,
+        "timeout_graceful_shutdown": max(
+            int(_env_config.SERVER_GRACEFUL_TIMEOUT - _env_config.JOB_DRAIN_TIMEOUT), 1
+        ),
+    }
+
+class ProductionServer(BaseApplication):
+    """ Gunicorn application serving an ASGI app created by the caller. """
+
+    def __init__(self, app: Any, options: Dict[str, Any]):
+        """
+        Parameters:
+        - app (Any): The ASGI application.
+        - options (Dict[str, Any]): Gunicorn settings, e.g. bind and workers.
+        """
+        self.application = app
+        self.options = options
+        super().__init__()
+
+    def load_config(self) -> None:
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self) -> Any:
+        return self.application
+
+def get_worker_count(configured: int) -> int:
+    """
+    Number of worker processes: the configured number, or one per CPU available to
+    the process (its CPU affinity, e.g. the CPUs of its container) when it is 0.
+    """
+    if configured > 0:
+        return configured
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS
+        return os.cpu_count() or 1
+
+def run_production_server(app: Any) -> None:
+    """
+    Serve app with SERVER_WORKERS pre-forked worker processes on SERVER_BIND, until
+    the master process is stopped (SIGTERM or SIGINT).
+
+    The app and any state built before calling this function are inherited by the
+    workers. Each worker runs the application lifespan, and so has its own services,
+    connections, rate limits and metrics. The number of workers is passed on to them
+    in APP_SERVER_WORKER_PROCESSES, so that each takes its share of the LLM rate
+    limits and labels its metrics with its pid.
+
+    Parameters:
+    - app (Any): The ASGI application, already created.
+    """
+    env_config = app_config[get_environment()]
+    workers = get_worker_count(env_config.SERVER_WORKERS)
+    os.environ["APP_SERVER_WORKER_PROCESSES"] = str(workers)
+    if workers > 1 and env_config.JOB_QUEUE_BACKEND == "memory":
+        logger.warning(
+            "The memory job queue is per worker: a job can only be polled through the worker "
+            "that queued it. Use APP_JOB_QUEUE_BACKEND=sqlite with several workers."
+        )
+    logger.info(
+        f"Starting {workers} workers on {env_config.SERVER_BIND} "
+        f"(event loop: {EVENT_LOOP}, HTTP parser: {HTTP_PROTOCOL})"
+    )
+
+    # Objects created so far are moved out of the garbage collector's generations, so
+    # that collections in the workers do not write to, and copy, the shared pages
+    gc.freeze()
+    ProductionServer(
+        app,
+        {
+            "bind": env_config.SERVER_BIND,
+            "workers": workers,
+            "worker_class": f"{__name__}.ProductionUvicornWorker",
+            "preload_app": True,
+            "graceful_timeout": env_config.SERVER_GRACEFUL_TIMEOUT,
+        }
+    ).run()
@@ -0,0 +1,65 @@
+"""Coalescing of concurrent identical asynchronous calls.
+
+This module provides a single-flight group: while a call for a key is in flight,
+further calls for the same key wait for its result instead of starting their own.
+
+Classes:
+- SingleFlight: Deduplicates concurrent calls by key.
+"""
+
+from typing import Awaitable, Callable, Dict, TypeVar
+import asyncio
+
+T = TypeVar("T")
+
+class SingleFlight(object):
+    """
+    Deduplicates concurrent asynchronous calls by key.
+
+    The call runs in its own task, so a caller that is cancelled (e.g. because its
+    client disconnected) does not cancel the call for the other waiting callers.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run func for key, or wait for the call already in flight for key.
+
+        Parameters:
+        - key (str): Key identifying identical calls.
+        - func (Callable[[], Awaitable[T]]): Coroutine function performing the call.
+
+        Returns:
+        - T: The result of the call, shared by all callers of the same key.
+
+        Raises:
+        - Exception: The exception raised by the call, for all callers of the same key.
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done_task: self._forget(key, done_task))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        """ Remove a finished call, marking its exception as retrieved. """
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        """ Returns the counters of the group. """
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
@@ -1,7 +1,14 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query, Request, status
+from pydantic import ValidationError
+from typing import AsyncIterator, List, Optional, Union
 
-from app.services.incident_service import IncidentService
+from app.config import config as app_config
+from app.core.environment import get_environment
+from app.core.exceptions import raise_with_log
+from app.services.incident_service import IncidentService, get_incident_service
+from app.services.incident_store_service import IncidentStoreService, get_incident_store_service
 from app.schemas.incident_schema import IncidentReport, IncidentResponse
+from app.utils.ndjson_utils import NDJSON_MEDIA_TYPE, NDJSONStreamingResponse, iter_ndjson_lines
 
 incident_router = APIRouter()
 
@@ -9,7 +16,11 @@ from app.core.logger import get_logger
 logger = get_logger(__name__)
 
 @incident_router.post("/report-incident")
-async def report_incident(incident: IncidentReport):
+async def report_incident(
+    incident: IncidentReport,
+    incident_service: IncidentService = Depends(get_incident_service),
+    incident_store_service: IncidentStoreService = Depends(get_incident_store_service)
+):
     """
     Endpoint for reporting an incident.
 
@@ -19,6 +30,110 @@ async def report_incident(incident: IncidentReport):
     Returns:
     - response (IncidentResponse): based on the reported incident and its classification.
     """
-    incident_classification = IncidentService().classify(incident)
+    incident_classification = await incident_service.aclassify(incident)
+    incident_store_service.record(incident, incident_classification)
 
     return incident_classification
+
+@incident_router.post("/report-incidents/batch")
+async def report_incidents_batch(
+    incidents: List[IncidentReport],
+    max_concurrency: Optional[int] = Query(
+        None,
+        ge=1,
+        description="Maximum number of incident reports classified concurrently"
+    ),
+    incident_service: IncidentService = Depends(get_incident_service),
+    incident_store_service: IncidentStoreService = Depends(get_incident_store_service)
+):
+    """
+    Endpoint for reporting several incidents at once.
+
+    Parameters:
+    - incidents (List[IncidentReport]): The incident reports, at most LLM_BATCH_MAX_SIZE.
+    - max_concurrency (int, optional): Maximum number of concurrent classifications.
+
+    Returns:
+    - results (List[ClassificationResult]): one result per incident report, in request
+      order, holding either the classification or the reason it failed.
+    """
+    max_batch_size = app_config[get_environment()].LLM_BATCH_MAX_SIZE
+    if len(incidents) > max_batch_size:
+        raise_with_log(
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            f"A batch may contain at most {max_batch_size} incident reports."
+        )
+
+    results = await incident_service.abatch_classify(incidents, max_concurrency)
+    for incident, result in zip(incidents, results):
+        if result.incident_classification is not None:
+            incident_store_service.record(incident, result.incident_classification)
+
+    return results
+
+async def _parse_incidents(body: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Union[IncidentReport, Exception]]:
+    """
+    Parse and validate the NDJSON request body one incident report at a time,
+    yielding a ValueError for the lines that are not valid incident reports.
+    """
+    async for line in iter_ndjson_lines(body, max_line_bytes):
+        if line is None:
+            yield ValueError(f"Incident report longer than {max_line_bytes} bytes.")
+            continue
+        try:
+            yield IncidentReport.model_validate_json(line)
+        except ValidationError as e:
+            errors = "; ".join(
+                f"{'.'.join(str(part) for part in error['loc']) or 'report'}: {error['msg']}"
+                for error in e.errors()
+            )
+            yield ValueError(f"Invalid incident report: {errors}")
+
+@incident_router.post(
+    "/report-incidents/stream",
+    response_class=NDJSONStreamingResponse,
+    openapi_extra={"requestBody": {"required": True, "content": {NDJSON_MEDIA_TYPE: {}}}}
+)
+async def report_incidents_stream(
+    request: Request,
+    max_concurrency: Optional[int] = Query(
+        None,
+        ge=1,
+        description="Maximum number of incident reports classified concurrently"
+    ),
+    incident_service: IncidentService = Depends(get_incident_service),
+    incident_store_service: IncidentStoreService = Depends(get_incident_store_service)
+):
+    """
+    Endpoint for reporting any number of incidents as a stream.
+
+    The request body is NDJSON (application/x-ndjson), one incident report per line.
+    Reports are classified while the body is still being uploaded, and each result
+    is streamed back as an NDJSON line as soon as it is ready.
+
+    Parameters:
+    - max_concurrency (int, optional): Maximum number of concurrent classifications.
+
+    Returns:
+    - results (NDJSON of ClassificationResult): one result per incident report, in
+      completion order, tagged with the position of the report in the request.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type != NDJSON_MEDIA_TYPE:
+        raise_with_log(
+            status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            f"The incident reports must be sent as {NDJSON_MEDIA_TYPE}."
+        )
+
+    max_line_bytes = app_config[get_environment()].STREAM_MAX_LINE_BYTES
+
+    async def stream_results(body: AsyncIterator[bytes]) -> AsyncIterator[str]:
+        incidents = _parse_incidents(body, max_line_bytes)
+        async for incident, result in incident_service.astream_classify(incidents, max_concurrency):
+            if result.incident_classification is not None:
+                incident_store_service.record(incident, result.incident_classification)
+            yield result.json() + "\n"
+
+    # The response reads the body while it is sent, and cancels the classifications
+    # if the client disconnects
+    return NDJSONStreamingResponse(stream_results)
@@ -0,0 +1,97 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query, status
+from typing import Dict, Literal, Optional
+
+from app.core.exceptions import raise_with_log
+from app.services.incident_store_service import IncidentStoreService, get_incident_store_service
+from app.schemas.incident_store_schema import IncidentCounts, IncidentPage
+
+incident_store_router = APIRouter()
+
+class IncidentFilters:
+    """ Query parameters filtering stored incidents. """
+
+    def __init__(
+        self,
+        language: Optional[str] = Query(None, description="Only incidents with this language"),
+        urgency: Optional[str] = Query(None, description="Only incidents with this urgency"),
+        breach: Optional[str] = Query(None, description="Only incidents with this breach"),
+        category: Optional[str] = Query(None, description="Only incidents with this category"),
+        asset: Optional[str] = Query(None, description="Only incidents with this asset"),
+        since: Optional[datetime] = Query(None, description="Only incidents at or after this time"),
+        until: Optional[datetime] = Query(None, description="Only incidents before this time")
+    ):
+        self.fields: Dict[str, str] = {
+            field_name: value
+            for field_name, value in (
+                ("language", language),
+                ("urgency", urgency),
+                ("breach", breach),
+                ("category", category),
+                ("asset", asset),
+            )
+            if value is not None
+        }
+        self.since = since
+        self.until = until
+
+def _ensure_enabled(incident_store_service: IncidentStoreService) -> None:
+    if not incident_store_service.enabled:
+        raise_with_log(status.HTTP_404_NOT_FOUND, "The incident store is disabled.")
+
+@incident_store_router.get("/incidents", response_model=IncidentPage)
+async def list_incidents(
+    filters: IncidentFilters = Depends(),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of incidents"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    incident_store_service: IncidentStoreService = Depends(get_incident_store_service)
+):
+    """
+    Endpoint for listing stored incidents, most recent first.
+
+    Parameters:
+    - filters (IncidentFilters): Classification values and time range to match.
+    - limit (int): Maximum number of incidents per page.
+    - cursor (str, optional): next_cursor of the previous page.
+
+    Returns:
+    - page (IncidentPage): The incidents, and the cursor of the next page.
+    """
+    _ensure_enabled(incident_store_service)
+    try:
+        incidents, next_cursor = await incident_store_service.list_incidents(
+            filters.fields, filters.since, filters.until, limit, cursor
+        )
+    except ValueError:
+        raise_with_log(status.HTTP_400_BAD_REQUEST, "Invalid cursor.")
+
+    return {"items": incidents, "next_cursor": next_cursor}
+
+@incident_store_router.get("/incidents/counts", response_model=IncidentCounts)
+async def count_incidents(
+    group_by: Literal["language", "urgency", "breach", "category", "asset", "day"] = Query(
+        ...,
+        description="Field the incidents are counted by, or day of the incident"
+    ),
+    filters: IncidentFilters = Depends(),
+    incident_store_service: IncidentStoreService = Depends(get_incident_store_service)
+):
+    """
+    Endpoint for counting stored incidents by a classification field or by day.
+
+    Parameters:
+    - group_by (str): The field to count by.
+    - filters (IncidentFilters): Classification values and time range to match.
+
+    Returns:
+    - counts (IncidentCounts): The number of incidents by value, largest first, or by
+      day in chronological order.
+    """
+    _ensure_enabled(incident_store_service)
+    counts = await incident_store_service.count_incidents(group_by, filters.fields, filters.since, filters.until)
+
+    return {
+        "group_by": group_by,
+        "total": sum(count for _, count in counts),
+        "counts": [{"value": value, "count": count} for value, count in counts]
+    }
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, Query, Response, status
+from typing import Optional
+
+from app.core.exceptions import raise_with_log
+from app.services.job_service import JobService, get_job_service, to_job_schema
+from app.schemas.incident_schema import IncidentReport
+
+job_router = APIRouter()
+
+@job_router.post("/incidents/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_incident_job(
+    incident: IncidentReport,
+    response: Response,
+    callback_url: Optional[str] = Query(
+        None,
+        pattern=r"^https?://",
+        description="URL the finished job is posted to, as JSON"
+    ),
+    job_service: JobService = Depends(get_job_service)
+):
+    """
+    Endpoint for reporting an incident without waiting for its classification.
+
+    The incident report is queued and classified by a background worker. Poll the
+    job at the URL in the Location header, or pass a callback_url to receive the
+    finished job.
+
+    Parameters:
+    - incident (IncidentReport): The incident report details.
+    - callback_url (str, optional): URL the finished job is posted to. Its host must
+      be public, or listed in APP_JOB_CALLBACK_ALLOWED_HOSTS; otherwise 422.
+
+    Returns:
+    - job (Job): The queued job, with its id.
+    """
+    try:
+        job = await job_service.submit(incident, callback_url)
+    except ValueError as e:
+        raise_with_log(status.HTTP_422_UNPROCESSABLE_ENTITY, str(e))
+    except OverflowError:
+        raise_with_log(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            "Too many incident reports are waiting to be classified, please retry later.",
+            headers={"Retry-After": "30"}
+        )
+
+    response.headers["Location"] = f"/incidents/jobs/{job['id']}"
+    return to_job_schema(job)
+
+@job_router.get("/incidents/jobs/{job_id}")
+async def get_incident_job(
+    job_id: str,
+    job_service: JobService = Depends(get_job_service)
+):
+    """
+    Endpoint for polling a classification job.
+
+    Parameters:
+    - job_id (str): The id returned when the job was submitted.
+
+    Returns:
+    - job (Job): The job, with the classification once it succeeded or the error
+      once it failed.
+    """
+    job = await job_service.get(job_id)
+    if job is None:
+        raise_with_log(status.HTTP_404_NOT_FOUND, "Job not found or expired.")
+
+    return to_job_schema(job)
@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import render_metrics
+
+metrics_router = APIRouter()
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse, tags=["status"])
+async def get_metrics():
+    """
+    Get the metrics of this worker in the Prometheus text format.
+
+    Exposes latency histograms of the HTTP requests and of each classification
+    stage (prompt building, queue wait, LLM call, parsing), counters of tokens,
+    cache lookups, retries and errors, and gauges of the requests and LLM calls
+    in flight.
+
+    Returns:
+    - PlainTextResponse: The metrics in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
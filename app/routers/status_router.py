@@ -1,5 +1,7 @@
-from fastapi import APIRouter
-from app.schemas.status_schema import Status
+from fastapi import APIRouter, Depends
+from app.schemas.status_schema import ClassificationStats, JobStats, Status
+from app.services.incident_service import IncidentService, get_incident_service
+from app.services.job_service import JobService, get_job_service
 
 status_router = APIRouter()
 
@@ -14,3 +16,29 @@ async def get_status():
     - Status: An object containing the status message.
     """
     return {"status": "OK", "message": "Service is up and running."}
+
+@status_router.get("/status/classification", response_model=ClassificationStats, tags=["status"])
+async def get_classification_stats(
+    incident_service: IncidentService = Depends(get_incident_service)
+):
+    """
+    Get counters of the classification service.
+
+    Returns:
+    - ClassificationStats: Cache hits, misses, evictions and size, and the number
+      of LLM calls executed and coalesced.
+    """
+    return incident_service.stats()
+
+@status_router.get("/status/jobs", response_model=JobStats, tags=["status"])
+async def get_job_stats(
+    job_service: JobService = Depends(get_job_service)
+):
+    """
+    Get counters of the asynchronous job API.
+
+    Returns:
+    - JobStats: The job queue backend, the number of workers and the number of
+      jobs by status.
+    """
+    return await job_service.stats()
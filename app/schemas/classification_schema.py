@@ -1,4 +1,6 @@
-from langchain_core.pydantic_v1 import BaseModel, Field
+from functools import lru_cache
+from typing import Optional, Tuple, Type
+from langchain_core.pydantic_v1 import BaseModel, Field, create_model
 
 class IncidentClassification(BaseModel):
     language: str = Field(
@@ -22,3 +24,47 @@ class IncidentClassification(BaseModel):
         enum=["Information", "Intangible assets", "People", "Hardware", "Software", "Services", "Offices"]
     )
 
+CLASSIFICATION_FIELDS: Tuple[str, ...] = tuple(IncidentClassification.__fields__)
+
+@lru_cache(maxsize=None)
+def get_partial_classification_schema(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    Returns a schema with only the given fields of IncidentClassification.
+
+    The schema keeps the name IncidentClassification, so the LLM sees the same
+    function as in the few-shot examples. Schemas are cached per field combination.
+
+    Parameters:
+    - fields (Tuple[str, ...]): Fields of IncidentClassification, in schema order.
+
+    Returns:
+    - Type[BaseModel]: IncidentClassification itself if all fields are requested,
+                       otherwise a model with only the requested fields.
+    """
+    if fields == CLASSIFICATION_FIELDS:
+        return IncidentClassification
+    return create_model(
+        "IncidentClassification",
+        **{
+            field_name: (str, Field(..., **IncidentClassification.__fields__[field_name].field_info.extra))
+            for field_name in fields
+        }
+    )
+
+class ClassificationResult(BaseModel):
+    """ Result of classifying one incident report in a batch. """
+    index: int = Field(
+        ...,
+        title="Index",
+        description="Position of the incident report in the request"
+    )
+    incident_classification: Optional[IncidentClassification] = Field(
+        None,
+        title="Incident classification",
+        description="Classification of the incident report, if it succeeded"
+    )
+    error: Optional[str] = Field(
+        None,
+        title="Error",
+        description="Reason the incident report could not be classified, if it failed"
+    )
@@ -1,6 +1,6 @@
 from datetime import datetime
+from functools import lru_cache
 from typing import List, TypedDict
-import json
 
 from app.schemas.incident_schema import IncidentReport, WitnessDetail
 from app.schemas.classification_schema import IncidentClassification
@@ -17,16 +17,10 @@ class Example(TypedDict):
 
 def serialize_example(example: Example) -> dict:
     """Serialize example to a format suitable for JSON encoding."""
-    def default_serializer(obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        if isinstance(obj, IncidentReport):
-            return obj.dict()
-        if isinstance(obj, IncidentClassification):
-            return obj.dict()
-        raise TypeError(f"Type {type(obj)} not serializable")
-
-    return json.loads(json.dumps(example, default=default_serializer))
+    return {
+        "input": example["input"].model_dump(mode="json", exclude={"classification_hints", "urgency"}),
+        "tool_calls": [tool_call.dict() for tool_call in example["tool_calls"]],
+    }
 
 classification_examples: List[Example] = [
     {
@@ -106,5 +100,7 @@ classification_examples: List[Example] = [
     }
 ]
 
-# Apply serialization to each example
-classification_examples_serialized = [serialize_example(example) for example in classification_examples]
+@lru_cache(maxsize=None)
+def get_classification_examples_serialized() -> List[dict]:
+    """Returns the serialized examples, serialized on first use. The list is shared: do not modify it."""
+    return [serialize_example(example) for example in classification_examples]
@@ -1,7 +1,7 @@
 """ Schemas for reporting incidents """ 
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
+from pydantic import BaseModel, Field, field_validator
 
 from app.schemas.classification_schema import IncidentClassification
 
@@ -39,6 +39,30 @@ class IncidentReport(BaseModel):
         title="Witnesses",
         description="Details of the witnesses, if any"
     )
+    classification_hints: Optional[Dict[str, str]] = Field(
+        None,
+        title="Classification hints",
+        description="Classification fields already known by the reporter, e.g. "
+                    "{\"language\": \"norwegian\"}. Only the other fields are predicted."
+    )
+    priority: Optional[Literal["low", "normal", "high", "critical"]] = Field(
+        None,
+        title="Priority",
+        description="How soon the classification is needed. Reports with a higher priority are sent "
+                    "to the LLM first when the rate limits are reached. Defaults to normal."
+    )
+
+    @field_validator("classification_hints")
+    @classmethod
+    def validate_classification_hints(cls, hints: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+        """ Ensures that hints name IncidentClassification fields and allowed values. """
+        for field_name, value in (hints or {}).items():
+            field = IncidentClassification.__fields__.get(field_name)
+            if field is None:
+                raise ValueError(f"Unknown classification field: {field_name}")
+            if value not in field.field_info.extra["enum"]:
+                raise ValueError(f"Invalid value for {field_name}: {value}")
+        return hints
 
 
 class IncidentResponse(BaseModel):
@@ -0,0 +1,76 @@
+""" Schemas for querying stored incidents """
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+class StoredIncident(BaseModel):
+    """ Incident report stored with its classification. """
+    id: int = Field(
+        ...,
+        title="Id",
+        description="Identifier of the stored incident"
+    )
+    incident_datetime: datetime = Field(
+        ...,
+        title="Date and Time",
+        description="Date and time of the incident, in UTC"
+    )
+    location: str = Field(
+        ...,
+        title="Location",
+        description="Location of the incident"
+    )
+    description: str = Field(
+        ...,
+        title="Description",
+        description="Description of the incident"
+    )
+    language: Optional[str] = Field(None, title="Language")
+    urgency: Optional[str] = Field(None, title="Urgency")
+    breach: Optional[str] = Field(None, title="Breach")
+    category: Optional[str] = Field(None, title="Category")
+    asset: Optional[str] = Field(None, title="Asset")
+
+class IncidentPage(BaseModel):
+    """ A page of stored incidents, most recent first. """
+    items: List[StoredIncident] = Field(
+        ...,
+        title="Items",
+        description="Incidents of the page"
+    )
+    next_cursor: Optional[str] = Field(
+        None,
+        title="Next cursor",
+        description="Cursor of the next page, null on the last page"
+    )
+
+class IncidentCount(BaseModel):
+    """ Number of stored incidents with a value. """
+    value: Optional[str] = Field(
+        ...,
+        title="Value",
+        description="Value of the grouping field"
+    )
+    count: int = Field(
+        ...,
+        title="Count",
+        description="Number of incidents with the value"
+    )
+
+class IncidentCounts(BaseModel):
+    """ Number of stored incidents by value of a field. """
+    group_by: str = Field(
+        ...,
+        title="Group by",
+        description="Field the incidents are grouped by"
+    )
+    total: int = Field(
+        ...,
+        title="Total",
+        description="Number of incidents matching the filters"
+    )
+    counts: List[IncidentCount] = Field(
+        ...,
+        title="Counts",
+        description="Number of incidents by value, largest first, or by day in chronological order"
+    )
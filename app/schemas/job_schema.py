@@ -0,0 +1,49 @@
+""" Schema for classification jobs """
+from datetime import datetime
+from typing import Literal, Optional
+from langchain_core.pydantic_v1 import BaseModel, Field
+
+from app.schemas.classification_schema import IncidentClassification
+
+class Job(BaseModel):
+    """ Classification job of an incident report, and its result once finished. """
+    job_id: str = Field(
+        ...,
+        title="Job id",
+        description="Identifier of the job, to poll GET /incidents/jobs/{job_id}"
+    )
+    status: Literal["queued", "running", "succeeded", "failed"] = Field(
+        ...,
+        title="Status",
+        description="Status of the job"
+    )
+    created_at: datetime = Field(
+        ...,
+        title="Created at",
+        description="Time the job was submitted"
+    )
+    started_at: Optional[datetime] = Field(
+        None,
+        title="Started at",
+        description="Time a worker started classifying the incident report"
+    )
+    finished_at: Optional[datetime] = Field(
+        None,
+        title="Finished at",
+        description="Time the job succeeded or failed"
+    )
+    incident_classification: Optional[IncidentClassification] = Field(
+        None,
+        title="Incident classification",
+        description="Classification of the incident report, if the job succeeded"
+    )
+    error: Optional[str] = Field(
+        None,
+        title="Error",
+        description="Reason the incident report could not be classified, if the job failed"
+    )
+    status_code: Optional[int] = Field(
+        None,
+        title="Status code",
+        description="HTTP status code the synchronous endpoint would have answered, if the job failed"
+    )
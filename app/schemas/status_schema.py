@@ -1,4 +1,5 @@
 """ Schema for status endpoint """
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 class Status(BaseModel):
@@ -13,3 +14,253 @@ class Status(BaseModel):
         title="Message",
         description="Message from endpoint."
     )
+
+class CacheStats(BaseModel):
+    """ Counters of the classification cache. """
+    backend: str = Field(
+        ...,
+        title="Backend",
+        description="Cache backend in use."
+    )
+    hits: int = Field(
+        ...,
+        title="Hits",
+        description="Lookups answered from the cache."
+    )
+    misses: int = Field(
+        ...,
+        title="Misses",
+        description="Lookups not found in the cache."
+    )
+    evictions: int = Field(
+        ...,
+        title="Evictions",
+        description="Entries evicted to stay within the size limit."
+    )
+    size: int = Field(
+        ...,
+        title="Size",
+        description="Entries currently in the cache."
+    )
+
+class NearDuplicateStats(BaseModel):
+    """ Counters of the near-duplicate detection. """
+    hits: int = Field(
+        ...,
+        title="Hits",
+        description="Reports that reused the classification of a recent near-duplicate."
+    )
+    misses: int = Field(
+        ...,
+        title="Misses",
+        description="Reports without a recent near-duplicate."
+    )
+    size: int = Field(
+        ...,
+        title="Size",
+        description="Recently classified reports currently indexed."
+    )
+
+class CoalescingStats(BaseModel):
+    """ Counters of the coalescing of concurrent identical classifications. """
+    executed: int = Field(
+        ...,
+        title="Executed",
+        description="Classifications sent to the LLM."
+    )
+    coalesced: int = Field(
+        ...,
+        title="Coalesced",
+        description="Classifications that waited for an identical one already in flight."
+    )
+    in_flight: int = Field(
+        ...,
+        title="In flight",
+        description="Classifications currently waiting for the LLM."
+    )
+
+class LocalClassifierStats(BaseModel):
+    """ Counters of the fields resolved without the LLM. """
+    resolved: int = Field(
+        ...,
+        title="Resolved",
+        description="Classifications answered from hints and the local classifier without calling the LLM."
+    )
+    deferred: int = Field(
+        ...,
+        title="Deferred",
+        description="Classifications passed on to the LLM because some fields were not known."
+    )
+    partial: int = Field(
+        ...,
+        title="Partial",
+        description="Deferred classifications for which only the unknown fields were asked from the LLM."
+    )
+
+class TokenStats(BaseModel):
+    """ Token usage reported by the LLM. """
+    input: int = Field(
+        ...,
+        title="Input",
+        description="Prompt tokens sent to the LLM."
+    )
+    output: int = Field(
+        ...,
+        title="Output",
+        description="Completion tokens generated by the LLM."
+    )
+
+class SchedulerStats(BaseModel):
+    """ Counters of the LLM call scheduler. """
+    in_flight: int = Field(
+        ...,
+        title="In flight",
+        description="LLM calls currently running."
+    )
+    queued: int = Field(
+        ...,
+        title="Queued",
+        description="LLM calls waiting for the rate limits or the concurrency limit."
+    )
+    concurrency_limit: int = Field(
+        ...,
+        title="Concurrency limit",
+        description="Current adaptive limit of concurrent LLM calls."
+    )
+    dispatched: int = Field(
+        ...,
+        title="Dispatched",
+        description="LLM calls admitted by the scheduler."
+    )
+    rate_limited: int = Field(
+        ...,
+        title="Rate limited",
+        description="LLM calls rejected by the provider with HTTP 429."
+    )
+
+class BackendStats(BaseModel):
+    """ Counters of one backend of the LLM router. """
+    name: str = Field(
+        ...,
+        title="Name",
+        description="Name of the backend."
+    )
+    state: str = Field(
+        ...,
+        title="State",
+        description="State of the backend's circuit breaker: closed, open or half_open."
+    )
+    calls: int = Field(
+        ...,
+        title="Calls",
+        description="Calls sent to the backend, hedged calls included."
+    )
+    failures: int = Field(
+        ...,
+        title="Failures",
+        description="Calls that failed or timed out."
+    )
+    wins: int = Field(
+        ...,
+        title="Wins",
+        description="Calls whose answer was used."
+    )
+    p50_ms: float = Field(
+        ...,
+        title="p50 latency",
+        description="Median of the recent latencies in milliseconds."
+    )
+    p95_ms: float = Field(
+        ...,
+        title="p95 latency",
+        description="95th percentile of the recent latencies in milliseconds."
+    )
+
+class RouterStats(BaseModel):
+    """ Counters of the LLM router. """
+    hedged: int = Field(
+        ...,
+        title="Hedged",
+        description="Calls for which a hedged request was sent to a second backend."
+    )
+    failovers: int = Field(
+        ...,
+        title="Failovers",
+        description="Times a call was sent to another backend after an error."
+    )
+    backends: List[BackendStats] = Field(
+        ...,
+        title="Backends",
+        description="Counters of each backend."
+    )
+
+class ClassificationStats(BaseModel):
+    """ Counters of the classification service. """
+    cache: Optional[CacheStats] = Field(
+        None,
+        title="Cache",
+        description="Counters of the classification cache, if enabled."
+    )
+    near_duplicates: Optional[NearDuplicateStats] = Field(
+        None,
+        title="Near-duplicates",
+        description="Counters of the near-duplicate detection, if enabled."
+    )
+    coalescing: CoalescingStats = Field(
+        ...,
+        title="Coalescing",
+        description="Counters of the coalescing of concurrent identical classifications."
+    )
+    local_classifier: LocalClassifierStats = Field(
+        ...,
+        title="Local classifier",
+        description="Counters of the fields resolved without the LLM."
+    )
+    tokens: TokenStats = Field(
+        ...,
+        title="Tokens",
+        description="Token usage reported by the LLM."
+    )
+    scheduler: SchedulerStats = Field(
+        ...,
+        title="Scheduler",
+        description="Counters of the LLM call scheduler."
+    )
+    router: Optional[RouterStats] = Field(
+        None,
+        title="Router",
+        description="Counters of the LLM router, if APP_LLM_BACKEND is router."
+    )
+
+class JobStats(BaseModel):
+    """ Counters of the asynchronous job API. """
+    backend: str = Field(
+        ...,
+        title="Backend",
+        description="Job queue backend in use."
+    )
+    workers: int = Field(
+        ...,
+        title="Workers",
+        description="Background workers of this process."
+    )
+    queued: int = Field(
+        ...,
+        title="Queued",
+        description="Jobs waiting for a worker."
+    )
+    running: int = Field(
+        ...,
+        title="Running",
+        description="Jobs being classified."
+    )
+    succeeded: int = Field(
+        ...,
+        title="Succeeded",
+        description="Finished jobs with a classification, kept until they expire."
+    )
+    failed: int = Field(
+        ...,
+        title="Failed",
+        description="Finished jobs with an error, kept until they expire."
+    )
@@ -0,0 +1,193 @@
+"""
+Reuse of the classifications of reports seen before.
+
+This module answers incident reports without a new LLM call when an identical report
+was classified before (classification cache), when the same incident was reported
+recently in other words (near-duplicate index), or when an identical classification
+is already in flight (single flight).
+
+Classes:
+- ClassificationCache: Cache, near-duplicate index and coalescing of IncidentService.
+"""
+
+from typing import Awaitable, Callable, Optional
+import hashlib
+import json
+
+from app.config import config as app_config
+from app.core import metrics
+from app.core.cache import CacheBackend, create_cache
+from app.core.environment import get_environment
+from app.core.single_flight import SingleFlight
+from app.schemas.classification_schema import IncidentClassification
+from app.schemas.incident_schema import IncidentReport
+from app.utils.json_utils import collapse_whitespace
+from app.utils.near_duplicate_index import NearDuplicateIndex
+from app.utils.prompt_serializer import PromptSerializer
+
+from app.core.logger import get_logger
+logger = get_logger(__name__)
+
+class ClassificationCache(object):
+    """
+    Classifications returned by the LLM, reused for identical reports, recent
+    near-duplicates and concurrent identical requests.
+    """
+
+    def __init__(self, namespace: str, prompt_serializer: PromptSerializer):
+        """
+        Initialize the ClassificationCache with environment settings.
+
+        Parameters:
+        - namespace (str): Fingerprint of everything that shapes the LLM answer (model,
+          prompt, schema, examples), so that changing any of them invalidates old entries.
+        - prompt_serializer (PromptSerializer): Serializer of the reports in prompts;
+          reports with the same prompt share a cache key.
+        """
+        env_config = app_config[get_environment()]
+        self.NAMESPACE = namespace
+        self.PROMPT_SERIALIZER = prompt_serializer
+        self.CACHE: Optional[CacheBackend] = create_cache(
+            env_config.CLASSIFICATION_CACHE_BACKEND,
+            max_entries=env_config.CLASSIFICATION_CACHE_MAX_ENTRIES,
+            ttl_seconds=env_config.CLASSIFICATION_CACHE_TTL,
+            path=env_config.CLASSIFICATION_CACHE_PATH,
+            namespace=namespace
+        )
+
+        # Reports similar to one classified within NEAR_DUPLICATE_WINDOW (the same
+        # incident reported again in other words) reuse its classification.
+        self.NEAR_DUPLICATE_INDEX: Optional[NearDuplicateIndex] = (
+            NearDuplicateIndex(
+                threshold=env_config.NEAR_DUPLICATE_THRESHOLD,
+                window_seconds=env_config.NEAR_DUPLICATE_WINDOW,
+                max_entries=env_config.NEAR_DUPLICATE_MAX_ENTRIES
+            )
+            if env_config.NEAR_DUPLICATE_ENABLED else None
+        )
+
+        # Concurrent requests for the same report share a single LLM call
+        self.SINGLE_FLIGHT = SingleFlight()
+
+    def key(self, incident: IncidentReport) -> str:
+        """
+        Build the cache key of an incident report.
+
+        The key is a hash of the cache namespace, the canonical JSON of the report
+        fields sent to the LLM and the classification hints, with whitespace in text
+        fields collapsed so that reports differing only in spacing share a key.
+        Fields left out of the prompt (e.g. witness contacts) and the priority do not
+        change the classification and are left out.
+        """
+        incident_dict = {
+            "report": collapse_whitespace(self.PROMPT_SERIALIZER.dump(incident)),
+            "classification_hints": incident.classification_hints
+        }
+        canonical_json = json.dumps(incident_dict, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(f"{self.NAMESPACE}:{canonical_json}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[IncidentClassification]:
+        """
+        Returns the cached classification for key, if any.
+        """
+        if self.CACHE is None:
+            return None
+        return self._to_classification(key, self.CACHE.get(key))
+
+    async def aget(self, key: str) -> Optional[IncidentClassification]:
+        """
+        Returns the cached classification for key, if any, without blocking the event
+        loop on the cache's I/O.
+        """
+        if self.CACHE is None:
+            return None
+        return self._to_classification(key, await self.CACHE.aget(key))
+
+    @staticmethod
+    def _to_classification(key: str, cached: Optional[dict]) -> Optional[IncidentClassification]:
+        """
+        Records a cache lookup and converts its value into a classification.
+        """
+        if cached is None:
+            metrics.CACHE_MISSES.inc()
+            return None
+        metrics.CACHE_HITS.inc()
+        logger.info(f"Classification cache hit for key {key}")
+        return IncidentClassification(**cached)
+
+    @staticmethod
+    def _near_duplicate_text(incident: IncidentReport) -> str:
+        return f"{incident.description}\n{incident.location}"
+
+    def get_near_duplicate(self, incident: IncidentReport) -> Optional[IncidentClassification]:
+        """
+        Returns the classification of a near-duplicate of the incident report classified
+        recently, if any, with the client's hints applied.
+        """
+        if self.NEAR_DUPLICATE_INDEX is None:
+            return None
+        near_duplicate = self.NEAR_DUPLICATE_INDEX.query(self._near_duplicate_text(incident))
+        if near_duplicate is None:
+            metrics.NEAR_DUPLICATE_MISSES.inc()
+            return None
+        metrics.NEAR_DUPLICATE_HITS.inc()
+        logger.info(
+            f"Incident report is a near-duplicate of {near_duplicate.key} "
+            f"(similarity {near_duplicate.similarity:.2f})"
+        )
+        return IncidentClassification(**{**near_duplicate.value, **(incident.classification_hints or {})})
+
+    def remember(self, key: str, incident: IncidentReport, incident_classification: IncidentClassification) -> None:
+        """
+        Stores a classification returned by the LLM in the cache and the near-duplicate index.
+        """
+        if self.CACHE is not None:
+            self.CACHE.set(key, incident_classification.dict())
+        self._remember_near_duplicate(key, incident, incident_classification)
+
+    async def aremember(
+        self,
+        key: str,
+        incident: IncidentReport,
+        incident_classification: IncidentClassification
+    ) -> None:
+        """
+        Asynchronous remember, writing to the cache off the event loop.
+        """
+        if self.CACHE is not None:
+            await self.CACHE.aset(key, incident_classification.dict())
+        self._remember_near_duplicate(key, incident, incident_classification)
+
+    def _remember_near_duplicate(
+        self,
+        key: str,
+        incident: IncidentReport,
+        incident_classification: IncidentClassification
+    ) -> None:
+        if self.NEAR_DUPLICATE_INDEX is not None:
+            self.NEAR_DUPLICATE_INDEX.add(key, self._near_duplicate_text(incident), incident_classification.dict())
+
+    async def coalesce(
+        self,
+        key: str,
+        priority: int,
+        func: Callable[[], Awaitable[IncidentClassification]]
+    ) -> IncidentClassification:
+        """
+        Run func, the classification of the report with cache key key, or wait for
+        the identical classification already in flight with the same priority.
+
+        Reports of different priorities do not share a call: a report of high priority
+        would otherwise wait for a call queued behind others with a low priority.
+        """
+        return await self.SINGLE_FLIGHT.do(f"{key}:{priority}", func)
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the cache, the near-duplicate index and the coalescing.
+        """
+        return {
+            "cache": self.CACHE.stats() if self.CACHE is not None else None,
+            "near_duplicates": self.NEAR_DUPLICATE_INDEX.stats() if self.NEAR_DUPLICATE_INDEX is not None else None,
+            "coalescing": self.SINGLE_FLIGHT.stats(),
+        }
@@ -1,88 +1,752 @@
-from fastapi import status
+from fastapi import Request
+from fastapi.exceptions import HTTPException
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple, Union
+import asyncio
+import hashlib
 import json
+import time
 
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langchain_core.language_models import BaseChatModel
 
+from app.config import config as app_config
+from app.core.llm_router import RoutedChatModel
+from app.core.llm_scheduler import REPORT_PRIORITIES
+from app.core import metrics
 from app.core.llm_session import get_llm
 from app.core.environment import get_environment
-from app.core.exceptions import raise_with_log
+from app.core.exceptions import LLMInvalidOutputError, raise_with_log, to_classification_error
 
+from app.services.classification_cache import ClassificationCache
+from app.services.llm_invoker import LLMInvoker, record_usage
+from app.services.local_classifier import LocalClassifier
+
+from app.utils.classification_repair import get_field_enum
 from app.utils.classification_utils import tool_example_to_messages
-from app.utils.json_utils import convert_datetimes_to_iso
+from app.utils.example_selector import ExampleSelector
+from app.utils.prompt_serializer import PromptSerializer
+from app.utils.prompt_budget import PromptBudget
+from app.utils.token_utils import TOKENS_PER_MESSAGE, TokenCounter
 
 from app.schemas.incident_schema import IncidentReport
-from app.schemas.classification_schema import IncidentClassification
-from app.schemas.examples.classification_examples import classification_examples_serialized
+from app.schemas.classification_schema import (
+    CLASSIFICATION_FIELDS,
+    ClassificationResult,
+    IncidentClassification,
+    get_partial_classification_schema,
+)
+from app.schemas.examples.classification_examples import (
+    classification_examples,
+    get_classification_examples_serialized
+)
 
 from app.core.logger import get_logger
 logger = get_logger(__name__)
+# Per-request payloads, sampled and rate limited (LOG_PAYLOAD_*)
+payload_logger = get_logger("payload")
+
+@lru_cache(maxsize=None)
+def _get_example_selector() -> ExampleSelector:
+    """ Returns the index of the few-shot examples, shared by the services of the process. """
+    return ExampleSelector(
+        [example["input"]["description"] for example in get_classification_examples_serialized()]
+    )
+
+# Compiled chain, example messages, raw tokens of the fixed prompt parts and of each example
+_FieldChain = Tuple[Runnable, List[List[BaseMessage]], int, List[int]]
+
+@lru_cache(maxsize=None)
+def _get_token_counter() -> TokenCounter:
+    """ Returns the token counter of the prompts, calibrated on the usage of all calls of the process. """
+    return TokenCounter(app_config[get_environment()].PROMPT_TOKENIZER or None)
+
+@lru_cache(maxsize=None)
+def _get_prompt_serializer() -> PromptSerializer:
+    """
+    Returns the serializer of the incident reports in prompts, live and few-shot alike.
+    Hints and priority are handled by the service, and never sent to the LLM.
+    """
+    env_config = app_config[get_environment()]
+    return PromptSerializer(
+        env_config.PROMPT_INCIDENT_FIELDS,
+        env_config.PROMPT_FORMAT,
+        exclude={"classification_hints", "priority"}
+    )
 
 class IncidentService:
+    # Compiled chains, example messages and fixed token estimates by combination of
+    # requested fields, per LLM (the process-wide client of get_llm). Entries hold the
+    # LLM they were compiled for, so that its id cannot be reused by another LLM.
+    # They are read-only, so all service instances share them; see preload.
+    _shared_field_chains: Dict[int, Tuple[BaseChatModel, Dict[Tuple[str, ...], _FieldChain]]] = {}
+
+    PROMPT_TEMPLATE = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                "Extract the desired information from the following incident report. "
+                "Only extract the properties mentioned in the 'IncidentClassification' function."
+            ),
+            MessagesPlaceholder("examples", optional=True),
+            ("human", "incident report:\n{input}"),
+        ]
+    )
+
     def __init__(self):
         """
         Initialize the IncidentService with environment settings and LLM.
+
+        The prompt, the few-shot example messages and the structured output chain
+        are identical for every request, so they are compiled once and reused.
+        The service is meant to be long-lived, see get_incident_service.
         """
         self.ENVIRONMENT = get_environment()
         self.LLM = get_llm()
-        self.PROMPT_TEMPLATE = ChatPromptTemplate.from_template(
-            """
-            Extract the desired information from the following incident report.
-
-            Only extract the properties mentioned in the 'IncidentClassification' function.
 
-            incident report:
-            {input}
-            """
-        )
-        
         if self.LLM is None:
             raise RuntimeError("Failed to retrieve the language model!")
 
+        # Few-shot examples are converted to messages once; for each report the
+        # FEW_SHOT_EXAMPLES_K most similar examples are selected from the pool.
+        env_config = app_config[self.ENVIRONMENT]
+        self.FEW_SHOT_EXAMPLES_K = env_config.FEW_SHOT_EXAMPLES_K
+        self.EXAMPLE_SELECTOR = _get_example_selector()
+        self.PROMPT_SERIALIZER = _get_prompt_serializer()
+
+        # Prompts above PROMPT_MAX_TOKENS lose their least similar examples, then the
+        # middle of their description
+        self.TOKEN_COUNTER = _get_token_counter()
+        self.PROMPT_BUDGET = PromptBudget(env_config.PROMPT_MAX_TOKENS, self.TOKEN_COUNTER)
+
+        # Fields that are already known (client hints, confident local predictions) are
+        # not asked from the LLM. A structured output chain and example messages are
+        # compiled per combination of requested fields, the full schema up front.
+        self._field_chains = self._get_shared_field_chains(self.LLM)
+        self._get_field_chain(CLASSIFICATION_FIELDS)
+
+        # Asynchronous calls go through the per-worker LLM scheduler; synchronous
+        # calls (CLI and scripts) are only routed. Both retry transient errors and
+        # repair answers that do not match the schema.
+        self.LLM_INVOKER = LLMInvoker(self.LLM, self.TOKEN_COUNTER, self._estimate_fixed_tokens)
+        self.TAGGING_CHAIN = RunnableLambda(self._invoke, afunc=self._ainvoke)
+
+        # Local cascade stage: the LLM is only called when the local classifier is
+        # less confident than LOCAL_CLASSIFIER_THRESHOLD.
+        self.LOCAL_CLASSIFIER: Optional[LocalClassifier] = (
+            LocalClassifier.load(env_config.LOCAL_CLASSIFIER_MODEL_PATH)
+            if env_config.LOCAL_CLASSIFIER_ENABLED else None
+        )
+        self.LOCAL_CLASSIFIER_THRESHOLD = env_config.LOCAL_CLASSIFIER_THRESHOLD
+
+        # Classifications are reused for identical reports (cache), recent
+        # near-duplicates and concurrent identical requests. Cache keys include a
+        # fingerprint of everything that shapes the LLM answer, so changing the
+        # model, prompt, schema or examples invalidates old entries.
+        self.CLASSIFICATION_CACHE = ClassificationCache(self._build_cache_namespace(), self.PROMPT_SERIALIZER)
+
         logger.info(f"Initialized IncidentService with environment: {self.ENVIRONMENT}")
-    
-    def classify(self, incident: IncidentReport) -> IncidentClassification:
-        """
-        Classify the given incident report into IncidentClassification.
-        """
-        try:
-            messages = []
-            for example in classification_examples_serialized:
-                example_messages = tool_example_to_messages(
-                    {
-                        "input": example["input"],
-                        "tool_calls": example["tool_calls"]
-                    }
-                )
-                messages.extend(example_messages)
 
-            # Ensuring that the LLM has structured output capability
-            llm_with_structured_output = self.LLM.with_structured_output(schema=IncidentClassification)
-            tagging_chain = self.PROMPT_TEMPLATE | llm_with_structured_output
+    @classmethod
+    def preload(cls) -> None:
+        """
+        Build the read-only state shared by the services of the process: the LLM client,
+        the serialized few-shot examples and their index, the classification schema
+        models and the compiled chain of the full schema.
 
-            # Convert the incident to a dictionary before passing it to the LLM
-            incident_dict = convert_datetimes_to_iso(incident.dict())
+        The production server calls it before forking its workers, so that they share
+        this state copy-on-write instead of each building it. Nothing holding sockets,
+        files or threads is built here: those belong to each worker.
+        """
+        llm = get_llm()
+        _get_example_selector()
+        field_chains = cls._get_shared_field_chains(llm)
+        if CLASSIFICATION_FIELDS not in field_chains:
+            field_chains[CLASSIFICATION_FIELDS] = cls._compile_field_chain(llm, CLASSIFICATION_FIELDS)
 
-            incident_json = json.dumps(incident_dict)
+    @classmethod
+    def _get_shared_field_chains(cls, llm: BaseChatModel) -> Dict[Tuple[str, ...], _FieldChain]:
+        """
+        Returns the compiled chains of llm by combination of requested fields.
+        """
+        return cls._shared_field_chains.setdefault(id(llm), (llm, {}))[1]
 
-            # Invoke the LLM with the incident data and examples
-            incident_classification = tagging_chain.invoke(
+    @classmethod
+    def _build_example_messages(cls, fields: Tuple[str, ...]) -> List[List[BaseMessage]]:
+        """
+        Convert each few-shot classification example into LLM messages, with tool
+        calls restricted to the given fields.
+        """
+        schema = get_partial_classification_schema(fields)
+        prompt_serializer = _get_prompt_serializer()
+        return [
+            tool_example_to_messages(
                 {
-                    "input": incident_json,
-                    "examples": messages
+                    # Rendered like the reports to classify
+                    "input": prompt_serializer.serialize(example["input"]),
+                    "tool_calls": [
+                        schema(**{field_name: tool_call[field_name] for field_name in fields})
+                        for tool_call in serialized_example["tool_calls"]
+                    ]
                 }
             )
+            for example, serialized_example in zip(classification_examples, get_classification_examples_serialized())
+        ]
+
+    @classmethod
+    def _build_tagging_chain(cls, llm: BaseChatModel, fields: Tuple[str, ...]) -> Runnable:
+        """
+        Build the prompt and structured output chain asking the LLM for the given fields.
+        """
+        # Ensuring that the LLM has structured output capability
+        llm_with_structured_output = llm.with_structured_output(
+            schema=get_partial_classification_schema(fields),
+            include_raw=True
+        )
+        return cls.PROMPT_TEMPLATE | llm_with_structured_output
+
+    @classmethod
+    def _estimate_fixed_tokens(cls, fields: Tuple[str, ...]) -> int:
+        """
+        Count the raw tokens of a call that do not depend on the report: the system
+        message, the tool definition and the completion.
+        """
+        counter = _get_token_counter()
+        schema = get_partial_classification_schema(fields)
+        system_prompt = cls.PROMPT_TEMPLATE.messages[0].prompt.template
+        tool = json.dumps(convert_to_openai_tool(schema))
+        completion = json.dumps({
+            field_name: max(schema.__fields__[field_name].field_info.extra["enum"], key=len)
+            for field_name in fields
+        })
+        return 2 * TOKENS_PER_MESSAGE + counter.count(system_prompt) + counter.count(tool) + counter.count(completion)
+
+    @classmethod
+    def _compile_field_chain(
+        cls,
+        llm: BaseChatModel,
+        fields: Tuple[str, ...]
+    ) -> _FieldChain:
+        example_messages = cls._build_example_messages(fields)
+        counter = _get_token_counter()
+        return (
+            cls._build_tagging_chain(llm, fields),
+            example_messages,
+            cls._estimate_fixed_tokens(fields),
+            [counter.count_messages(messages) for messages in example_messages]
+        )
+
+    def _get_field_chain(self, fields: Tuple[str, ...]) -> _FieldChain:
+        """
+        Returns the compiled chain, the example messages, and the raw tokens of the
+        fixed prompt parts and of each example for the given fields.
+        """
+        field_chain = self._field_chains.get(fields)
+        if field_chain is None:
+            field_chain = self._compile_field_chain(self.LLM, fields)
+            self._field_chains[fields] = field_chain
+        return field_chain
+
+    def _route_chain_input(self, chain_input: dict) -> Runnable:
+        """
+        Returns the chain for the fields requested by a chain input. The returned chain
+        is invoked by TAGGING_CHAIN with the same input.
+        """
+        return self._get_field_chain(chain_input["fields"])[0]
+
+    def _invoke(self, chain_input: dict, config: RunnableConfig) -> Any:
+        """
+        Invoke the chain for the fields requested by a chain input, see LLMInvoker.invoke.
+        """
+        return self.LLM_INVOKER.invoke(self._route_chain_input(chain_input), chain_input, config)
+
+    async def _ainvoke(self, chain_input: dict, config: RunnableConfig) -> Any:
+        """
+        Invoke the chain for the fields requested by a chain input once the LLM
+        scheduler admits the call, see LLMInvoker.ainvoke.
+        """
+        return await self.LLM_INVOKER.ainvoke(self._route_chain_input(chain_input), chain_input, config)
+
+    def _build_cache_namespace(self) -> str:
+        """
+        Fingerprint the model name, prompt template, classification schema and
+        few-shot examples.
+        """
+        fingerprint = json.dumps(
+            {
+                "model": getattr(self.LLM, "model_name", None) or type(self.LLM).__name__,
+                "prompt": self.PROMPT_TEMPLATE.pretty_repr(),
+                "schema": IncidentClassification.schema(),
+                "examples": get_classification_examples_serialized(),
+                "few_shot_examples_k": self.FEW_SHOT_EXAMPLES_K,
+                "prompt_serializer": self.PROMPT_SERIALIZER.fingerprint(),
+                "prompt_max_tokens": self.PROMPT_BUDGET.max_tokens,
+                "local_classifier": [
+                    app_config[self.ENVIRONMENT].LOCAL_CLASSIFIER_MODEL_PATH,
+                    self.LOCAL_CLASSIFIER_THRESHOLD
+                ] if self.LOCAL_CLASSIFIER is not None else None,
+            },
+            sort_keys=True
+        )
+        return hashlib.sha256(fingerprint.encode()).hexdigest()
+
+    def _resolve_known_fields(self, incident: IncidentReport) -> Dict[str, str]:
+        """
+        Returns the classification fields known without the LLM: the client's hints
+        and the fields predicted confidently enough by the local classifier.
+        """
+        known_fields = {}
+        if self.LOCAL_CLASSIFIER is not None:
+            prediction = self.LOCAL_CLASSIFIER.predict(incident)
+            known_fields.update(prediction.confident_fields(self.LOCAL_CLASSIFIER_THRESHOLD))
+        known_fields.update(incident.classification_hints or {})
+
+        if len(known_fields) == len(CLASSIFICATION_FIELDS):
+            metrics.LOCAL_RESOLVED.inc()
+            logger.info("Classified incident report without the LLM")
+        elif known_fields:
+            metrics.LOCAL_PARTIAL.inc()
+        else:
+            metrics.LOCAL_DEFERRED.inc()
+        return known_fields
+
+    def stats(self) -> dict:
+        """
+        Returns the counters of the service. The counters of the local classifier and
+        of the tokens are read from the metrics of the process.
+        """
+        return {
+            **self.CLASSIFICATION_CACHE.stats(),
+            "local_classifier": {
+                "resolved": metrics.LOCAL_RESOLVED.value,
+                "deferred": metrics.LOCAL_PARTIAL.value + metrics.LOCAL_DEFERRED.value,
+                "partial": metrics.LOCAL_PARTIAL.value
+            },
+            "tokens": {
+                "input": metrics.LLM_INPUT_TOKENS.value,
+                "output": metrics.LLM_OUTPUT_TOKENS.value
+            },
+            "scheduler": LLMInvoker.get_scheduler().stats(),
+            "router": self.LLM.stats() if isinstance(self.LLM, RoutedChatModel) else None
+        }
+
+    def _build_chain_input(self, incident: IncidentReport, known_fields: Dict[str, str]) -> dict:
+        """
+        Build the input for the tagging chain from the incident report and the few-shot
+        examples most similar to it, asking only for the fields that are not known yet.
+
+        The prompt is kept within PROMPT_MAX_TOKENS: the least similar examples are
+        dropped first, then the middle of the description is cut.
+        """
+        started = time.perf_counter()
+        fields = tuple(field_name for field_name in CLASSIFICATION_FIELDS if field_name not in known_fields)
+        _, example_messages, fixed_tokens, example_tokens = self._get_field_chain(fields)
+
+        selected = self.EXAMPLE_SELECTOR.select(incident.description, self.FEW_SHOT_EXAMPLES_K)
+        report = self.PROMPT_SERIALIZER.serialize(incident)
+        plan = self.PROMPT_BUDGET.fit(
+            fixed_tokens,
+            [example_tokens[index] for index in selected],
+            TOKENS_PER_MESSAGE + self.TOKEN_COUNTER.count(report),
+            incident.description
+        )
+        if plan.examples < len(selected):
+            metrics.PROMPT_SHRINKS.labels("examples_dropped").inc()
+        if plan.description is not None:
+            metrics.PROMPT_SHRINKS.labels("description_truncated").inc()
+            report = self.PROMPT_SERIALIZER.serialize(incident.model_copy(update={"description": plan.description}))
+
+        chain_input = {
+            "input": report,
+            "examples": [
+                message for index in selected[len(selected) - plan.examples:] for message in example_messages[index]
+            ],
+            "fields": fields,
+            "priority": REPORT_PRIORITIES[incident.priority or "normal"],
+            "tokens": plan.tokens
+        }
+        metrics.PROMPT_BUILD_SECONDS.observe(time.perf_counter() - started)
+        return chain_input
+
+    def _parse_classification(
+        self,
+        incident_classification,
+        known_fields: Dict[str, str]
+    ) -> IncidentClassification:
+        """
+        Parse the LLM response and merge it with the known fields into an
+        IncidentClassification.
+        """
+        started = time.perf_counter()
+        try:
+            payload_logger.info("LLM response: %r", incident_classification)
 
-            logger.info(f"LLM response: {incident_classification} (type: {type(incident_classification)})")
+            # Structured output with the raw message: record token usage, surface parsing errors
+            if isinstance(incident_classification, dict) and "raw" in incident_classification:
+                record_usage(incident_classification["raw"])
+                if incident_classification.get("parsing_error") is not None:
+                    raise incident_classification["parsing_error"]
+                incident_classification = incident_classification["parsed"]
+                if incident_classification is None:
+                    raise LLMInvalidOutputError("The LLM response contains no classification.")
+                invalid_fields = [
+                    field_name for field_name, value in incident_classification.dict().items()
+                    if value not in get_field_enum(field_name)
+                ]
+                if invalid_fields:
+                    raise LLMInvalidOutputError(f"Values outside the schema for {', '.join(invalid_fields)}")
 
             if isinstance(incident_classification, str):
                 incident_classification = json.loads(incident_classification)
-                logger.info(f"Parsed JSON response: {incident_classification} (type: {type(incident_classification)})")
+                payload_logger.info("Parsed JSON response: %r", incident_classification)
+
+            if not isinstance(incident_classification, IncidentClassification) or known_fields:
+                if not isinstance(incident_classification, dict):
+                    incident_classification = incident_classification.dict()
+                incident_classification = IncidentClassification(**{**incident_classification, **known_fields})
+                payload_logger.info("Converted to Classification object: %r", incident_classification)
+
+            return incident_classification
+        finally:
+            metrics.PARSE_SECONDS.observe(time.perf_counter() - started)
+
+    def classify(self, incident: IncidentReport) -> IncidentClassification:
+        """
+        Classify the given incident report into IncidentClassification.
+        """
+        try:
+            cache_key = self.CLASSIFICATION_CACHE.key(incident)
+            cached_classification = self.CLASSIFICATION_CACHE.get(cache_key)
+            if cached_classification is not None:
+                return cached_classification
+
+            near_duplicate_classification = self.CLASSIFICATION_CACHE.get_near_duplicate(incident)
+            if near_duplicate_classification is not None:
+                return near_duplicate_classification
+
+            known_fields = self._resolve_known_fields(incident)
+            if len(known_fields) == len(CLASSIFICATION_FIELDS):
+                return IncidentClassification(**known_fields)
 
-            if not isinstance(incident_classification, IncidentClassification):
-                incident_classification = IncidentClassification(**incident_classification)
-                logger.info(f"Converted to Classification object: {incident_classification} (type: {type(incident_classification)})")
+            chain_input = self._build_chain_input(incident, known_fields)
 
+            # Invoke the LLM with the incident data and examples
+            incident_classification = self.TAGGING_CHAIN.invoke(chain_input)
+
+            incident_classification = self._parse_classification(incident_classification, known_fields)
+            self.CLASSIFICATION_CACHE.remember(cache_key, incident, incident_classification)
             return incident_classification
         except Exception as e:
-            logger.error(f"Error in classification of incident report: {e}")
-            raise_with_log(status.HTTP_422_UNPROCESSABLE_ENTITY, "Could not classify incident report.")
+            error = to_classification_error(e)
+            metrics.CLASSIFICATION_ERRORS.labels(error.kind).inc()
+            logger.error(f"Error in classification of incident report ({error.kind}): {e}")
+            raise_with_log(error.status_code, error.detail, headers=error.headers)
+
+    async def _ainvoke_classification(
+        self,
+        incident: IncidentReport,
+        known_fields: Dict[str, str],
+        cache_key: str
+    ) -> IncidentClassification:
+        """
+        Classify the incident report with the LLM and cache the result.
+        """
+        chain_input = self._build_chain_input(incident, known_fields)
+
+        # Invoke the LLM with the incident data and examples
+        incident_classification = await self.TAGGING_CHAIN.ainvoke(chain_input)
+
+        incident_classification = self._parse_classification(incident_classification, known_fields)
+        await self.CLASSIFICATION_CACHE.aremember(cache_key, incident, incident_classification)
+        return incident_classification
+
+    async def aclassify(self, incident: IncidentReport) -> IncidentClassification:
+        """
+        Asynchronously classify the given incident report into IncidentClassification.
+
+        The LLM call does not block the event loop and is admitted by the per-worker
+        LLM scheduler, within LLM_MAX_CONCURRENCY and the configured rate limits.
+        Concurrent calls for the same report (same cache key) share a single LLM call.
+        """
+        try:
+            cache_key = self.CLASSIFICATION_CACHE.key(incident)
+            cached_classification = await self.CLASSIFICATION_CACHE.aget(cache_key)
+            if cached_classification is not None:
+                return cached_classification
+
+            near_duplicate_classification = self.CLASSIFICATION_CACHE.get_near_duplicate(incident)
+            if near_duplicate_classification is not None:
+                return near_duplicate_classification
+
+            known_fields = self._resolve_known_fields(incident)
+            if len(known_fields) == len(CLASSIFICATION_FIELDS):
+                return IncidentClassification(**known_fields)
+
+            return await self.CLASSIFICATION_CACHE.coalesce(
+                cache_key,
+                REPORT_PRIORITIES[incident.priority or "normal"],
+                lambda: self._ainvoke_classification(incident, known_fields, cache_key)
+            )
+        except Exception as e:
+            error = to_classification_error(e)
+            metrics.CLASSIFICATION_ERRORS.labels(error.kind).inc()
+            logger.error(f"Error in classification of incident report ({error.kind}): {e}")
+            raise_with_log(error.status_code, error.detail, headers=error.headers)
+
+    def _get_batch_max_concurrency(self, max_concurrency: Optional[int]) -> int:
+        """
+        Returns the batch concurrency, capped by the per-worker LLM concurrency limit.
+        """
+        env_config = app_config[self.ENVIRONMENT]
+        return min(
+            max_concurrency or env_config.LLM_BATCH_MAX_CONCURRENCY,
+            env_config.LLM_MAX_CONCURRENCY
+        )
+
+    def _collect_batch_results(
+        self,
+        incidents: List[IncidentReport],
+        outputs: List[Any],
+        cache_keys: List[str],
+        known_fields: Dict[int, Dict[str, str]]
+    ) -> List[ClassificationResult]:
+        """
+        Parse batch outputs in order, turning per-item failures into error results
+        and caching the classifications returned by the LLM. An LLM output shared by
+        identical reports is parsed once.
+
+        Parameters:
+        - incidents (List[IncidentReport]): The incident reports.
+        - outputs (List[Any]): Resolved classification, LLM output or exception per report.
+        - cache_keys (List[str]): Cache key per report.
+        - known_fields (Dict[int, Dict[str, str]]): Known fields of the reports whose
+          output is an LLM output to parse, by index.
+        """
+        results = []
+        parsed: Dict[str, Any] = {}  # Classification or exception by cache key
+        for index, (output, cache_key) in enumerate(zip(outputs, cache_keys)):
+            try:
+                if index in known_fields and not isinstance(output, Exception):
+                    if cache_key not in parsed:
+                        try:
+                            parsed[cache_key] = self._parse_classification(output, known_fields[index])
+                            self.CLASSIFICATION_CACHE.remember(cache_key, incidents[index], parsed[cache_key])
+                        except Exception as e:
+                            parsed[cache_key] = e
+                    output = parsed[cache_key]
+                if isinstance(output, Exception):
+                    raise output
+                incident_classification = output
+                results.append(
+                    ClassificationResult(
+                        index=index,
+                        incident_classification=incident_classification
+                    )
+                )
+            except Exception as e:
+                error = to_classification_error(e)
+                metrics.CLASSIFICATION_ERRORS.labels(error.kind).inc()
+                logger.error(f"Error in classification of incident report {index} in batch ({error.kind}): {e}")
+                results.append(
+                    ClassificationResult(
+                        index=index,
+                        error=error.detail
+                    )
+                )
+        return results
+
+    def _split_resolved(
+        self,
+        incidents: List[IncidentReport],
+        cache_keys: List[str],
+        cached: List[Optional[IncidentClassification]]
+    ) -> tuple:
+        """
+        Resolve a batch of incident reports from the cache, recent near-duplicates or
+        without the LLM.
+
+        Parameters:
+        - incidents (List[IncidentReport]): The incident reports.
+        - cache_keys (List[str]): Cache key per report.
+        - cached (List[Optional[IncidentClassification]]): Cached classification per report.
+
+        Returns:
+        - tuple: (outputs holding the resolved classifications or None,
+                  known fields of the reports that must be sent to the LLM by index).
+        """
+        outputs: List[Any] = []
+        pending: Dict[int, Dict[str, str]] = {}
+        for index, (incident, resolved) in enumerate(zip(incidents, cached)):
+            if resolved is None:
+                resolved = self.CLASSIFICATION_CACHE.get_near_duplicate(incident)
+            if resolved is None:
+                known_fields = self._resolve_known_fields(incident)
+                if len(known_fields) == len(CLASSIFICATION_FIELDS):
+                    resolved = IncidentClassification(**known_fields)
+                else:
+                    pending[index] = known_fields
+            outputs.append(resolved)
+        return outputs, pending
+
+    @staticmethod
+    def _unique_pending(
+        incidents: List[IncidentReport],
+        pending: Dict[int, Dict[str, str]],
+        cache_keys: List[str]
+    ) -> Dict[str, int]:
+        """
+        Returns the index of the pending report of each cache key that is classified
+        for all the reports with this key, by cache key: the first report of the
+        highest priority, so that the shared call is scheduled by it.
+        """
+        unique: Dict[str, int] = {}
+        for index in sorted(pending, key=lambda index: -REPORT_PRIORITIES[incidents[index].priority or "normal"]):
+            unique.setdefault(cache_keys[index], index)
+        return unique
+
+    def batch_classify(
+        self,
+        incidents: List[IncidentReport],
+        max_concurrency: Optional[int] = None
+    ) -> List[ClassificationResult]:
+        """
+        Classify several incident reports, returning one result per report in order.
+
+        A report that cannot be classified yields a result with an error instead of
+        failing the whole batch.
+        """
+        cache_keys = [self.CLASSIFICATION_CACHE.key(incident) for incident in incidents]
+        cached = [self.CLASSIFICATION_CACHE.get(cache_key) for cache_key in cache_keys]
+        outputs, pending = self._split_resolved(incidents, cache_keys, cached)
+        if pending:
+            # Identical reports in the batch share one LLM call
+            unique = self._unique_pending(incidents, pending, cache_keys)
+            chain_inputs = [
+                self._build_chain_input(incidents[index], pending[index])
+                for index in unique.values()
+            ]
+            unique_outputs = dict(zip(unique, self.TAGGING_CHAIN.batch(
+                chain_inputs,
+                config={"max_concurrency": self._get_batch_max_concurrency(max_concurrency)},
+                return_exceptions=True
+            )))
+            for index in pending:
+                outputs[index] = unique_outputs[cache_keys[index]]
+        return self._collect_batch_results(incidents, outputs, cache_keys, pending)
+
+    async def abatch_classify(
+        self,
+        incidents: List[IncidentReport],
+        max_concurrency: Optional[int] = None
+    ) -> List[ClassificationResult]:
+        """
+        Asynchronously classify several incident reports, returning one result per
+        report in order.
+
+        At most max_concurrency reports (default LLM_BATCH_MAX_CONCURRENCY, capped by
+        LLM_MAX_CONCURRENCY) are sent to the LLM at the same time. Identical reports
+        share one LLM call, within the batch and with concurrent requests (see
+        aclassify). A report that cannot be classified yields a result with an error
+        instead of failing the whole batch.
+        """
+        cache_keys = [self.CLASSIFICATION_CACHE.key(incident) for incident in incidents]
+        cached = await asyncio.gather(*(self.CLASSIFICATION_CACHE.aget(cache_key) for cache_key in cache_keys))
+        outputs, pending = self._split_resolved(incidents, cache_keys, cached)
+        if pending:
+            slots = asyncio.Semaphore(self._get_batch_max_concurrency(max_concurrency))
+
+            async def classify(index: int) -> IncidentClassification:
+                async with slots:
+                    return await self.CLASSIFICATION_CACHE.coalesce(
+                        cache_keys[index],
+                        REPORT_PRIORITIES[incidents[index].priority or "normal"],
+                        lambda: self._ainvoke_classification(incidents[index], pending[index], cache_keys[index])
+                    )
+
+            unique = self._unique_pending(incidents, pending, cache_keys)
+            unique_outputs = dict(zip(unique, await asyncio.gather(
+                *(classify(index) for index in unique.values()),
+                return_exceptions=True
+            )))
+            for index in pending:
+                outputs[index] = unique_outputs[cache_keys[index]]
+        # Parsed and cached by _ainvoke_classification
+        return self._collect_batch_results(incidents, outputs, cache_keys, {})
+
+    async def astream_classify(
+        self,
+        incidents: AsyncIterator[Union[IncidentReport, Exception]],
+        max_concurrency: Optional[int] = None
+    ) -> AsyncIterator[Tuple[Optional[IncidentReport], ClassificationResult]]:
+        """
+        Classify a stream of incident reports, yielding each result as soon as it is
+        ready, in completion order.
+
+        Reports are read from incidents only while fewer than max_concurrency (default
+        LLM_BATCH_MAX_CONCURRENCY, capped by LLM_MAX_CONCURRENCY) are being classified
+        or waiting to be yielded, so memory does not grow with the length of the
+        stream. A report that cannot be classified, or an exception in place of a
+        report (e.g. a validation error), yields a result with an error.
+
+        Returns:
+        - AsyncIterator[Tuple[Optional[IncidentReport], ClassificationResult]]: The
+          report, None for exceptions, and its result, tagged with its position in
+          the stream.
+        """
+        slots = asyncio.Semaphore(self._get_batch_max_concurrency(max_concurrency))
+        results: asyncio.Queue = asyncio.Queue()
+        tasks: Set[asyncio.Task] = set()
+
+        async def classify(index: int, incident: IncidentReport) -> None:
+            try:
+                result = ClassificationResult(index=index, incident_classification=await self.aclassify(incident))
+            except HTTPException as e:
+                result = ClassificationResult(index=index, error=e.detail)
+            results.put_nowait((incident, result))
+
+        async def read() -> int:
+            count = 0
+            async for incident in incidents:
+                await slots.acquire()
+                if isinstance(incident, Exception):
+                    results.put_nowait((None, ClassificationResult(index=count, error=str(incident))))
+                else:
+                    task = asyncio.create_task(classify(count, incident))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                count += 1
+            return count
+
+        reader = asyncio.create_task(read())
+        reader.add_done_callback(lambda _: results.put_nowait(None))
+        count = None
+        yielded = 0
+        try:
+            while count is None or yielded < count:
+                item = await results.get()
+                if item is None:
+                    count = reader.result()  # Raises if reading failed
+                    continue
+                slots.release()
+                yielded += 1
+                yield item
+        finally:
+            reader.cancel()
+            for task in list(tasks):
+                task.cancel()
+
+async def get_incident_service(request: Request) -> IncidentService:
+    """
+    FastAPI dependency returning the application-wide IncidentService.
+
+    The service is created in the application lifespan; it is created here on
+    first use if the lifespan has not run (e.g. when mounted without one).
+    """
+    incident_service = getattr(request.app.state, "incident_service", None)
+    if incident_service is None:
+        incident_service = IncidentService()
+        request.app.state.incident_service = incident_service
+    return incident_service
@@ -0,0 +1,163 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import time
+
+from fastapi import Request
+
+from app.config import config as app_config
+from app.core import metrics
+from app.core.environment import get_environment
+from app.core.incident_repository import IncidentRepository, build_incident_row, create_incident_repository
+from app.schemas.incident_schema import IncidentReport
+
+from app.core.logger import get_logger
+logger = get_logger(__name__)
+
+class IncidentStoreService:
+    """
+    Stores classified incident reports for analytics, off the request path.
+
+    Requests only append the row to an in-memory buffer. A background task writes
+    the buffer in a single transaction every INCIDENT_STORE_FLUSH_INTERVAL seconds,
+    or as soon as INCIDENT_STORE_BATCH_SIZE rows are pending. Queries and writes run
+    in threads, so the event loop never waits for SQLite.
+    """
+
+    def __init__(self, repository: Optional[IncidentRepository] = None):
+        """
+        Initialize the IncidentStoreService with environment settings.
+
+        Parameters:
+        - repository (IncidentRepository, optional): Repository, INCIDENT_STORE_BACKEND
+          by default.
+        """
+        env_config = app_config[get_environment()]
+        self.REPOSITORY = repository or create_incident_repository(
+            env_config.INCIDENT_STORE_BACKEND,
+            path=env_config.INCIDENT_STORE_PATH
+        )
+        self.BATCH_SIZE = env_config.INCIDENT_STORE_BATCH_SIZE
+        self.FLUSH_INTERVAL = env_config.INCIDENT_STORE_FLUSH_INTERVAL
+        self.MAX_PENDING = env_config.INCIDENT_STORE_MAX_PENDING
+
+        self._pending: List[dict] = []
+        self._flush_requested = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.REPOSITORY is not None
+
+    def start(self) -> None:
+        """
+        Start the background writer on the running event loop.
+        """
+        if self.enabled and self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+            logger.info(f"Storing classified incidents with the {self.REPOSITORY.name} incident store")
+
+    async def stop(self) -> None:
+        """
+        Stop the background writer and write the pending rows.
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+
+    def record(self, incident: IncidentReport, incident_classification) -> None:
+        """
+        Queue a classified incident report for storage.
+
+        When INCIDENT_STORE_MAX_PENDING rows are already waiting (the store cannot
+        keep up), the row is dropped rather than slowing down the request.
+
+        Parameters:
+        - incident (IncidentReport): The incident report.
+        - incident_classification (IncidentClassification): Its classification.
+        """
+        if not self.enabled:
+            return
+        if len(self._pending) >= self.MAX_PENDING:
+            metrics.INCIDENTS_STORED.labels("dropped").inc()
+            return
+        self._pending.append(
+            build_incident_row(
+                incident.model_dump(mode="json", exclude={"classification_hints"}),
+                incident.incident_datetime,
+                incident_classification.dict()
+            )
+        )
+        if len(self._pending) >= self.BATCH_SIZE:
+            self._flush_requested.set()
+
+    async def flush(self) -> None:
+        """
+        Write the pending rows in a single transaction.
+        """
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        started = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.REPOSITORY.add_many, rows)
+            metrics.INCIDENTS_STORED.labels("written").inc(len(rows))
+        except Exception as e:
+            metrics.INCIDENTS_STORED.labels("dropped").inc(len(rows))
+            logger.error(f"Could not store {len(rows)} incidents: {e}")
+        finally:
+            metrics.INCIDENT_STORE_FLUSH_SECONDS.observe(time.perf_counter() - started)
+
+    async def _flush_periodically(self) -> None:
+        """
+        Writer loop: flush when the batch is full or the flush interval has elapsed.
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), self.FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    async def list_incidents(
+        self,
+        filters: Dict[str, str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        List stored incidents, most recent first, a page at a time.
+        See IncidentRepository.list.
+        """
+        return await asyncio.to_thread(self.REPOSITORY.list, filters, since, until, limit, cursor)
+
+    async def count_incidents(
+        self,
+        group_by: str,
+        filters: Dict[str, str],
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> List[Tuple[str, int]]:
+        """
+        Count stored incidents by group_by. See IncidentRepository.count.
+        """
+        return await asyncio.to_thread(self.REPOSITORY.count, group_by, filters, since, until)
+
+async def get_incident_store_service(request: Request) -> IncidentStoreService:
+    """
+    FastAPI dependency returning the application-wide IncidentStoreService.
+
+    The service and its writer are started in the application lifespan; they are
+    started here on first use if the lifespan has not run.
+    """
+    incident_store_service = getattr(request.app.state, "incident_store_service", None)
+    if incident_store_service is None:
+        incident_store_service = IncidentStoreService()
+        incident_store_service.start()
+        request.app.state.incident_store_service = incident_store_service
+    return incident_store_service
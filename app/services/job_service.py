@@ -0,0 +1,350 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Set
+from urllib.parse import urlsplit
+import asyncio
+import ipaddress
+import socket
+import uuid
+
+import httpx
+from fastapi import Depends, Request
+from fastapi.exceptions import HTTPException
+
+from app.config import config as app_config
+from app.core import metrics
+from app.core.environment import get_environment
+from app.core.exceptions import to_classification_error
+from app.core.job_queue import JobQueue, create_job_queue
+from app.core.llm_scheduler import REPORT_PRIORITIES
+from app.core.retry import RetryPolicy
+from app.schemas.incident_schema import IncidentReport
+from app.schemas.job_schema import Job
+from app.services.incident_service import IncidentService, get_incident_service
+from app.services.incident_store_service import IncidentStoreService, get_incident_store_service
+
+from app.core.logger import get_logger
+logger = get_logger(__name__)
+
+def _to_datetime(timestamp: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(timestamp, timezone.utc) if timestamp is not None else None
+
+def to_job_schema(job: dict) -> Job:
+    """
+    Convert a job of the job queue into its API representation.
+    """
+    return Job(
+        job_id=job["id"],
+        status=job["status"],
+        created_at=_to_datetime(job["created_at"]),
+        started_at=_to_datetime(job["started_at"]),
+        finished_at=_to_datetime(job["finished_at"]),
+        incident_classification=job["result"],
+        error=job["error"],
+        status_code=job["status_code"]
+    )
+
+async def check_callback_url(url: str, allowed_hosts: List[str]) -> None:
+    """
+    Ensure that a callback URL does not target the server's own network.
+
+    With allowed_hosts, the host of the URL must be one of them or one of their
+    subdomains. Without, every address the host resolves to must be public: posting
+    to private, loopback or link-local addresses would let clients reach internal
+    services (and cloud metadata endpoints) through the server.
+
+    Parameters:
+    - url (str): The callback URL.
+    - allowed_hosts (List[str]): Hosts callbacks may be posted to, empty for any public host.
+
+    Raises:
+    - ValueError: If the URL may not be posted to, with the reason.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise ValueError("The callback URL must be an http(s) URL with a host")
+    if allowed_hosts:
+        if not any(host == allowed or host.endswith(f".{allowed}") for allowed in allowed_hosts):
+            raise ValueError(f"Callbacks to {host} are not allowed")
+        return
+
+    try:
+        addresses = await asyncio.get_running_loop().getaddrinfo(
+            host, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM
+        )
+    except (socket.gaierror, UnicodeError, ValueError):
+        raise ValueError(f"The callback host {host} cannot be resolved")
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split("%")[0])
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"Callbacks to non-public addresses ({address}) are not allowed")
+
+class JobService:
+    """
+    Classifies incident reports in the background: jobs are queued by the API and
+    classified by a bounded pool of workers sharing the IncidentService, so that
+    clients do not hold a connection open while the LLM answers.
+    """
+
+    def __init__(
+        self,
+        incident_service: IncidentService,
+        incident_store_service: Optional[IncidentStoreService] = None,
+        queue: Optional[JobQueue] = None,
+        workers: Optional[int] = None
+    ):
+        """
+        Initialize the JobService with environment settings.
+
+        Parameters:
+        - incident_service (IncidentService): Service classifying the incident reports.
+        - incident_store_service (IncidentStoreService, optional): Store of the classified
+          incident reports.
+        - queue (JobQueue, optional): Job queue, JOB_QUEUE_BACKEND by default.
+        - workers (int, optional): Number of workers, JOB_WORKERS by default.
+        """
+        env_config = app_config[get_environment()]
+        self.INCIDENT_SERVICE = incident_service
+        self.INCIDENT_STORE_SERVICE = incident_store_service
+        self.QUEUE = queue or create_job_queue(
+            env_config.JOB_QUEUE_BACKEND,
+            max_size=env_config.JOB_QUEUE_MAX_SIZE,
+            result_ttl=env_config.JOB_RESULT_TTL,
+            path=env_config.JOB_QUEUE_PATH
+        )
+        self.WORKERS = workers or env_config.JOB_WORKERS
+        self.STALE_TIMEOUT = env_config.JOB_STALE_TIMEOUT
+        self.CALLBACK_TIMEOUT = env_config.JOB_CALLBACK_TIMEOUT
+        self.CALLBACK_ALLOWED_HOSTS = [
+            host.strip().lower() for host in env_config.JOB_CALLBACK_ALLOWED_HOSTS.split(",") if host.strip()
+        ]
+        self.CALLBACK_RETRY_POLICY = RetryPolicy(
+            max_attempts=env_config.JOB_CALLBACK_ATTEMPTS,
+            base_delay=1.0,
+            max_delay=30.0,
+            deadline=0
+        )
+
+        self._job_available = asyncio.Event()
+        self._stopping = False
+        self._workers: Set[asyncio.Task] = set()
+        self._reaper: Optional[asyncio.Task] = None
+        self._callbacks: Set[asyncio.Task] = set()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def start(self) -> None:
+        """
+        Start the workers on the running event loop.
+        """
+        if self._workers:
+            return
+        self._stopping = False
+        self._client = httpx.AsyncClient(timeout=self.CALLBACK_TIMEOUT)
+        for _ in range(self.WORKERS):
+            task = asyncio.create_task(self._work())
+            self._workers.add(task)
+        self._reaper = asyncio.create_task(self._requeue_stale_jobs())
+        self._job_available.set()  # Jobs queued before a restart (sqlite backend)
+        logger.info(f"Started {self.WORKERS} job workers with the {self.QUEUE.name} job queue")
+
+    async def stop(self, drain_timeout: float = 0) -> None:
+        """
+        Stop the workers and wait for the pending callbacks.
+
+        Workers stop claiming jobs, and those classifying one are given drain_timeout
+        seconds to finish it before they are cancelled. Jobs interrupted while running
+        are queued again the next time a persistent queue is opened; with the memory
+        queue they are lost.
+
+        Parameters:
+        - drain_timeout (float): Seconds the running jobs have to finish, 0 cancels them.
+        """
+        self._stopping = True
+        self._job_available.set()  # Wake the idle workers so that they return
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        if self._workers and drain_timeout > 0:
+            _, pending = await asyncio.wait(self._workers, timeout=drain_timeout)
+            if pending:
+                logger.warning(f"Cancelling {len(pending)} job workers still running after {drain_timeout} seconds")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        if self._callbacks:
+            await asyncio.gather(*self._callbacks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def submit(self, incident: IncidentReport, callback_url: Optional[str] = None) -> dict:
+        """
+        Queue the classification of an incident report.
+
+        Parameters:
+        - incident (IncidentReport): The incident report.
+        - callback_url (str, optional): URL the finished job is posted to.
+
+        Returns:
+        - dict: The queued job.
+
+        Raises:
+        - ValueError: If the callback URL may not be posted to (see check_callback_url).
+        - OverflowError: If the job queue is full.
+        """
+        if callback_url is not None:
+            await check_callback_url(callback_url, self.CALLBACK_ALLOWED_HOSTS)
+        try:
+            job = await self.QUEUE.aput(
+                uuid.uuid4().hex,
+                incident.model_dump(mode="json"),
+                priority=REPORT_PRIORITIES[incident.priority or "normal"],
+                callback_url=callback_url
+            )
+        except OverflowError:
+            metrics.JOBS.labels("rejected").inc()
+            raise
+        metrics.JOBS.labels("submitted").inc()
+        metrics.JOB_QUEUE_DEPTH.inc()
+        self._job_available.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        """
+        Returns the job, None if it does not exist or its result has expired.
+        """
+        return await self.QUEUE.aget(job_id)
+
+    async def stats(self) -> dict:
+        """
+        Returns the number of jobs by status and the number of workers.
+        """
+        return {"backend": self.QUEUE.name, "workers": len(self._workers), **await self.QUEUE.acounts()}
+
+    async def _work(self) -> None:
+        """
+        Worker loop: classify queued jobs, waiting for new ones when the queue is empty.
+
+        Errors of the queue (e.g. a locked database) are logged and the worker carries
+        on after a second; a job it could not finish is queued again once stale.
+        """
+        while True:
+            # Cleared before claiming, so that a job queued after the claim wakes the worker
+            self._job_available.clear()
+            if self._stopping:
+                return
+            try:
+                job = await self.QUEUE.aclaim()
+                if job is None:
+                    await self._job_available.wait()
+                    continue
+                metrics.JOB_QUEUE_DEPTH.dec()
+                metrics.JOB_WAIT_SECONDS.observe(job["started_at"] - job["created_at"])
+                await self._run(job)
+            except Exception:
+                logger.exception("Job worker error")
+                await asyncio.sleep(1)
+
+    async def _requeue_stale_jobs(self) -> None:
+        """
+        Queue again, periodically, the jobs running for more than STALE_TIMEOUT seconds,
+        whose worker crashed or could not record their result.
+        """
+        try:
+            metrics.JOB_QUEUE_DEPTH.set((await self.QUEUE.acounts())["queued"])
+        except Exception:
+            logger.exception("Could not count the queued jobs")
+        while True:
+            await asyncio.sleep(self.STALE_TIMEOUT / 4)
+            try:
+                requeued = await self.QUEUE.arequeue_stale(self.STALE_TIMEOUT)
+            except Exception:
+                logger.exception("Could not queue the stale jobs again")
+                continue
+            if requeued:
+                logger.warning(f"Queued again {requeued} jobs running for more than {self.STALE_TIMEOUT} seconds")
+                metrics.JOB_QUEUE_DEPTH.inc(requeued)
+                self._job_available.set()
+
+    async def _run(self, job: dict) -> None:
+        """
+        Classify the incident report of a job and record the result.
+
+        Raises:
+        - Exception: If the job queue could not record the result.
+        """
+        result, error, status_code = None, None, None
+        try:
+            incident = IncidentReport(**job["payload"])
+            incident_classification = await self.INCIDENT_SERVICE.aclassify(incident)
+            if self.INCIDENT_STORE_SERVICE is not None:
+                self.INCIDENT_STORE_SERVICE.record(incident, incident_classification)
+            result = incident_classification.dict()
+        except HTTPException as e:
+            error, status_code = e.detail, e.status_code
+        except Exception as e:
+            classification_error = to_classification_error(e)
+            logger.error(f"Error in job {job['id']} ({classification_error.kind}): {e}")
+            error, status_code = classification_error.detail, classification_error.status_code
+
+        finished = await self.QUEUE.afinish(job["id"], result=result, error=error, status_code=status_code)
+        metrics.JOBS.labels("failed" if result is None else "succeeded").inc()
+
+        if finished is not None and finished["callback_url"]:
+            task = asyncio.create_task(self._send_callback(finished))
+            self._callbacks.add(task)
+            task.add_done_callback(self._callbacks.discard)
+
+    async def _send_callback(self, job: dict) -> None:
+        """
+        Post a finished job to its callback URL, retrying on network errors and
+        server errors with a jittered exponential backoff.
+        """
+        try:
+            # Checked again: the host may resolve to other addresses than at submission
+            await check_callback_url(job["callback_url"], self.CALLBACK_ALLOWED_HOSTS)
+        except ValueError as e:
+            logger.warning(f"Callback of job {job['id']} not sent: {e}")
+            metrics.JOBS.labels("callback_failed").inc()
+            return
+        body = to_job_schema(job).json()
+        for attempt in range(1, self.CALLBACK_RETRY_POLICY.max_attempts + 1):
+            try:
+                response = await self._client.post(
+                    job["callback_url"],
+                    content=body,
+                    headers={"Content-Type": "application/json"}
+                )
+                if response.status_code < 500:
+                    if response.is_error:
+                        logger.warning(f"Callback of job {job['id']} rejected with HTTP {response.status_code}")
+                    return
+                reason = f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                reason = repr(e)
+            logger.warning(f"Callback of job {job['id']} failed ({reason}), attempt {attempt}")
+            if attempt < self.CALLBACK_RETRY_POLICY.max_attempts:
+                await asyncio.sleep(self.CALLBACK_RETRY_POLICY.backoff(attempt))
+        metrics.JOBS.labels("callback_failed").inc()
+
+async def get_job_service(
+    request: Request,
+    incident_service: IncidentService = Depends(get_incident_service),
+    incident_store_service: IncidentStoreService = Depends(get_incident_store_service)
+) -> JobService:
+    """
+    FastAPI dependency returning the application-wide JobService.
+
+    The service and its workers are started in the application lifespan; they are
+    started here on first use if the lifespan has not run.
+    """
+    job_service = getattr(request.app.state, "job_service", None)
+    if job_service is None:
+        job_service = JobService(incident_service, incident_store_service)
+        job_service.start()
+        request.app.state.job_service = job_service
+    return job_service
@@ -0,0 +1,389 @@
+"""
+Scheduled, retried and repaired LLM calls.
+
+This module runs the LLM calls of IncidentService. Asynchronous calls are admitted by
+the per-worker LLM scheduler within the rate limits, transient errors are retried
+after a jittered exponential backoff within a deadline, and answers that do not match
+the classification schema are snapped to it or asked again with a short repair prompt.
+
+Classes:
+- LLMInvoker: Invokes the structured output chains of the service.
+
+Functions:
+- record_usage: Add the token usage reported with an LLM message to the metrics.
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+import asyncio
+import json
+import time
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from app.config import config as app_config
+from app.core import metrics
+from app.core.environment import get_environment, get_worker_processes
+from app.core.llm_scheduler import REPORT_PRIORITIES, LLMScheduler, SchedulerTicket, is_rate_limit_error
+from app.core.retry import RetryPolicy, is_transient_error
+from app.schemas.classification_schema import get_partial_classification_schema
+from app.utils.classification_repair import get_tool_call_arguments, repair_classification
+from app.utils.token_utils import TokenCounter
+
+from app.core.logger import get_logger
+logger = get_logger(__name__)
+
+def record_usage(message) -> None:
+    """
+    Add the token usage reported with an LLM message to the metrics.
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        metrics.LLM_INPUT_TOKENS.inc(usage.get("input_tokens", 0))
+        metrics.LLM_OUTPUT_TOKENS.inc(usage.get("output_tokens", 0))
+
+class LLMInvoker(object):
+    """
+    Invokes the structured output chains of IncidentService: through the LLM scheduler
+    for asynchronous calls, with retries of transient errors and repair of the answers
+    that do not match the classification schema.
+
+    Chain inputs carry the requested "fields", the "priority" of the report and the
+    estimated "tokens" of the call, next to the prompt variables.
+    """
+
+    # Per-worker scheduler of LLM calls (rate limits, concurrency), shared by all
+    # invokers. Created lazily so that it binds to the running event loop.
+    _scheduler: Optional[LLMScheduler] = None
+
+    REPAIR_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                "Correct the classification of the following incident report. "
+                "Only use the values allowed by the 'IncidentClassification' function."
+            ),
+            ("human", "incident report:\n{input}\n\nprevious answer, invalid for {invalid_fields}:\n{answer}"),
+        ]
+    )
+
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        token_counter: TokenCounter,
+        estimate_fixed_tokens: Callable[[Tuple[str, ...]], int]
+    ):
+        """
+        Initialize the LLMInvoker with environment settings.
+
+        Parameters:
+        - llm (BaseChatModel): The LLM of the repair chains.
+        - token_counter (TokenCounter): Token counter, calibrated on the usage of each call.
+        - estimate_fixed_tokens (Callable): Returns the raw tokens of a call for the given
+          fields that do not depend on the report (system message, tool, completion).
+        """
+        env_config = app_config[get_environment()]
+        self.LLM = llm
+        self.TOKEN_COUNTER = token_counter
+        self._estimate_fixed_tokens = estimate_fixed_tokens
+
+        self.LLM_RATE_LIMIT_RETRIES = env_config.LLM_RATE_LIMIT_RETRIES
+        self.RETRY_POLICY = RetryPolicy(
+            max_attempts=env_config.LLM_RETRY_MAX_ATTEMPTS,
+            base_delay=env_config.LLM_RETRY_BASE_DELAY,
+            max_delay=env_config.LLM_RETRY_MAX_DELAY,
+            deadline=env_config.LLM_RETRY_DEADLINE
+        )
+
+        # Values outside the schema's enums are snapped to the closest allowed value;
+        # the fields that cannot be snapped are asked again with a short prompt,
+        # without the few-shot examples.
+        self.LLM_REPAIR_PROMPT_ENABLED = env_config.LLM_REPAIR_PROMPT_ENABLED
+        self._repair_chains: Dict[Tuple[str, ...], Runnable] = {}
+
+    @classmethod
+    def get_scheduler(cls) -> LLMScheduler:
+        """
+        Returns the scheduler admitting the LLM calls of this worker within the
+        configured rate limits and concurrency.
+
+        The rate limits are the provider's quotas, shared by all the worker processes
+        of the server: each worker gets an equal share.
+        """
+        if cls._scheduler is None:
+            env_config = app_config[get_environment()]
+            workers = get_worker_processes()
+            cls._scheduler = LLMScheduler(
+                max_concurrency=env_config.LLM_MAX_CONCURRENCY,
+                requests_per_minute=env_config.LLM_REQUESTS_PER_MINUTE / workers,
+                tokens_per_minute=env_config.LLM_TOKENS_PER_MINUTE / workers,
+                min_concurrency=env_config.LLM_MIN_CONCURRENCY
+            )
+        return cls._scheduler
+
+    def _get_repair_chain(self, fields: Tuple[str, ...]) -> Runnable:
+        """
+        Returns the chain asking the LLM again for the given fields of a classification.
+        """
+        repair_chain = self._repair_chains.get(fields)
+        if repair_chain is None:
+            repair_chain = self.REPAIR_PROMPT_TEMPLATE | self.LLM.with_structured_output(
+                schema=get_partial_classification_schema(fields),
+                include_raw=True
+            )
+            self._repair_chains[fields] = repair_chain
+        return repair_chain
+
+    def _get_retry_delay(
+        self,
+        error: Exception,
+        retries: Dict[str, int],
+        deadline_at: Optional[float],
+        scheduled: bool
+    ) -> Optional[float]:
+        """
+        Returns the delay in seconds before retrying an LLM call that failed with
+        error, or None if it must not be retried.
+
+        Parameters:
+        - error (Exception): The error of the last attempt.
+        - retries (Dict[str, int]): Retries of the call so far, "rate_limited" and
+          "transient"; updated when a retry is granted.
+        - deadline_at (float, optional): Deadline of the call (time.monotonic).
+        - scheduled (bool): Whether the call goes through the LLM scheduler, which
+          paces calls rejected with HTTP 429 itself.
+        """
+        if is_rate_limit_error(error) and retries["rate_limited"] < self.LLM_RATE_LIMIT_RETRIES:
+            retries["rate_limited"] += 1
+            delay = 0.0 if scheduled else self.RETRY_POLICY.backoff(retries["rate_limited"])
+        elif (
+            not is_rate_limit_error(error)
+            and is_transient_error(error)
+            and retries["transient"] + 1 < self.RETRY_POLICY.max_attempts
+        ):
+            retries["transient"] += 1
+            delay = self.RETRY_POLICY.backoff(retries["transient"])
+        else:
+            return None
+
+        if not self.RETRY_POLICY.allows(deadline_at, delay):
+            return None
+        metrics.LLM_RETRIES.inc()
+        logger.warning(f"LLM call failed ({type(error).__name__}), retrying in {delay:.2f}s")
+        return delay
+
+    async def _acquire(self, chain_input: dict, tokens: int) -> SchedulerTicket:
+        """
+        Wait until the LLM scheduler admits a call, by the report's priority.
+        """
+        queued = time.perf_counter()
+        ticket = await self.get_scheduler().acquire(tokens, chain_input.get("priority", REPORT_PRIORITIES["normal"]))
+        metrics.LLM_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - queued)
+        return ticket
+
+    async def _ainvoke_admitted(
+        self,
+        ticket: SchedulerTicket,
+        chain: Runnable,
+        chain_input: dict,
+        config: RunnableConfig,
+        deadline_at: Optional[float]
+    ) -> Any:
+        """
+        Invoke chain with the ticket of an admitted call, within the deadline, then
+        release the ticket.
+        """
+        started = time.perf_counter()
+        metrics.LLM_CALLS_IN_FLIGHT.inc()
+        used_tokens = None
+        rate_limited = False
+        try:
+            output = await asyncio.wait_for(chain.ainvoke(chain_input, config), self.RETRY_POLICY.remaining(deadline_at))
+            usage = getattr(output.get("raw"), "usage_metadata", None) if isinstance(output, dict) else None
+            used_tokens = usage.get("total_tokens") if usage else None
+            if used_tokens:
+                self.TOKEN_COUNTER.calibrate(ticket.tokens, used_tokens)
+            return output
+        except Exception as e:
+            rate_limited = is_rate_limit_error(e)
+            raise
+        finally:
+            metrics.LLM_CALLS_IN_FLIGHT.dec()
+            metrics.LLM_CALL_SECONDS.observe(time.perf_counter() - started)
+            self.get_scheduler().release(ticket, used_tokens=used_tokens, rate_limited=rate_limited)
+
+    async def ainvoke(self, chain: Runnable, chain_input: dict, config: RunnableConfig) -> Any:
+        """
+        Invoke chain once the LLM scheduler admits the call, then repair the answer if
+        it does not match the schema.
+
+        The call waits in the scheduler's queue, by the report's priority, until the
+        rate limits allow it. A call rejected with HTTP 429 is queued again, up to
+        LLM_RATE_LIMIT_RETRIES times. A call failing with a timeout or a server error
+        is retried after a jittered exponential backoff, up to LLM_RETRY_MAX_ATTEMPTS
+        attempts. All attempts end within LLM_RETRY_DEADLINE seconds of the first
+        admission: the first wait in the queue does not count against the deadline,
+        so that a call is not timed out before it ever reaches the LLM.
+        """
+        deadline_at = None
+        admitted = False
+        retries = {"rate_limited": 0, "transient": 0}
+        while True:
+            if admitted:
+                # Calls queued again wait within the deadline
+                ticket = await asyncio.wait_for(
+                    self._acquire(chain_input, chain_input["tokens"]),
+                    self.RETRY_POLICY.remaining(deadline_at)
+                )
+            else:
+                ticket = await self._acquire(chain_input, chain_input["tokens"])
+                deadline_at, admitted = self.RETRY_POLICY.start(), True
+            try:
+                output = await self._ainvoke_admitted(ticket, chain, chain_input, config, deadline_at)
+                break
+            except Exception as e:
+                delay = self._get_retry_delay(e, retries, deadline_at, scheduled=True)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+        output, repair_input = self._check_output(output, chain_input)
+        if repair_input is None:
+            return output
+        try:
+            repair_output = await asyncio.wait_for(
+                self._ainvoke_repair(repair_input, config, deadline_at),
+                self.RETRY_POLICY.remaining(deadline_at)
+            )
+        except Exception as e:
+            metrics.LLM_REPAIRS_FAILED.inc()
+            logger.warning(f"Repair prompt failed: {e!r}")
+            return output
+        return self._merge_repair(output, repair_input, repair_output)
+
+    async def _ainvoke_repair(self, repair_input: dict, config: RunnableConfig, deadline_at: Optional[float]) -> Any:
+        """
+        Invoke the repair chain once the LLM scheduler admits the call.
+        """
+        ticket = await self._acquire(repair_input, self._estimate_repair_input_tokens(repair_input))
+        return await self._ainvoke_admitted(
+            ticket,
+            self._get_repair_chain(repair_input["fields"]),
+            repair_input,
+            config,
+            deadline_at
+        )
+
+    @staticmethod
+    def _invoke_attempt(chain: Runnable, chain_input: dict, config: RunnableConfig) -> Any:
+        """
+        Invoke chain once, as a synchronous LLM call in flight.
+        """
+        metrics.LLM_CALLS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            return chain.invoke(chain_input, config)
+        finally:
+            metrics.LLM_CALLS_IN_FLIGHT.dec()
+            metrics.LLM_CALL_SECONDS.observe(time.perf_counter() - started)
+
+    def invoke(self, chain: Runnable, chain_input: dict, config: RunnableConfig) -> Any:
+        """
+        Invoke chain, then repair the answer if it does not match the schema.
+        Synchronous counterpart of ainvoke: transient errors are retried after a
+        jittered exponential backoff, without the LLM scheduler.
+        """
+        deadline_at = self.RETRY_POLICY.start()
+        retries = {"rate_limited": 0, "transient": 0}
+        while True:
+            try:
+                output = self._invoke_attempt(chain, chain_input, config)
+                break
+            except Exception as e:
+                delay = self._get_retry_delay(e, retries, deadline_at, scheduled=False)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+        output, repair_input = self._check_output(output, chain_input)
+        if repair_input is None:
+            return output
+        try:
+            repair_output = self._invoke_attempt(self._get_repair_chain(repair_input["fields"]), repair_input, config)
+        except Exception as e:
+            metrics.LLM_REPAIRS_FAILED.inc()
+            logger.warning(f"Repair prompt failed: {e!r}")
+            return output
+        return self._merge_repair(output, repair_input, repair_output)
+
+    def _check_output(self, output: Any, chain_input: dict) -> Tuple[Any, Optional[dict]]:
+        """
+        Check the classification of a structured output against the schema's enums,
+        snapping invalid values to the closest allowed value.
+
+        Returns:
+        - tuple: (the output, with the snapped classification if every field could be
+                  snapped, the input of the repair chain for the remaining fields or None).
+        """
+        if not isinstance(output, dict) or "raw" not in output:
+            return output, None
+        fields = chain_input["fields"]
+        parsed = output.get("parsed")
+        arguments = parsed.dict() if parsed is not None else get_tool_call_arguments(output["raw"])
+        values, invalid_fields = repair_classification(arguments, fields)
+
+        if not invalid_fields:
+            if parsed is None or any(arguments.get(field_name) != value for field_name, value in values.items()):
+                metrics.LLM_REPAIRS_SNAPPED.inc()
+                logger.info(f"Snapped LLM answer {arguments} to the classification schema")
+                output = {**output, "parsed": get_partial_classification_schema(fields)(**values), "parsing_error": None}
+            return output, None
+        if not self.LLM_REPAIR_PROMPT_ENABLED:
+            metrics.LLM_REPAIRS_FAILED.inc()
+            return output, None
+
+        repair_input = {
+            "input": chain_input["input"],
+            "answer": json.dumps(arguments) if arguments is not None else (str(output["raw"].content) or "none"),
+            "invalid_fields": ", ".join(invalid_fields),
+            "fields": invalid_fields,
+            "requested_fields": fields,
+            "values": values,
+            "priority": chain_input.get("priority", REPORT_PRIORITIES["normal"])
+        }
+        return output, repair_input
+
+    def _estimate_repair_input_tokens(self, repair_input: dict) -> int:
+        """
+        Estimate the tokens of a repair call: prompt, previous answer and completion.
+        """
+        return self.TOKEN_COUNTER.scale(
+            self._estimate_fixed_tokens(repair_input["fields"])
+            + self.TOKEN_COUNTER.count(repair_input["input"])
+            + self.TOKEN_COUNTER.count(repair_input["answer"])
+        )
+
+    def _merge_repair(self, output: dict, repair_input: dict, repair_output: Any) -> Any:
+        """
+        Complete the classification of output with the answer of the repair chain.
+
+        Returns:
+        - Any: output with the repaired classification, or output unchanged if the
+               answer of the repair chain does not match the schema either.
+        """
+        if isinstance(repair_output, dict) and "raw" in repair_output:
+            record_usage(repair_output["raw"])
+            parsed = repair_output.get("parsed")
+            arguments = parsed.dict() if parsed is not None else get_tool_call_arguments(repair_output["raw"])
+        else:
+            arguments = None
+        values, invalid_fields = repair_classification(arguments, repair_input["fields"])
+        if invalid_fields:
+            metrics.LLM_REPAIRS_FAILED.inc()
+            logger.warning(f"Repair prompt did not fix {', '.join(invalid_fields)}")
+            return output
+
+        metrics.LLM_REPAIRS_PROMPTED.inc()
+        schema = get_partial_classification_schema(repair_input["requested_fields"])
+        return {**output, "parsed": schema(**repair_input["values"], **values), "parsing_error": None}
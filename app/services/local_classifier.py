@@ -0,0 +1,292 @@
+"""
+Local pre-classification of incident reports.
+
+This module predicts the fields of IncidentClassification without calling the LLM,
+each with a confidence score:
+
+- language from character trigram statistics of English and Norwegian,
+- category from keyword rules for unambiguous cases,
+- any field from a NumPy softmax regression trained on past labelled classifications.
+
+IncidentService uses the prediction as a cascade stage: the LLM is only called when
+the local stage is not confident enough.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import re
+
+import numpy as np
+
+from app.schemas.classification_schema import CLASSIFICATION_FIELDS, IncidentClassification
+from app.schemas.incident_schema import IncidentReport
+from app.utils.example_selector import HashedNgramVectorizer
+
+from app.core.logger import get_logger
+logger = get_logger(__name__)
+
+# Frequent character trigrams of each language, words padded with spaces
+LANGUAGE_TRIGRAMS: Dict[str, frozenset] = {
+    "english": frozenset([
+        " th", "the", "he ", " of", "of ", " an", "and", "nd ", " to", "to ", " in", "ing",
+        "ng ", " is", "is ", " wa", "was", "as ", "for", "or ", " wi", "wit", "ith", "th ",
+        "ion", "tio", " be", " by", "by ", " at", "at ", " it", "it ", " fr", "fro", "rom",
+        " no", "not", "ot ", " on", "on ", "ent", "ter", "ere", "ver", " we", "ted", "ty ",
+    ]),
+    "norwegian": frozenset([
+        " og", "og ", " en", "en ", " de", "det", "et ", " i ", " på", "på ", " ti", "til",
+        "il ", " so", "som", " me", "med", " av", "av ", "har", "ar ", " ik", "ikk", "kke",
+        "ke ", " ei", "ble", "le ", " ve", "ved", " sk", "ene", "ne ", "unn", "nne", "nge",
+        "ger", "lig", "ig ", " ut", "ut ", " ho", "hos", "kon", "tor", "ikt", "sje", "kje",
+    ]),
+}
+
+# Letters that only occur in the Norwegian texts
+NORWEGIAN_LETTERS_RE = re.compile(r"[æøå]")
+
+# Confidence of a keyword hit, above the default LOCAL_CLASSIFIER_THRESHOLD: a hit
+# answers its field without the LLM, which is then only asked for the other fields.
+# A trained classifier more confident than a keyword still wins.
+KEYWORD_CONFIDENCE = 0.95
+
+# Keyword rules: (pattern, field, value, confidence). Only terms naming the category on
+# their own are kept: weaker evidence ("virus" may be a disease, a "stolen" password is
+# no physical incident, an e-mail is mentioned in reports of any asset) is left to the
+# LLM. Patterns match whole words, or word prefixes for Norwegian compounds (e.g. "innbruddet").
+KEYWORD_RULES: List[Tuple[re.Pattern, str, str, float]] = [
+    (re.compile(r"\b(phishing|social engineering)\b|\bmistenkelig e-?post"), "category", "People", KEYWORD_CONFIDENCE),
+    (re.compile(r"\b(break-?ins?|burglary)\b|\binnbrudd"), "category", "Physical", KEYWORD_CONFIDENCE),
+    (re.compile(r"\b(malware|ransomware)\b|\b(skadevare|løsepengevirus)"), "category", "Technology", KEYWORD_CONFIDENCE),
+]
+
+@dataclass
+class LocalPrediction:
+    """ Locally predicted value and confidence of each classification field. """
+    values: Dict[str, str] = field(default_factory=dict)
+    confidences: Dict[str, float] = field(default_factory=dict)
+
+    def propose(self, field_name: str, value: str, confidence: float) -> None:
+        """ Keep the proposed value for a field if it is more confident than the current one. """
+        if confidence > self.confidences.get(field_name, 0.0):
+            self.values[field_name] = value
+            self.confidences[field_name] = confidence
+
+    def confident_fields(self, threshold: float) -> Dict[str, str]:
+        """ Returns the predicted values whose confidence reaches threshold. """
+        return {
+            field_name: value
+            for field_name, value in self.values.items()
+            if self.confidences[field_name] >= threshold
+        }
+
+    @property
+    def confidence(self) -> float:
+        """ Confidence of the whole classification: that of its least confident field. """
+        return min((self.confidences.get(field_name, 0.0) for field_name in CLASSIFICATION_FIELDS), default=0.0)
+
+def report_text(incident: IncidentReport) -> str:
+    """ Text of an incident report used for local classification. """
+    return f"{incident.description} {incident.location}"
+
+def detect_language(text: str) -> Tuple[str, float]:
+    """
+    Detect whether text is English or Norwegian from character trigram statistics.
+
+    Parameters:
+    - text (str): Text to inspect.
+
+    Returns:
+    - Tuple[str, float]: The language and its confidence. Short texts with few known
+                         trigrams get a confidence close to 0.5.
+    """
+    text = text.lower()
+    counts = dict.fromkeys(LANGUAGE_TRIGRAMS, 1.0)  # Laplace smoothing
+    for token in re.findall(r"\w+", text):
+        padded = f" {token} "
+        for start in range(len(padded) - 2):
+            trigram = padded[start:start + 3]
+            for language, trigrams in LANGUAGE_TRIGRAMS.items():
+                if trigram in trigrams:
+                    counts[language] += 1
+    counts["norwegian"] += 3 * len(NORWEGIAN_LETTERS_RE.findall(text))
+
+    language = max(counts, key=counts.get)
+    return language, counts[language] / sum(counts.values())
+
+class LinearClassifier(object):
+    """ Multinomial logistic regression over feature vectors. """
+
+    def __init__(self, classes: List[str], n_features: int):
+        """
+        Parameters:
+        - classes (List[str]): Possible labels.
+        - n_features (int): Dimension of the feature vectors, including the bias column.
+        """
+        self.classes = list(classes)
+        self.weights = np.zeros((n_features, len(self.classes)), dtype=np.float32)
+
+    def fit(
+        self,
+        features: np.ndarray,
+        labels: List[str],
+        epochs: int = 200,
+        learning_rate: float = 2.0,
+        l2: float = 1e-4
+    ) -> "LinearClassifier":
+        """
+        Train the classifier with full-batch gradient descent on the cross-entropy loss.
+
+        Parameters:
+        - features (np.ndarray): Training feature vectors, one row per sample.
+        - labels (List[str]): Label of each sample, one of the classes.
+        - epochs (int): Number of gradient descent steps.
+        - learning_rate (float): Step size.
+        - l2 (float): L2 regularization strength.
+
+        Returns:
+        - LinearClassifier: The trained classifier.
+        """
+        targets = np.zeros((len(labels), len(self.classes)), dtype=np.float32)
+        targets[np.arange(len(labels)), [self.classes.index(label) for label in labels]] = 1
+
+        for _ in range(epochs):
+            probabilities = self._softmax(features @ self.weights)
+            gradient = features.T @ (probabilities - targets) / len(features) + l2 * self.weights
+            self.weights -= learning_rate * gradient
+        return self
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exponentials = np.exp(logits)
+        return exponentials / exponentials.sum(axis=1, keepdims=True)
+
+    def predict(self, features: np.ndarray) -> Tuple[str, float]:
+        """
+        Predict the label of one feature vector.
+
+        Returns:
+        - Tuple[str, float]: The most probable label and its probability.
+        """
+        probabilities = self._softmax(features[np.newaxis, :] @ self.weights)[0]
+        best = int(probabilities.argmax())
+        return self.classes[best], float(probabilities[best])
+
+class LocalClassifier(object):
+    """
+    Cascade stage predicting IncidentClassification fields without the LLM.
+
+    Combines language detection, keyword rules and, once trained, one linear classifier
+    per field over shared hashed n-gram features. For each field the most confident
+    prediction wins.
+    """
+
+    def __init__(self, vectorizer: HashedNgramVectorizer = None):
+        """
+        Parameters:
+        - vectorizer (HashedNgramVectorizer, optional): Vectorizer of the report texts.
+        """
+        self.vectorizer = vectorizer or HashedNgramVectorizer()
+        self.models: Dict[str, LinearClassifier] = {}
+
+    def _features(self, texts: Iterable[str]) -> np.ndarray:
+        """ Vectorize texts into L2-normalized rows with a bias column. """
+        rows = np.stack([self.vectorizer.transform(text) for text in texts])
+        rows /= np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)
+        return np.hstack([rows, np.ones((len(rows), 1), dtype=np.float32)])
+
+    def predict(self, incident: IncidentReport) -> LocalPrediction:
+        """
+        Predict the classification fields of an incident report.
+
+        Parameters:
+        - incident (IncidentReport): The incident report.
+
+        Returns:
+        - LocalPrediction: Predicted value and confidence of each field that could be predicted.
+        """
+        text = report_text(incident)
+        prediction = LocalPrediction()
+
+        prediction.propose("language", *detect_language(incident.description))
+
+        lowered = text.lower()
+        for pattern, field_name, value, confidence in KEYWORD_RULES:
+            if pattern.search(lowered):
+                prediction.propose(field_name, value, confidence)
+
+        if self.models:
+            features = self._features([text])[0]
+            for field_name, model in self.models.items():
+                prediction.propose(field_name, *model.predict(features))
+
+        return prediction
+
+    def fit(self, records: List[Tuple[IncidentReport, dict]]) -> "LocalClassifier":
+        """
+        Train one linear classifier per field on past labelled classifications.
+
+        Parameters:
+        - records (List[Tuple[IncidentReport, dict]]): Incident reports with their
+          classification as a dictionary of field values.
+
+        Returns:
+        - LocalClassifier: The trained classifier.
+        """
+        features = self._features(report_text(incident) for incident, _ in records)
+        for field_name in CLASSIFICATION_FIELDS:
+            classes = IncidentClassification.__fields__[field_name].field_info.extra["enum"]
+            labels = [classification[field_name] for _, classification in records]
+            self.models[field_name] = LinearClassifier(classes, features.shape[1]).fit(features, labels)
+        logger.info(f"Trained local classifier on {len(records)} labelled incident reports")
+        return self
+
+    def save(self, path: str) -> None:
+        """ Save the weights of the linear classifiers to a NumPy .npz file. """
+        np.savez_compressed(
+            path,
+            **{f"weights_{field_name}": model.weights for field_name, model in self.models.items()},
+            classes=json.dumps({field_name: model.classes for field_name, model in self.models.items()})
+        )
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> "LocalClassifier":
+        """
+        Load a classifier saved with save. Without a path, only language detection and
+        keyword rules are used.
+        """
+        classifier = cls()
+        if not path:
+            return classifier
+        with np.load(path) as saved:
+            for field_name, classes in json.loads(str(saved["classes"])).items():
+                weights = saved[f"weights_{field_name}"]
+                model = LinearClassifier(classes, weights.shape[0])
+                model.weights = weights
+                classifier.models[field_name] = model
+        logger.info(f"Loaded local classifier from {path}")
+        return classifier
+
+def load_labelled_corpus(path: str) -> List[Tuple[IncidentReport, dict]]:
+    """
+    Read a labelled JSONL corpus.
+
+    Each line is an object with an "incident_report" and its "incident_classification",
+    as in IncidentResponse.
+
+    Parameters:
+    - path (str): Path of the JSONL file.
+
+    Returns:
+    - List[Tuple[IncidentReport, dict]]: The incident reports and their classifications.
+    """
+    records = []
+    with open(path, encoding="utf-8") as corpus:
+        for line in corpus:
+            if line.strip():
+                record = json.loads(line)
+                records.append(
+                    (IncidentReport(**record["incident_report"]), record["incident_classification"])
+                )
+    return records
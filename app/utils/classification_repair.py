@@ -0,0 +1,83 @@
+""" Repair of structured LLM outputs that do not match the classification schema """
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import difflib
+import json
+
+from app.schemas.classification_schema import IncidentClassification
+
+# Minimum similarity (difflib ratio) for snapping a value to an enum value
+ENUM_MATCH_CUTOFF = 0.6
+
+def get_field_enum(field_name: str) -> List[str]:
+    """ Returns the allowed values of a field of IncidentClassification. """
+    return IncidentClassification.__fields__[field_name].field_info.extra["enum"]
+
+def snap_to_enum(value: Any, choices: Sequence[str], cutoff: float = ENUM_MATCH_CUTOFF) -> Optional[str]:
+    """
+    Map a value to the closest allowed value.
+
+    Parameters:
+    - value (Any): The value answered by the LLM.
+    - choices (Sequence[str]): The allowed values.
+    - cutoff (float): Minimum similarity of a fuzzy match, between 0 and 1.
+
+    Returns:
+    - Optional[str]: The value itself if allowed, else the allowed value equal to it
+                     ignoring case and spacing, else the most similar allowed value
+                     above cutoff, else None.
+    """
+    if not isinstance(value, str):
+        return None
+    if value in choices:
+        return value
+    by_normalized = {choice.lower(): choice for choice in choices}
+    normalized = " ".join(value.replace("_", " ").split()).lower()
+    if normalized in by_normalized:
+        return by_normalized[normalized]
+    matches = difflib.get_close_matches(normalized, list(by_normalized), n=1, cutoff=cutoff)
+    return by_normalized[matches[0]] if matches else None
+
+def get_tool_call_arguments(message: Any) -> Optional[Dict[str, Any]]:
+    """
+    Returns the arguments of the first tool call of an LLM message, including a tool
+    call whose arguments could not be parsed as JSON by the client, None if there is
+    no tool call or its arguments are not a JSON object.
+    """
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        return tool_calls[0].get("args")
+    invalid_tool_calls = getattr(message, "invalid_tool_calls", None)
+    if invalid_tool_calls:
+        try:
+            arguments = json.loads(invalid_tool_calls[0].get("args") or "")
+        except ValueError:
+            return None
+        return arguments if isinstance(arguments, dict) else None
+    return None
+
+def repair_classification(
+    arguments: Optional[Dict[str, Any]],
+    fields: Tuple[str, ...]
+) -> Tuple[Dict[str, str], Tuple[str, ...]]:
+    """
+    Snap the answered value of each field to its enum.
+
+    Parameters:
+    - arguments (Dict[str, Any], optional): The classification answered by the LLM.
+    - fields (Tuple[str, ...]): The fields that were asked.
+
+    Returns:
+    - Tuple[Dict[str, str], Tuple[str, ...]]: The valid (possibly snapped) values by
+      field, and the fields that are missing or could not be snapped.
+    """
+    arguments = arguments or {}
+    values = {}
+    invalid_fields = []
+    for field_name in fields:
+        value = snap_to_enum(arguments.get(field_name), get_field_enum(field_name))
+        if value is None:
+            invalid_fields.append(field_name)
+        else:
+            values[field_name] = value
+    return values, tuple(invalid_fields)
@@ -27,10 +27,9 @@ def tool_example_to_messages(classification_example: dict) -> List[BaseMessage]:
     # Initialize the list of messages with the human input message
     messages: List[BaseMessage] = [HumanMessage(content=str(classification_example["input"]))]
     openai_tool_calls = []  # List to store tool call information
-    total_length = 0  # Track the cumulative length of tool calls
-    max_total_length = 1024  # Maximum allowed length for all tool calls combined
-    
-    # Iterate over each tool call in the example
+
+    # Iterate over each tool call in the example. Examples are kept whole: prompts are
+    # fitted to their token budget by dropping examples (see app.utils.prompt_budget).
     for tool_call in classification_example["tool_calls"]:
         logger.debug(f"Processing tool_call: {tool_call} (type: {type(tool_call)})")
 
@@ -44,27 +43,6 @@ def tool_example_to_messages(classification_example: dict) -> List[BaseMessage]:
                 logger.error(f"tool_call does not have a 'json' method: {tool_call}")
                 raise TypeError(f"tool_call of type {type(tool_call)} does not have a 'json' method.")
 
-        # Calculate JSON structure overhead for the tool call
-        json_structure_overhead = len(json.dumps({
-            "id": str(uuid.uuid4()),
-            "type": "function",
-            "function": {
-                "name": tool_call.__class__.__name__,
-                "arguments": ""
-            }
-        }))
-
-        # Calculate maximum length allowed for the tool call JSON
-        max_length = max_total_length - total_length - json_structure_overhead
-
-        # Truncate tool call JSON if it exceeds the maximum allowed length
-        if len(tool_call_json) > max_length:
-            tool_call_json = tool_call_json[:max_length]
-            logger.warning(f"Truncated tool call JSON to fit within max length: {max_length}")
-
-        # Update the total length after considering the current tool call
-        total_length += len(tool_call_json) + json_structure_overhead
-
         # Append the structured tool call information to the list
         openai_tool_calls.append(
             {
@@ -76,8 +54,7 @@ def tool_example_to_messages(classification_example: dict) -> List[BaseMessage]:
                 },
             }
         )
-        logger.debug(f"Added tool call with length {len(tool_call_json)}. Total length now {total_length}.")
-    
+
     # Add an AI message with tool calls to the messages list
     messages.append(
         AIMessage(
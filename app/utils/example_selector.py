@@ -0,0 +1,142 @@
+"""
+Local nearest-neighbour selection of few-shot examples.
+
+This module indexes the descriptions of the few-shot classification examples as hashed
+character n-gram TF-IDF vectors in NumPy, and selects the examples most similar to an
+incoming incident report by cosine similarity. Everything runs locally, without
+embedding models or network calls, so the prompt size stays constant however large the
+example pool grows.
+"""
+
+from typing import Iterable, List
+import re
+import zlib
+
+import numpy as np
+
+from app.core.logger import get_logger
+logger = get_logger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+class HashedNgramVectorizer(object):
+    """ Maps text to hashed character n-gram term frequency vectors. """
+
+    def __init__(self, n_features: int = 4096, ngram_range: tuple = (3, 5)):
+        """
+        Parameters:
+        - n_features (int): Dimension of the vectors (number of hash buckets).
+        - ngram_range (tuple): Minimum and maximum length of the character n-grams.
+        """
+        self.n_features = n_features
+        self.ngram_range = ngram_range
+
+    def _ngrams(self, text: str) -> Iterable[str]:
+        """ Yields the character n-grams of each word, padded with spaces. """
+        min_n, max_n = self.ngram_range
+        for token in _TOKEN_RE.findall(text.lower()):
+            padded = f" {token} "
+            for n in range(min_n, max_n + 1):
+                for start in range(max(len(padded) - n + 1, 1)):
+                    yield padded[start:start + n]
+
+    def transform(self, text: str) -> np.ndarray:
+        """
+        Vectorize text into sublinear (1 + log) term frequencies of its n-grams.
+
+        Parameters:
+        - text (str): Text to vectorize.
+
+        Returns:
+        - np.ndarray: Vector of shape (n_features,).
+        """
+        buckets = np.fromiter(
+            (zlib.crc32(ngram.encode()) % self.n_features for ngram in self._ngrams(text)),
+            dtype=np.int64
+        )
+        counts = np.bincount(buckets, minlength=self.n_features).astype(np.float32)
+        np.log1p(counts, out=counts, where=counts > 0)
+        return counts
+
+class ExampleSelector(object):
+    """
+    Cosine-similarity index over the texts of a pool of few-shot examples.
+
+    Examples can be added after the index is built. Only the new texts are vectorized;
+    the IDF weights and normalized matrix are recomputed on the next selection.
+    """
+
+    def __init__(self, texts: List[str], vectorizer: HashedNgramVectorizer = None):
+        """
+        Parameters:
+        - texts (List[str]): Texts of the examples to index, in pool order.
+        - vectorizer (HashedNgramVectorizer, optional): Vectorizer of the texts.
+        """
+        self.vectorizer = vectorizer or HashedNgramVectorizer()
+        self._term_frequencies = np.zeros((0, self.vectorizer.n_features), dtype=np.float32)
+        self._document_frequencies = np.zeros(self.vectorizer.n_features, dtype=np.float32)
+        self._size = 0
+        self._idf = None
+        self._matrix = None
+        self.add(texts)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, texts: List[str]) -> None:
+        """
+        Add example texts to the index.
+
+        Parameters:
+        - texts (List[str]): Texts of the new examples, appended to the pool order.
+        """
+        if not texts:
+            return
+        rows = np.stack([self.vectorizer.transform(text) for text in texts])
+
+        # Grow the term frequency matrix geometrically to keep additions amortized O(1)
+        required = self._size + len(rows)
+        if required > len(self._term_frequencies):
+            capacity = max(required, 2 * len(self._term_frequencies))
+            grown = np.zeros((capacity, self.vectorizer.n_features), dtype=np.float32)
+            grown[:self._size] = self._term_frequencies[:self._size]
+            self._term_frequencies = grown
+
+        self._term_frequencies[self._size:required] = rows
+        self._document_frequencies += (rows > 0).sum(axis=0)
+        self._size = required
+        self._matrix = None
+        logger.info(f"Indexed {len(rows)} few-shot examples, {self._size} in total")
+
+    def _build_matrix(self) -> None:
+        """ Weight the term frequencies by IDF and normalize the rows. """
+        self._idf = np.log((1 + self._size) / (1 + self._document_frequencies)) + 1
+        matrix = self._term_frequencies[:self._size] * self._idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self._matrix = matrix / np.maximum(norms, 1e-12)
+
+    def select(self, text: str, k: int) -> List[int]:
+        """
+        Select the examples most similar to text.
+
+        Parameters:
+        - text (str): Text to compare the examples with.
+        - k (int): Number of examples to select.
+
+        Returns:
+        - List[int]: Pool indices of the k most similar examples, least similar first
+                     so that the most similar example ends up closest to the input.
+        """
+        if k <= 0:
+            return []
+        if k >= self._size:
+            return list(range(self._size))
+        if self._matrix is None:
+            self._build_matrix()
+
+        query = self.vectorizer.transform(text) * self._idf
+        query /= max(np.linalg.norm(query), 1e-12)
+        scores = self._matrix @ query
+
+        top_k = np.argpartition(-scores, k - 1)[:k]
+        return top_k[np.argsort(scores[top_k], kind="stable")].tolist()
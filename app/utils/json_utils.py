@@ -1,25 +1,24 @@
 """ JSON utils """
 
-from datetime import datetime
+import re
 
-def convert_datetimes_to_iso(incident_dict: dict) -> dict:
-        """
-        Convert all datetime objects in the given dictionary to ISO format strings.
-        For example, datetime(2023, 6, 10, 15, 30) is converted to "2023-06-10T15:30:00".
+_WHITESPACE_RE = re.compile(r"\s+")
 
-        Parameters:
-        - incident_dict (dict): Dictionary containing the incident data.
-        
-        Returns:
-        - incident_dict (dict): Dictionary with datetime objects converted to ISO format strings.
-        """
-        for key, value in incident_dict.items():
-            if isinstance(value, datetime):
-                incident_dict[key] = value.isoformat()
-            elif isinstance(value, list):
-                for item in value:
-                    if isinstance(item, dict):
-                        for sub_key, sub_value in item.items():
-                            if isinstance(sub_value, datetime):
-                                item[sub_key] = sub_value.isoformat()
-        return incident_dict
+def collapse_whitespace(value):
+    """
+    Recursively strip and collapse runs of whitespace in the strings of a value.
+    For example, {"description": "  power   outage "} becomes {"description": "power outage"}.
+
+    Parameters:
+    - value: String, dictionary, list or any other JSON value.
+
+    Returns:
+    - value: A copy of the value with normalized whitespace in all strings.
+    """
+    if isinstance(value, str):
+        return _WHITESPACE_RE.sub(" ", value).strip()
+    if isinstance(value, dict):
+        return {key: collapse_whitespace(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [collapse_whitespace(item) for item in value]
+    return value
@@ -0,0 +1,116 @@
+""" NDJSON utils """
+
+from typing import AsyncIterable, AsyncIterator, Callable, Mapping, Optional
+import asyncio
+
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Optional[bytes]]:
+    """
+    Split a stream of bytes into NDJSON lines, holding at most one line in memory.
+
+    Each byte is scanned once: lines are cut from a bytearray by offset, and the
+    search for the next line break resumes where the previous chunk ended.
+
+    Parameters:
+    - chunks (AsyncIterator[bytes]): The stream, e.g. the request body.
+    - max_line_bytes (int): Maximum length of a line.
+
+    Returns:
+    - AsyncIterator[Optional[bytes]]: The lines that are not blank, without their line
+      break, in order. A line longer than max_line_bytes is skipped and yields None.
+    """
+    buffer = bytearray()
+    skipping = False
+    async for chunk in chunks:
+        scanned = len(buffer)  # The buffered partial line has no line break
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", max(start, scanned))
+            if end < 0:
+                break
+            if skipping:
+                skipping = False
+            elif end - start > max_line_bytes:
+                yield None
+            else:
+                line = bytes(buffer[start:end])
+                if line.strip():
+                    yield line
+            start = end + 1
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            # Drop the rest of the over-long line as it arrives
+            if not skipping:
+                skipping = True
+                yield None
+            buffer.clear()
+    if buffer.strip() and not skipping:
+        yield bytes(buffer)
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    Streaming NDJSON response that can be sent while the request body is still
+    being read.
+
+    StreamingResponse listens for the client disconnecting by receiving messages
+    concurrently, which would swallow the rest of the request body. This response
+    receives the messages itself while it is sent: the request body is handed to
+    content, a function of the body chunks returning the response lines, and a
+    disconnect cancels the response, with the work in progress behind it.
+    """
+
+    media_type = NDJSON_MEDIA_TYPE
+
+    def __init__(
+        self,
+        content: Callable[[AsyncIterator[bytes]], AsyncIterable[str]],
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        background: Optional[BackgroundTask] = None
+    ):
+        super().__init__((), status_code, headers, background=background)
+        self.content = content
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Bounded, so that a slow consumer holds back the upload
+        chunks: asyncio.Queue = asyncio.Queue(maxsize=8)
+
+        async def body() -> AsyncIterator[bytes]:
+            while (chunk := await chunks.get()) is not None:
+                yield chunk
+
+        self.body_iterator = self.content(body())
+        sending = asyncio.ensure_future(self.stream_response(send))
+        receiving = asyncio.ensure_future(self._receive(receive, chunks))
+        try:
+            done, _ = await asyncio.wait((sending, receiving), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (sending, receiving):
+                task.cancel()
+            await asyncio.gather(sending, receiving, return_exceptions=True)
+        if sending not in done:
+            return  # The client disconnected
+        sending.result()
+        if self.background is not None:
+            await self.background()
+
+    @staticmethod
+    async def _receive(receive: Receive, chunks: asyncio.Queue) -> None:
+        """ Hand the request body over to chunks, then wait for the client to disconnect. """
+        more_body = True
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            if message["type"] == "http.request" and more_body:
+                if message.get("body"):
+                    await chunks.put(message["body"])
+                more_body = message.get("more_body", False)
+                if not more_body:
+                    await chunks.put(None)
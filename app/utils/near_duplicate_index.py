@@ -0,0 +1,193 @@
+"""
+Near-duplicate detection of recent incident reports with MinHash and LSH.
+
+This module estimates the Jaccard similarity of texts from MinHash signatures of
+their character n-grams, and finds the recent texts similar to a new one with
+locality-sensitive hashing: signatures are cut into bands, and only the texts
+sharing at least one band with the new text are compared. Lookups cost the same
+whatever the number of indexed texts, and the index forgets texts older than its
+time window or beyond its capacity, so its memory stays bounded.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Prime above 2**32 for the universal hash functions (a * x + b) mod p
+_PRIME = np.uint64(4294967311)
+
+class MinHasher(object):
+    """ Computes MinHash signatures of the character n-gram sets of texts. """
+
+    def __init__(self, num_perm: int = 64, ngram: int = 4, seed: int = 1):
+        """
+        Parameters:
+        - num_perm (int): Number of hash functions, the length of the signatures.
+        - ngram (int): Length of the character n-grams of each word.
+        - seed (int): Seed of the hash functions; signatures are only comparable
+                      between hashers with the same parameters.
+        """
+        self.num_perm = num_perm
+        self.ngram = ngram
+        generator = np.random.RandomState(seed)
+        # a and b below 2**31 keep a * x + b below 2**64 for 32-bit x
+        self._a = generator.randint(1, 2 ** 31, size=num_perm).astype(np.uint64)
+        self._b = generator.randint(0, 2 ** 31, size=num_perm).astype(np.uint64)
+
+    def shingles(self, text: str) -> Set[str]:
+        """ Returns the set of character n-grams of the words of text, padded with spaces. """
+        shingles = set()
+        for token in _TOKEN_RE.findall(text.lower()):
+            padded = f" {token} "
+            for start in range(max(len(padded) - self.ngram + 1, 1)):
+                shingles.add(padded[start:start + self.ngram])
+        return shingles
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Returns the MinHash signature of text: for each hash function, the minimum
+        hash of its n-grams.
+
+        Parameters:
+        - text (str): Text to sign.
+
+        Returns:
+        - np.ndarray: Signature of shape (num_perm,).
+        """
+        shingles = self.shingles(text)
+        if not shingles:
+            return np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode()) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+class NearDuplicate(NamedTuple):
+    """ A recent text similar to the looked up text. """
+    key: str
+    similarity: float
+    value: Any
+
+class NearDuplicateIndex(object):
+    """
+    LSH index of recent texts, each with a value (e.g. its classification).
+
+    A text is a near-duplicate of an indexed one when the estimated Jaccard
+    similarity of their n-gram sets is at least threshold. With bands bands of
+    num_perm / bands rows, texts at the threshold share a band, and are compared,
+    with a probability close to 1.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        window_seconds: float = 3600,
+        max_entries: int = 10000,
+        num_perm: int = 64,
+        bands: int = 16,
+        hasher: Optional[MinHasher] = None
+    ):
+        """
+        Parameters:
+        - threshold (float): Minimum estimated Jaccard similarity of near-duplicates.
+        - window_seconds (float): Texts older than this are forgotten.
+        - max_entries (int): Maximum number of texts; the oldest are forgotten first.
+        - num_perm (int): Length of the MinHash signatures.
+        - bands (int): Number of LSH bands, a divisor of num_perm.
+        - hasher (MinHasher, optional): Hasher of the texts.
+        """
+        if num_perm % bands:
+            raise ValueError(f"The number of bands ({bands}) must divide num_perm ({num_perm})")
+        self.threshold = threshold
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self.bands = bands
+        self.hasher = hasher or MinHasher(num_perm)
+
+        # Entries by key in insertion order: (indexed at, signature, band keys, value)
+        self._entries: "OrderedDict[str, Tuple[float, np.ndarray, List[Tuple[int, bytes]], Any]]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, bytes], Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(band, rows.tobytes()) for band, rows in enumerate(signature.reshape(self.bands, -1))]
+
+    def query(self, text: str) -> Optional[NearDuplicate]:
+        """
+        Find the most similar recent text.
+
+        Parameters:
+        - text (str): Text to look up.
+
+        Returns:
+        - Optional[NearDuplicate]: The key, estimated similarity and value of the most
+          similar indexed text above threshold, None if there is none.
+        """
+        signature = self.hasher.signature(text)
+        best = None
+        with self._lock:
+            self._evict(time.monotonic())
+            candidates = set()
+            for band_key in self._band_keys(signature):
+                candidates.update(self._buckets.get(band_key, ()))
+            for key in candidates:
+                _, candidate_signature, _, value = self._entries[key]
+                similarity = float(np.mean(candidate_signature == signature))
+                if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                    best = NearDuplicate(key, similarity, value)
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return best
+
+    def add(self, key: str, text: str, value: Any) -> None:
+        """
+        Index a text with its value, replacing any entry with the same key.
+        """
+        signature = self.hasher.signature(text)
+        band_keys = self._band_keys(signature)
+        now = time.monotonic()
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (now, signature, band_keys, value)
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, set()).add(key)
+            self._evict(now)
+
+    def stats(self) -> dict:
+        """ Returns the counters of the index. """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self)}
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band_key in entry[2]:
+            bucket = self._buckets[band_key]
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[band_key]
+
+    def _evict(self, now: float) -> None:
+        """ Forget the texts older than the time window and beyond the capacity. """
+        expired_before = now - self.window_seconds
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry[0] > expired_before and len(self._entries) <= self.max_entries:
+                break
+            self._remove(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,98 @@
+"""
+Token budget of classification prompts.
+
+A prompt is made of fixed parts (instructions, tool definition and the expected
+completion), few-shot examples and the incident report. When they do not fit the
+budget, the prompt is shrunk in priority order: the least similar examples are
+dropped first, then the report's description is cut in the middle, keeping its
+beginning and end. This bounds the cost and latency of a call whatever the input.
+"""
+
+from typing import NamedTuple, Optional, Sequence
+
+from app.utils.token_utils import TokenCounter
+
+# Replaces the middle of a truncated description
+TRUNCATION_MARKER = " [...] "
+
+class PromptPlan(NamedTuple):
+    """ What fits in the budget. """
+    examples: int  # Number of examples kept, the last ones given
+    description: Optional[str]  # Truncated description, None if it fits as is
+    tokens: int  # Calibrated token count of the prompt and completion
+
+def truncate_middle(text: str, max_tokens: int, counter: TokenCounter) -> str:
+    """
+    Cut the middle of a text so that it fits in max_tokens raw tokens.
+
+    Parameters:
+    - text (str): The text.
+    - max_tokens (int): Maximum raw token count, see TokenCounter.
+    - counter (TokenCounter): Counter of the tokens.
+
+    Returns:
+    - str: The text if it fits, else its beginning and end around TRUNCATION_MARKER,
+      or an empty string if not even the marker fits.
+    """
+    tokens = counter.count(text)
+    if tokens <= max_tokens:
+        return text
+    # First guess proportional to the length, then shorter until it fits
+    keep = int(len(text) * max_tokens / tokens)
+    while keep > 0:
+        head = (keep + 1) // 2
+        tail = keep - head
+        truncated = text[:head].rstrip() + TRUNCATION_MARKER + (text[-tail:].lstrip() if tail else "")
+        if counter.count(truncated) <= max_tokens:
+            return truncated
+        keep = keep * 9 // 10
+    return ""
+
+class PromptBudget(object):
+    """ Fits prompts in a maximum number of tokens by dropping examples, then truncating the report. """
+
+    def __init__(self, max_tokens: int, counter: TokenCounter):
+        """
+        Parameters:
+        - max_tokens (int): Maximum tokens of a call, prompt and completion; 0 is unlimited.
+        - counter (TokenCounter): Counter of the tokens.
+        """
+        self.max_tokens = max_tokens
+        self.counter = counter
+
+    def fit(
+        self,
+        fixed_tokens: int,
+        example_tokens: Sequence[int],
+        report_tokens: int,
+        description: str
+    ) -> PromptPlan:
+        """
+        Plan a prompt within the budget.
+
+        Parameters:
+        - fixed_tokens (int): Raw tokens of the parts that cannot shrink.
+        - example_tokens (Sequence[int]): Raw tokens of each example, least important first
+          (the order of ExampleSelector.select).
+        - report_tokens (int): Raw tokens of the rendered report, description included.
+        - description (str): Description of the report, truncated if needed.
+
+        Returns:
+        - PromptPlan: The examples kept, the truncated description if any, and the tokens.
+        """
+        examples = len(example_tokens)
+        tokens = fixed_tokens + report_tokens + sum(example_tokens)
+        if not self.max_tokens:
+            return PromptPlan(examples, None, self.counter.scale(tokens))
+
+        limit = self.counter.unscale(self.max_tokens)
+        while examples and tokens > limit:
+            tokens -= example_tokens[len(example_tokens) - examples]
+            examples -= 1
+        if tokens <= limit:
+            return PromptPlan(examples, None, self.counter.scale(tokens))
+
+        description_tokens = self.counter.count(description)
+        truncated = truncate_middle(description, max(limit - (tokens - description_tokens), 0), self.counter)
+        tokens += self.counter.count(truncated) - description_tokens
+        return PromptPlan(0, truncated, self.counter.scale(tokens))
@@ -0,0 +1,94 @@
+"""
+Rendering of incident reports in LLM prompts.
+
+Reports are rendered in a single pass by pydantic, restricted to the fields that
+carry classification signal (a projection such as "location,description,witnesses.name"
+leaves out witness contact details), in a compact format: JSON without whitespace,
+or one "field: value" line per field, which spends no tokens on quotes and braces.
+"""
+
+from typing import Any, Dict, Iterable, Optional, Union
+import json
+
+from pydantic import BaseModel
+
+PROMPT_FORMATS = ("json", "text")
+
+def parse_field_projection(fields: Union[str, Iterable[str]]) -> Optional[Dict[str, Any]]:
+    """
+    Convert dotted field paths into a pydantic include argument. Paths into a list
+    apply to all its items, e.g. "witnesses.name" keeps the name of every witness.
+
+    Parameters:
+    - fields (Union[str, Iterable[str]]): Comma-separated or listed field paths; empty or "*" keeps all fields.
+
+    Returns:
+    - Optional[Dict[str, Any]]: The include argument of model_dump, None for all fields.
+    """
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    paths = [path.strip() for path in fields if path.strip()]
+    if not paths or "*" in paths:
+        return None
+    include: Dict[str, Any] = {}
+    for path in paths:
+        node = include
+        names = path.split(".")
+        for name in names[:-1]:
+            child = node.get(name)
+            if child is True:  # The whole field is already kept
+                break
+            # "__all__" applies the nested projection to every item of a list
+            node = node.setdefault(name, {"__all__": {}})["__all__"]
+        else:
+            node[names[-1]] = True
+    return include
+
+class PromptSerializer(object):
+    """ Renders pydantic models, e.g. incident reports, as compact prompt text. """
+
+    def __init__(
+        self,
+        fields: Union[str, Iterable[str]] = "*",
+        format: str = "json",
+        exclude: Optional[Iterable[str]] = None
+    ):
+        """
+        Parameters:
+        - fields (Union[str, Iterable[str]]): Field paths kept in the prompt, see parse_field_projection.
+        - format (str): "json" (compact JSON) or "text" (one "field: value" line per field).
+        - exclude (Iterable[str], optional): Top-level fields never rendered, even if projected.
+
+        Raises:
+        - ValueError: If the format is unknown.
+        """
+        if format not in PROMPT_FORMATS:
+            raise ValueError(f"Unknown prompt format: {format}. Expected one of: {', '.join(PROMPT_FORMATS)}")
+        self.include = parse_field_projection(fields)
+        self.exclude = set(exclude) if exclude else None
+        self.format = format
+
+    def serialize(self, model: BaseModel) -> str:
+        """
+        Render the projected fields of a model that are not None.
+
+        Parameters:
+        - model (BaseModel): The model, e.g. an IncidentReport.
+
+        Returns:
+        - str: The prompt text.
+        """
+        if self.format == "json":
+            return model.model_dump_json(include=self.include, exclude=self.exclude, exclude_none=True)
+        return "\n".join(
+            f"{name}: {value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, separators=(',', ':'))}"
+            for name, value in self.dump(model).items()
+        )
+
+    def dump(self, model: BaseModel) -> Dict[str, Any]:
+        """ Returns the projected fields of a model that are not None, as JSON values. """
+        return model.model_dump(mode="json", include=self.include, exclude=self.exclude, exclude_none=True)
+
+    def fingerprint(self) -> dict:
+        """ Returns the settings changing the rendered text, e.g. for cache keys. """
+        return {"fields": self.include, "exclude": sorted(self.exclude or ()), "format": self.format}
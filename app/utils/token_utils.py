@@ -0,0 +1,111 @@
+"""
+Token count estimation.
+
+Estimates are used to schedule LLM calls against tokens-per-minute budgets before
+the actual usage is known, and to keep prompts within a token budget. They only need
+to be close, not exact: the scheduler reconciles them with the usage reported by the
+LLM, and TokenCounter calibrates its estimates on that usage. With a local tokenizer
+(tiktoken, when its encoding files are available offline) counts are exact.
+"""
+
+from typing import Callable, Iterable, List, Optional
+import json
+import threading
+
+from langchain_core.messages import BaseMessage
+
+from app.core.logger import get_logger
+logger = get_logger(__name__)
+
+# Average characters per token of English and Norwegian text with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+
+# Tokens added by the chat format for every message (role, separators)
+TOKENS_PER_MESSAGE = 4
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text.
+
+    Parameters:
+    - text (str): The text.
+
+    Returns:
+    - int: Estimated number of tokens.
+    """
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+class TokenCounter(object):
+    """
+    Counts tokens with a local tokenizer, or estimates them from the length of texts
+    scaled by a ratio calibrated on the usage reported by the LLM.
+
+    Counts returned by count and count_messages are raw: they do not depend on the
+    calibration, so they can be cached (e.g. per few-shot example). scale converts
+    raw counts into calibrated token counts, and unscale converts a token budget
+    into raw counts.
+    """
+
+    # Bounds of the calibration ratio, and weight of each new observation
+    MIN_RATIO = 0.5
+    MAX_RATIO = 2.0
+    CALIBRATION_WEIGHT = 0.05
+
+    def __init__(self, encoding: Optional[str] = None):
+        """
+        Parameters:
+        - encoding (str, optional): tiktoken encoding, e.g. "o200k_base". Counts are
+          estimated when it is not given or cannot be loaded offline.
+        """
+        self._encode: Optional[Callable[[str], List[int]]] = None
+        if encoding:
+            try:
+                import tiktoken
+                self._encode = tiktoken.get_encoding(encoding).encode_ordinary
+            except Exception as e:
+                logger.warning(f"Cannot load the {encoding} tokenizer ({e!r}), estimating token counts instead")
+        self.ratio = 1.0
+        self._lock = threading.Lock()
+
+    @property
+    def exact(self) -> bool:
+        """ Whether counts come from a tokenizer, and are not calibrated. """
+        return self._encode is not None
+
+    def count(self, text: str) -> int:
+        """ Returns the raw token count of a text. """
+        if self._encode is not None:
+            return len(self._encode(text))
+        return estimate_tokens(text)
+
+    def count_messages(self, messages: Iterable[BaseMessage]) -> int:
+        """ Returns the raw prompt token count of chat messages, tool calls included. """
+        tokens = 0
+        for message in messages:
+            tokens += TOKENS_PER_MESSAGE + self.count(str(message.content))
+            for tool_call in getattr(message, "tool_calls", None) or []:
+                tokens += self.count(tool_call["name"]) + self.count(json.dumps(tool_call["args"]))
+        return tokens
+
+    def scale(self, raw_tokens: int) -> int:
+        """ Returns the calibrated token count of a raw count. """
+        return raw_tokens if self.exact else int(raw_tokens * self.ratio + 0.5)
+
+    def unscale(self, tokens: int) -> int:
+        """ Returns the raw count matching a calibrated token count, e.g. of a budget. """
+        return tokens if self.exact else int(tokens / self.ratio)
+
+    def calibrate(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """
+        Move the ratio towards the one observed on a call.
+
+        Parameters:
+        - estimated_tokens (int): Calibrated estimate of the call, see scale.
+        - actual_tokens (int): Tokens reported by the LLM for the call.
+        """
+        if self.exact or estimated_tokens <= 0 or actual_tokens <= 0:
+            return
+        with self._lock:
+            observed = self.ratio * actual_tokens / estimated_tokens
+            ratio = (1 - self.CALIBRATION_WEIGHT) * self.ratio + self.CALIBRATION_WEIGHT * observed
+            self.ratio = min(max(ratio, self.MIN_RATIO), self.MAX_RATIO)
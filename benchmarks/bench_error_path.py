@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Error-path benchmark: cost of raising classification errors.
+
+Measures two things:
+
+1. The caller lookup of raise_with_log, the previous implementation with
+   inspect.stack() (which reads the source lines of every frame) against
+   sys._getframe, at several stack depths.
+2. Throughput of IncidentService.aclassify when every fake LLM call succeeds
+   against when every call fails (error rate 1), at near-zero LLM latency, so that
+   the error path is compared with the success path under the same load.
+
+No API key or network access is required.
+
+Usage:
+    python -m benchmarks.bench_error_path [--depths 5,20,50] [--calls N]
+                                          [--requests N] [--concurrency N]
+"""
+
+import argparse
+import asyncio
+import inspect
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Callable
+
+def stack_runner_info() -> str:
+    """ The previous runner_info: builds the whole stack, with source context. """
+    stack = inspect.stack()
+    caller = stack[2]
+    return f"{caller.filename}:{caller.function}:{caller.lineno}"
+
+def frame_runner_info() -> str:
+    """ The current runner_info: looks up the caller's frame only. """
+    frame = sys._getframe(2)
+    return f"{frame.f_code.co_filename}:{frame.f_code.co_name}:{frame.f_lineno}"
+
+def at_depth(depth: int, function: Callable[[], str]) -> str:
+    """ Call function (through one wrapper, like raise_with_log) below depth frames. """
+    if depth > 0:
+        return at_depth(depth - 1, function)
+    return (lambda: function())()
+
+def time_lookup(function: Callable[[], str], depth: int, calls: int) -> float:
+    """ Mean time of one caller lookup in microseconds. """
+    started = time.perf_counter()
+    for _ in range(calls):
+        at_depth(depth, function)
+    return (time.perf_counter() - started) / calls * 1e6
+
+def make_report(index: int) -> dict:
+    """ A distinct incident report, so that requests are neither cached nor coalesced. """
+    return {
+        "incident_datetime": datetime(2024, 6, 11, 14, 30).isoformat(),
+        "location": "Main Office Building, Floor 3",
+        "description": f"Power outage number {index} affected the entire floor for an hour.",
+    }
+
+async def classify_throughput(error_rate: float, requests: int, concurrency: int) -> dict:
+    """ Requests per second of aclassify with the fake LLM failing at error_rate. """
+    from fastapi.exceptions import HTTPException
+
+    from app.core.llm_session import get_llm
+    from app.schemas.incident_schema import IncidentReport
+    from app.services.incident_service import IncidentService
+
+    get_llm().error_rate = error_rate
+    service = IncidentService()
+    status_codes: dict = {}
+    next_index = iter(range(requests))
+
+    async def client() -> None:
+        for index in next_index:
+            try:
+                await service.aclassify(IncidentReport(**make_report(index)))
+                code = 200
+            except HTTPException as e:
+                code = e.status_code
+            status_codes[code] = status_codes.get(code, 0) + 1
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))  # Warm-up
+    next_index = iter(range(requests, 2 * requests))
+    status_codes.clear()
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"rps": requests / elapsed, "status_codes": status_codes}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depths", default="5,20,50", help="Comma-separated stack depths")
+    parser.add_argument("--calls", type=int, default=2000, help="Caller lookups per depth")
+    parser.add_argument("--requests", type=int, default=500, help="Classifications per error rate")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"{'depth':>6} {'inspect.stack us':>17} {'sys._getframe us':>17} {'speedup':>8}")
+    for depth in (int(depth) for depth in args.depths.split(",")):
+        stack_us = time_lookup(stack_runner_info, depth, max(args.calls // 10, 1))
+        frame_us = time_lookup(frame_runner_info, depth, args.calls)
+        print(f"{depth:>6} {stack_us:>17.1f} {frame_us:>17.2f} {stack_us / frame_us:>7.0f}x")
+
+    # The configuration is read at import time, so the environment is set first
+    os.environ.update({
+        "APP_LLM_BACKEND": "fake",
+        "APP_FAKE_LLM_LATENCY_MS": "0",
+        "APP_CLASSIFICATION_CACHE_BACKEND": "none",
+        "APP_LOCAL_CLASSIFIER_ENABLED": "false",
+        "APP_NEAR_DUPLICATE_ENABLED": "false",
+        "APP_LLM_RATE_LIMIT_RETRIES": "0",
+        "APP_LLM_MAX_CONCURRENCY": str(args.concurrency),
+    })
+    from app.config import config as app_config
+    from app.core.environment import get_environment
+    logging.getLogger(app_config[get_environment()].APP_NAME).setLevel(logging.CRITICAL)
+
+    print(f"\n{'error rate':>10} {'req/s':>9}  status codes")
+    for error_rate in (0.0, 1.0):
+        row = asyncio.run(classify_throughput(error_rate, args.requests, args.concurrency))
+        print(f"{error_rate:>10.1f} {row['rps']:>9.1f}  {row['status_codes']}")
+
+if __name__ == "__main__":
+    main()
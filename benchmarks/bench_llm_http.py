@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" LLM HTTP client benchmark: connection warm-up and pool saturation.
+
+Runs IncidentService.aclassify with the openai backend against the local stub of
+the chat completions API (benchmarks.stub_openai_server), which adds --handshake-ms
+to the first request of each connection, standing for the DNS, TCP and TLS setup
+of a real endpoint. Each scenario runs in a fresh process, with empty pools.
+
+1. First burst: latency of the first --burst concurrent classifications of a
+   process, with cold pools against pools warmed up at startup, as the app's
+   lifespan does with APP_LLM_HTTP_WARMUP_CONNECTIONS.
+2. Pool saturation: throughput and latency of --requests classifications with
+   --concurrency in flight, for each pool size of --pools, with the largest number
+   of requests in flight and of open connections sampled from the metrics: the
+   requests beyond the open connections were waiting for one.
+
+No API key or network access is required.
+
+Usage:
+    python -m benchmarks.bench_llm_http [--burst N] [--pools 4,16,64] [--requests N]
+                                        [--concurrency N] [--latency-ms MS] [--handshake-ms MS]
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import httpx
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_stub(port: int, latency_ms: float, handshake_ms: float) -> subprocess.Popen:
+    """ Start the stub API and wait until it answers. """
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.stub_openai_server", "--port", str(port),
+        "--latency-ms", str(latency_ms), "--handshake-ms", str(handshake_ms),
+    ])
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/v1/models", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("The stub API did not start")
+
+def make_report(index: int) -> dict:
+    """ A distinct incident report, so that requests are neither cached nor coalesced. """
+    return {
+        "incident_datetime": datetime(2024, 6, 11, 14, 30).isoformat(),
+        "location": "Main Office Building, Floor 3",
+        "description": f"Power outage number {index} affected the entire floor for an hour.",
+    }
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+async def classify_all(service, indexes, concurrency: int) -> list:
+    """ Classify a report per index with concurrency clients, returns the latencies in seconds. """
+    from app.schemas.incident_schema import IncidentReport
+
+    latencies = []
+    indexes = iter(indexes)
+
+    async def client() -> None:
+        for index in indexes:
+            started = time.perf_counter()
+            await service.aclassify(IncidentReport(**make_report(index)))
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies
+
+async def first_burst(warm: bool, burst: int) -> dict:
+    """ Latencies of the first burst of classifications of the process. """
+    from app.core.llm_http import warm_up_llm_http_clients
+    from app.services.incident_service import IncidentService
+
+    service = IncidentService()
+    started = time.perf_counter()
+    if warm:
+        await warm_up_llm_http_clients(burst)
+    warm_up = time.perf_counter() - started
+    latencies = await classify_all(service, range(burst), burst)
+    return {"warm_up": warm_up, "mean": statistics.mean(latencies), "max": max(latencies)}
+
+async def saturation(requests: int, concurrency: int) -> dict:
+    """ Throughput and pool usage of requests classifications with concurrency in flight. """
+    from app.core import metrics
+    from app.core.llm_http import warm_up_llm_http_clients
+    from app.services.incident_service import IncidentService
+
+    service = IncidentService()
+    await warm_up_llm_http_clients()
+    in_flight = metrics.LLM_HTTP_REQUESTS_IN_FLIGHT.labels("async")
+    active = metrics.LLM_HTTP_CONNECTIONS.labels("async", "active")
+    idle = metrics.LLM_HTTP_CONNECTIONS.labels("async", "idle")
+    peaks = {"in_flight": 0, "connections": 0}
+
+    async def sample() -> None:
+        while True:
+            peaks["in_flight"] = max(peaks["in_flight"], in_flight.value)
+            peaks["connections"] = max(peaks["connections"], active.value + idle.value)
+            await asyncio.sleep(0.005)
+
+    sampler = asyncio.create_task(sample())
+    started = time.perf_counter()
+    latencies = await classify_all(service, range(requests), concurrency)
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+    return {
+        "rps": requests / elapsed,
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "pool_timeouts": metrics.LLM_HTTP_POOL_TIMEOUTS.labels("async").value,
+        **peaks,
+    }
+
+def run_scenario(name: str, *args) -> dict:
+    """ Run a scenario in this (fresh) process. """
+    from app.config import config as app_config
+    from app.core.environment import get_environment
+    logging.getLogger(app_config[get_environment()].APP_NAME).setLevel(logging.CRITICAL)
+
+    scenario = {"first_burst": first_burst, "saturation": saturation}[name]
+    return asyncio.run(scenario(*args))
+
+def in_new_process(environ: dict, name: str, *args) -> dict:
+    """ Run a scenario in a new process, the configuration being read from environ at import. """
+    os.environ.update(environ)
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_scenario, name, *args).result()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=8, help="Concurrent classifications of the first burst")
+    parser.add_argument("--pools", default="4,16,64", help="Comma-separated pool sizes (max connections)")
+    parser.add_argument("--requests", type=int, default=400, help="Classifications per pool size")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Latency of a completion")
+    parser.add_argument("--handshake-ms", type=float, default=100, help="Extra latency of a new connection")
+    args = parser.parse_args()
+
+    port = free_port()
+    stub = start_stub(port, args.latency_ms, args.handshake_ms)
+    environ = {
+        "APP_LLM_BACKEND": "openai",
+        "APP_OPENAI_BASE_URL": f"http://127.0.0.1:{port}/v1",
+        "APP_OPENAI_API_KEY": "stub",
+        "APP_OPENAI_LLM_MODEL": "stub",
+        "APP_CLASSIFICATION_CACHE_BACKEND": "none",
+        "APP_LOCAL_CLASSIFIER_ENABLED": "false",
+        "APP_NEAR_DUPLICATE_ENABLED": "false",
+        "APP_LOG_PAYLOAD_SAMPLE_RATE": "0",
+        "APP_LLM_MAX_CONCURRENCY": str(max(args.concurrency, args.burst)),
+    }
+    try:
+        print(f"First burst of {args.burst} classifications, {args.latency_ms:g} ms completions, "
+              f"{args.handshake_ms:g} ms per new connection\n")
+        print(f"{'pools':<8} {'warm-up ms':>11} {'mean ms':>9} {'max ms':>9}")
+        for warm in (False, True):
+            row = in_new_process(environ, "first_burst", warm, args.burst)
+            print(f"{'warm' if warm else 'cold':<8} {row['warm_up'] * 1000:>11.1f} "
+                  f"{row['mean'] * 1000:>9.1f} {row['max'] * 1000:>9.1f}")
+
+        print(f"\n{args.requests} classifications, {args.concurrency} in flight\n")
+        print(f"{'pool':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'peak in flight':>15} "
+              f"{'peak connections':>17} {'pool timeouts':>14}")
+        for pool in (int(pool) for pool in args.pools.split(",")):
+            row = in_new_process(
+                {**environ, "APP_LLM_HTTP_MAX_CONNECTIONS": str(pool), "APP_LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS": str(pool)},
+                "saturation", args.requests, args.concurrency
+            )
+            print(f"{pool:>5} {row['rps']:>8.1f} {row['p50'] * 1000:>8.1f} {row['p99'] * 1000:>8.1f} "
+                  f"{row['in_flight']:>15.0f} {row['connections']:>17.0f} {row['pool_timeouts']:>14.0f}")
+    finally:
+        stub.terminate()
+        stub.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Load test: latency, throughput and memory of the classification path.
+
+Drives IncidentService.aclassify directly ("service") and POST /report-incident
+through the ASGI app ("http") at increasing concurrency, and reports p50/p95/p99
+latency, requests per second, errors and peak resident memory for each level.
+
+The LLM is the local fake backend (APP_LLM_BACKEND=fake) with a constant latency
+by default, so the service overhead is the latency above --latency-ms. Every
+request carries a distinct report, and the cache and local pre-classifier are
+disabled, so every request reaches the (fake) LLM. No API key or network access
+is required.
+
+With --router-backends, the LLM router is measured instead, over fake backends given
+as a JSON list of FakeChatModel parameters, e.g. to see the effect of hedging on p99:
+
+    python -m benchmarks.bench_load --router-backends \
+        '[{"latency_mean": 0.05, "latency_jitter": 1.2}, {"latency_mean": 0.05, "latency_jitter": 1.2}]'
+
+Usage:
+    python -m benchmarks.bench_load [--target service|http|both] [--concurrency 1,8,32,128]
+                                    [--requests N] [--latency-ms MS] [--json results.json]
+                                    [--router-backends JSON] [--hedge-percentile P]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import statistics
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """ Nearest-rank percentile of already sorted values. """
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def peak_rss_mib() -> float:
+    """ Peak resident set size of the process in MiB. """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def make_report(index: int) -> dict:
+    """ A distinct incident report, so that requests are neither cached nor coalesced. """
+    return {
+        "incident_datetime": datetime(2024, 6, 11, 14, 30).isoformat(),
+        "location": "Main Office Building, Floor 3",
+        "description": f"Power outage number {index} affected the entire floor for an hour.",
+        "witnesses": [{"name": "John Doe", "contact": "john.doe@example.com"}],
+    }
+
+async def run_level(
+    send: Callable[[int], Awaitable[bool]],
+    concurrency: int,
+    requests: int,
+    offset: int
+) -> Dict[str, float]:
+    """
+    Send requests with a fixed number of concurrent clients (closed loop).
+
+    Parameters:
+    - send (Callable[[int], Awaitable[bool]]): Sends the request with the given index,
+      returns whether it succeeded.
+    - concurrency (int): Number of concurrent clients.
+    - requests (int): Total number of requests.
+    - offset (int): Index of the first request, keeping reports distinct across levels.
+
+    Returns:
+    - Dict[str, float]: Latency percentiles in ms, requests per second, errors and peak RSS.
+    """
+    latencies: List[float] = []
+    errors = 0
+    next_index = iter(range(offset, offset + requests))
+
+    async def client() -> None:
+        nonlocal errors
+        for index in next_index:
+            start = time.perf_counter()
+            ok = await send(index)
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "rps": requests / elapsed,
+        "errors": errors,
+        "peak_rss_mib": peak_rss_mib(),
+    }
+
+async def benchmark(target: str, levels: List[int], requests: int, quiet: bool) -> List[dict]:
+    """ Run every concurrency level against target, returning one result row per level. """
+    import httpx
+    from fastapi.exceptions import HTTPException
+
+    from app import create_app
+    from app.config import config as app_config
+    from app.core.environment import get_environment
+    from app.schemas.incident_schema import IncidentReport
+    from app.services.incident_service import IncidentService
+
+    if target == "service":
+        service = IncidentService()
+
+        async def send(index: int) -> bool:
+            try:
+                await service.aclassify(IncidentReport(**make_report(index)))
+                return True
+            except HTTPException:
+                return False
+
+        client = None
+    else:
+        app = create_app()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark")
+
+        async def send(index: int) -> bool:
+            response = await client.post("/report-incident", json=make_report(index))
+            return response.status_code == 200
+
+    if quiet:
+        logging.getLogger(app_config[get_environment()].APP_NAME).setLevel(logging.WARNING)
+
+    await send(-1)  # Warm-up: builds the service and its chains
+
+    rows = []
+    offset = 0
+    for concurrency in levels:
+        row = await run_level(send, concurrency, requests, offset)
+        row["target"] = target
+        rows.append(row)
+        offset += requests
+        print(
+            f"{target:<8} {concurrency:>6} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+            f"{row['p99_ms']:>9.1f} {row['rps']:>9.1f} {row['errors']:>7} {row['peak_rss_mib']:>9.1f}",
+            flush=True
+        )
+
+    if client is not None:
+        await client.aclose()
+    return rows
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("service", "http", "both"), default="both")
+    parser.add_argument("--concurrency", default="1,8,32,128", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per concurrency level")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latency of the fake LLM")
+    parser.add_argument("--latency-distribution", default="constant")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of failed fake LLM calls")
+    parser.add_argument("--invalid-output-rate", type=float, default=0.0, help="Fraction of invalid fake LLM answers")
+    parser.add_argument("--router-backends", help="JSON list of fake backends for the LLM router")
+    parser.add_argument("--hedge-percentile", type=float, default=0.95, help="Router hedging, 0 disables it")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--log", action="store_true", help="Keep the application's INFO logging")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    # The configuration is read at import time, so the environment is set first
+    os.environ.update({
+        "APP_LLM_BACKEND": "fake",
+        "APP_FAKE_LLM_LATENCY_MS": str(args.latency_ms),
+        "APP_FAKE_LLM_LATENCY_DISTRIBUTION": args.latency_distribution,
+        "APP_FAKE_LLM_ERROR_RATE": str(args.error_rate),
+        "APP_FAKE_LLM_INVALID_OUTPUT_RATE": str(args.invalid_output_rate),
+        "APP_CLASSIFICATION_CACHE_BACKEND": "none",
+        "APP_LOCAL_CLASSIFIER_ENABLED": "false",
+        "APP_NEAR_DUPLICATE_ENABLED": "false",
+        "APP_LLM_MAX_CONCURRENCY": str(max(levels)),
+    })
+    if args.router_backends:
+        backends = [{"provider": "fake", **backend} for backend in json.loads(args.router_backends)]
+        os.environ.update({
+            "APP_LLM_BACKEND": "router",
+            "APP_LLM_ROUTER_BACKENDS": json.dumps(backends),
+            "APP_LLM_ROUTER_HEDGE_PERCENTILE": str(args.hedge_percentile),
+        })
+
+    print(f"{'target':<8} {'conc':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'errors':>7} {'rss MiB':>9}")
+    targets = ["service", "http"] if args.target == "both" else [args.target]
+    rows = []
+    for target in targets:
+        rows += asyncio.run(benchmark(target, levels, args.requests, quiet=not args.log))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as results_file:
+            json.dump({"latency_ms": args.latency_ms, "results": rows}, results_file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Benchmark of the local pre-classifier on a labelled JSONL corpus.
+
+Trains the local classifier on part of the corpus and reports, for the rest, how
+many LLM calls the cascade would avoid at the given confidence threshold, how many
+calls it would shorten by answering some of the fields locally (partial
+resolution), the accuracy of what it answers locally and its throughput.
+
+Each line of the corpus is an object with an "incident_report" and its
+"incident_classification", as in IncidentResponse. Use --save to store the
+trained weights for APP_LOCAL_CLASSIFIER_MODEL_PATH (with --train-fraction 1 to
+train on the whole corpus).
+
+Usage:
+    python -m benchmarks.bench_local_classifier --corpus labelled.jsonl [--threshold 0.9]
+"""
+
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("APP_OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("APP_OPENAI_LLM_MODEL", "gpt-4o-mini")
+
+from app.services.local_classifier import CLASSIFICATION_FIELDS, LocalClassifier, load_labelled_corpus
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", required=True, help="Labelled JSONL corpus")
+    parser.add_argument("--threshold", type=float, default=0.9, help="Minimum confidence to skip the LLM")
+    parser.add_argument("--train-fraction", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="Save the trained weights to this .npz file")
+    args = parser.parse_args()
+
+    records = load_labelled_corpus(args.corpus)
+    random.Random(args.seed).shuffle(records)
+    split = int(len(records) * args.train_fraction)
+    train, test = records[:split], records[split:]
+
+    start = time.perf_counter()
+    classifier = LocalClassifier().fit(train) if train else LocalClassifier()
+    print(f"Trained on {len(train)} reports in {time.perf_counter() - start:.2f} s")
+    if args.save:
+        classifier.save(args.save)
+        print(f"Saved weights to {args.save}")
+    if not test:
+        return
+
+    start = time.perf_counter()
+    predictions = [classifier.predict(incident) for incident, _ in test]
+    elapsed = time.perf_counter() - start
+
+    resolved = [
+        (prediction, classification)
+        for prediction, (_, classification) in zip(predictions, test)
+        if prediction.confidence >= args.threshold
+    ]
+    correct = sum(
+        all(prediction.values[field] == classification[field] for field in CLASSIFICATION_FIELDS)
+        for prediction, classification in resolved
+    )
+    # Fields answered locally per report; the LLM is only asked for the others
+    local_fields = [len(prediction.confident_fields(args.threshold)) for prediction in predictions]
+    partial = sum(0 < count < len(CLASSIFICATION_FIELDS) for count in local_fields)
+
+    print(f"\nEvaluated on {len(test)} reports at threshold {args.threshold}")
+    print(f"Throughput:               {len(test) / elapsed:,.0f} reports/s ({elapsed / len(test) * 1e3:.3f} ms/report)")
+    print(f"LLM calls avoided:        {len(resolved)} ({len(resolved) / len(test):.1%})")
+    if resolved:
+        print(f"Accuracy when avoided:    {correct / len(resolved):.1%} (all fields correct)")
+    print(f"Partially resolved:       {partial} ({partial / len(test):.1%}), LLM asked for fewer fields")
+    print(
+        f"Fields answered locally:  {sum(local_fields) / len(test):.2f} of {len(CLASSIFICATION_FIELDS)} per report "
+        f"({sum(local_fields) / (len(test) * len(CLASSIFICATION_FIELDS)):.1%})"
+    )
+
+    print(f"\n{'field':<10} {'confident':>10} {'accuracy':>10}")
+    for field in CLASSIFICATION_FIELDS:
+        confident = [
+            (prediction.values[field], classification[field])
+            for prediction, (_, classification) in zip(predictions, test)
+            if prediction.confidences.get(field, 0.0) >= args.threshold
+        ]
+        accuracy = sum(predicted == expected for predicted, expected in confident) / len(confident) if confident else 0.0
+        print(f"{field:<10} {len(confident) / len(test):>10.1%} {accuracy:>10.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Micro-benchmark: prompt serialization of incident reports and JSON response encoding.
+
+Compares, per report, the CPU time and prompt tokens of the previous serialization
+path (incident.dict(), datetimes converted to ISO strings in place, json.dumps) with
+PromptSerializer rendering all fields, the default field projection (without witness
+contacts) and the "text" format. Tokens are counted with tiktoken when its encoding
+can be loaded, and estimated at 4 characters per token otherwise.
+
+It also compares the encoding of a page of stored incidents, a typical large API
+response, by Starlette's JSONResponse and the ORJSONResponse the app now uses.
+
+Usage:
+    python -m benchmarks.bench_prompt_serialization [--reports N] [--iterations N]
+                                                    [--corpus reports.jsonl] [--encoding o200k_base]
+"""
+
+import argparse
+import json
+import random
+import time
+import warnings
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from fastapi.responses import ORJSONResponse
+from starlette.responses import JSONResponse
+
+from app.schemas.incident_schema import IncidentReport, WitnessDetail
+from app.utils.prompt_serializer import PromptSerializer
+from app.utils.token_utils import estimate_tokens
+
+DEFAULT_FIELDS = "incident_datetime,location,description,witnesses.name"
+EXCLUDED_FIELDS = {"classification_hints", "priority"}
+
+DESCRIPTIONS = [
+    "Unauthorized access to the server room was detected after hours.",
+    "A phishing email asked employees to reset their passwords on an external site.",
+    "The main database was unavailable for two hours after a failed disk.",
+    "A laptop with customer records was stolen from a parked car.",
+    "Strømbrudd i hele tredje etasje, ingen tilgang til skrivere eller nettverk.",
+    "Water leaked from the ceiling onto the network switches in the basement.",
+]
+
+def make_reports(count: int, seed: int = 0) -> List[IncidentReport]:
+    """ Reports with 0 to 3 witnesses each, like those the API receives. """
+    generator = random.Random(seed)
+    reports = []
+    for index in range(count):
+        witnesses = [
+            WitnessDetail(name=f"Witness {index}-{number}", contact=f"witness.{index}.{number}@example.com")
+            for number in range(generator.randint(0, 3))
+        ]
+        reports.append(IncidentReport(
+            incident_datetime=datetime(2024, 1, 1) + timedelta(minutes=generator.randint(0, 500000)),
+            location=f"Building {generator.randint(1, 20)}, floor {generator.randint(1, 8)}",
+            description=generator.choice(DESCRIPTIONS),
+            witnesses=witnesses or None,
+        ))
+    return reports
+
+def load_reports(path: str) -> List[IncidentReport]:
+    with open(path) as corpus:
+        return [IncidentReport.model_validate_json(line) for line in corpus if line.strip()]
+
+def previous_serialization(incident: IncidentReport) -> str:
+    """ The path replaced by PromptSerializer: dict(), in-place ISO conversion, json.dumps. """
+    incident_dict = incident.dict(exclude=EXCLUDED_FIELDS)
+    for key, value in incident_dict.items():
+        if isinstance(value, datetime):
+            incident_dict[key] = value.isoformat()
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    for sub_key, sub_value in item.items():
+                        if isinstance(sub_value, datetime):
+                            item[sub_key] = sub_value.isoformat()
+    return json.dumps(incident_dict)
+
+def get_token_counter(encoding_name: str) -> tuple:
+    """ Returns (name, function counting the tokens of a text). """
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding(encoding_name)
+        return f"tiktoken {encoding_name}", lambda text: len(encoding.encode(text))
+    except Exception as e:  # tiktoken missing, or its encoding cannot be downloaded
+        return f"estimate, 4 chars per token ({type(e).__name__})", estimate_tokens
+
+def cpu_us_per_call(func: Callable, items: list, iterations: int) -> float:
+    for item in items[:10]:  # Warm-up
+        func(item)
+    start = time.process_time()
+    for _ in range(iterations):
+        for item in items:
+            func(item)
+    return (time.process_time() - start) / (iterations * len(items)) * 1e6
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=1000, help="Generated reports, without --corpus")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--corpus", help="JSONL file of incident reports")
+    parser.add_argument("--encoding", default="o200k_base", help="tiktoken encoding")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore", DeprecationWarning)  # BaseModel.dict() in the previous path
+    reports = load_reports(args.corpus) if args.corpus else make_reports(args.reports)
+    counter_name, count_tokens = get_token_counter(args.encoding)
+
+    variants = [
+        ("previous (dict + json.dumps)", previous_serialization),
+        ("json, all fields", PromptSerializer("*", "json", exclude=EXCLUDED_FIELDS).serialize),
+        ("json, default projection", PromptSerializer(DEFAULT_FIELDS, "json", exclude=EXCLUDED_FIELDS).serialize),
+        ("text, default projection", PromptSerializer(DEFAULT_FIELDS, "text", exclude=EXCLUDED_FIELDS).serialize),
+    ]
+
+    print(f"{len(reports)} reports, tokens: {counter_name}\n")
+    print(f"{'variant':<30} {'cpu us/report':>14} {'tokens/report':>14} {'vs previous':>12}")
+    baseline_tokens = None
+    for name, serialize in variants:
+        cpu_us = cpu_us_per_call(serialize, reports, args.iterations)
+        tokens = sum(count_tokens(serialize(report)) for report in reports) / len(reports)
+        baseline_tokens = baseline_tokens or tokens
+        print(f"{name:<30} {cpu_us:>14.2f} {tokens:>14.1f} {tokens / baseline_tokens - 1:>+11.1%}")
+
+    # A page of the incident store: 100 reports with their classifications
+    page = {
+        "items": [
+            {
+                "id": index,
+                **report.model_dump(mode="json"),
+                "language": "english", "urgency": "high", "breach": "availability",
+                "category": "Technology", "asset": "Hardware",
+            }
+            for index, report in enumerate(reports[:100])
+        ],
+        "next_cursor": "100",
+    }
+    print(f"\n{'response class':<30} {'cpu us/page':>14} {'bytes':>14}")
+    for response_class in (JSONResponse, ORJSONResponse):
+        cpu_us = cpu_us_per_call(lambda content: response_class(content), [page], args.iterations * 100)
+        size = len(response_class(page).body)
+        print(f"{response_class.__name__:<30} {cpu_us:>14.1f} {size:>14}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Scaling benchmark: throughput of the production server by number of workers.
+
+For each number of workers, `python server.py --production` is started with
+APP_SERVER_WORKERS set, and POST /report-incident is driven for --duration seconds
+by --clients client processes with --concurrency requests in flight each. The
+requests per second, p50/p99 latency and errors are reported with the speedup over
+the first level, and, on Linux, the resident (RSS) and proportional (PSS) memory
+of the server processes: PSS counts the pages shared copy-on-write with the master
+once, so the gap between the two is the state preloaded before forking.
+
+The LLM is the local fake backend with a constant latency, and the cache, local
+pre-classifier and near-duplicate reuse are disabled, so every request reaches the
+(fake) LLM and the throughput is bound by the service's own CPU time. It can only
+scale up to the number of CPUs, shared with the client processes: run it on a
+machine with more CPUs than the largest number of workers.
+
+Usage:
+    python -m benchmarks.bench_scaling [--workers 1,2,4] [--duration S] [--clients N]
+                                       [--concurrency N] [--latency-ms MS] [--json results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """ Nearest-rank percentile of already sorted values. """
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def build_env(workers: int, port: int, latency_ms: float, data_directory: str) -> Dict[str, str]:
+    """ Environment of the server, writing its files to data_directory. """
+    env = dict(os.environ)
+    env.update({
+        "APP_SERVER_WORKERS": str(workers),
+        "APP_SERVER_BIND": f"127.0.0.1:{port}",
+        "APP_LLM_BACKEND": "fake",
+        "APP_FAKE_LLM_LATENCY_MS": str(latency_ms),
+        "APP_FAKE_LLM_LATENCY_DISTRIBUTION": "constant",
+        "APP_FAKE_LLM_ERROR_RATE": "0",
+        "APP_CLASSIFICATION_CACHE_BACKEND": "none",
+        "APP_LOCAL_CLASSIFIER_ENABLED": "false",
+        "APP_NEAR_DUPLICATE_ENABLED": "false",
+        "APP_INCIDENT_STORE_BACKEND": "none",
+        "APP_JOB_QUEUE_BACKEND": "sqlite",
+        "APP_JOB_QUEUE_PATH": os.path.join(data_directory, "jobs.sqlite3"),
+        "APP_LOG_PAYLOAD_SAMPLE_RATE": "0",
+    })
+    return env
+
+def wait_until_ready(server: subprocess.Popen, port: int, timeout: float = 120) -> None:
+    started = time.perf_counter()
+    with httpx.Client(timeout=1) as client:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"The server exited with status {server.returncode}")
+            try:
+                if client.get(f"http://127.0.0.1:{port}/status").status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.05)
+    raise TimeoutError(f"/status did not answer within {timeout} seconds")
+
+def server_memory_mib(pid: int) -> Optional[Tuple[float, float]]:
+    """
+    Summed RSS and PSS in MiB of the master process and its workers, None where
+    /proc/<pid>/smaps_rollup is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            pids = [pid] + [int(child) for child in children.read().split()]
+        rss = pss = 0
+        for process in pids:
+            with open(f"/proc/{process}/smaps_rollup") as rollup:
+                for line in rollup:
+                    name, value = line.split()[:2]
+                    if name == "Rss:":
+                        rss += int(value)
+                    elif name == "Pss:":
+                        pss += int(value)
+        return rss / 1024, pss / 1024
+    except (OSError, ValueError):
+        return None
+
+def make_report(client: int, index: int) -> dict:
+    """ A distinct incident report, so that requests are neither cached nor coalesced. """
+    return {
+        "incident_datetime": datetime(2024, 6, 11, 14, 30).isoformat(),
+        "location": "Main Office Building, Floor 3",
+        "description": f"Power outage number {client}-{index} affected the entire floor for an hour.",
+    }
+
+async def drive(url: str, client: int, concurrency: int, duration: float) -> Tuple[List[float], int]:
+    """ Send requests from concurrency loops until duration elapses; returns latencies and errors. """
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(sys.maxsize))
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=60, limits=limits) as http_client:
+        async def loop() -> None:
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await http_client.post(url, json=make_report(client, next(counter)))
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return latencies, errors
+
+def run_client(url: str, client: int, concurrency: int, duration: float) -> Tuple[List[float], int]:
+    return asyncio.run(drive(url, client, concurrency, duration))
+
+def run_level(workers: int, args: argparse.Namespace, data_directory: str) -> dict:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "server.py", "--production"],
+        env=build_env(workers, port, args.latency_ms, data_directory),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_ready(server, port)
+        url = f"http://127.0.0.1:{port}/report-incident"
+        with ProcessPoolExecutor(args.clients) as pool:
+            # Warm up every worker (connections, lazily built state) before measuring
+            list(pool.map(run_client, [url] * args.clients, range(args.clients), [4] * args.clients, [1.0] * args.clients))
+            started = time.perf_counter()
+            results = list(pool.map(
+                run_client,
+                [url] * args.clients,
+                range(args.clients),
+                [args.concurrency] * args.clients,
+                [args.duration] * args.clients
+            ))
+            elapsed = time.perf_counter() - started
+        memory = server_memory_mib(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = sorted(latency for client_latencies, _ in results for latency in client_latencies)
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "errors": sum(errors for _, errors in results),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "rss_mib": memory[0] if memory else None,
+        "pss_mib": memory[1] if memory else None,
+    }
+
+def main() -> None:
+    cpus = available_cpus()
+    default_workers = sorted({1, *(2 ** power for power in range(1, 8) if 2 ** power <= cpus)})
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=",".join(map(str, default_workers)), help="Comma-separated numbers of workers")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load per level")
+    parser.add_argument("--clients", type=int, default=max(cpus // 2, 1), help="Client processes")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight per client process")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Latency of the fake LLM")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    levels = [int(workers) for workers in args.workers.split(",")]
+    print(f"{cpus} CPUs available, {args.clients} client processes x {args.concurrency} requests in flight")
+    if max(levels) > cpus:
+        print(f"Note: more workers than CPUs ({max(levels)} > {cpus}); throughput cannot scale beyond {cpus}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as data_directory:
+        for workers in levels:
+            results.append(run_level(workers, args, data_directory))
+
+    baseline = results[0]["rps"] or 1.0
+    print(f"\n{'workers':>7} {'req/s':>9} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'RSS MiB':>8} {'PSS MiB':>8}")
+    for result in results:
+        result["speedup"] = result["rps"] / baseline
+        memory = (
+            f"{result['rss_mib']:>8.0f} {result['pss_mib']:>8.0f}"
+            if result["rss_mib"] is not None else f"{'n/a':>8} {'n/a':>8}"
+        )
+        print(
+            f"{result['workers']:>7} {result['rps']:>9.0f} {result['speedup']:>7.2f}x "
+            f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['errors']:>7} {memory}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({"cpus": cpus, "results": results}, output, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Micro-benchmark: per-request chain construction vs. a precompiled IncidentService.
+
+Compares the CPU time and memory allocated per request by the work that used to
+run on every request (building the prompt template, the structured output
+runnable and the few-shot example messages) with the work that is left when the
+long-lived IncidentService reuses its precompiled chain.
+
+No LLM call is made, so no API key or network access is required.
+
+Usage:
+    python -m benchmarks.bench_service_setup [--iterations N]
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault("APP_OPENAI_API_KEY", "sk-benchmark")
+os.environ.setdefault("APP_OPENAI_LLM_MODEL", "gpt-4o-mini")
+
+from app.schemas.classification_schema import CLASSIFICATION_FIELDS
+from app.schemas.incident_schema import IncidentReport, WitnessDetail
+from app.services.incident_service import IncidentService
+
+INCIDENT = IncidentReport(
+    incident_datetime=datetime(2024, 6, 11, 14, 30),
+    location="Main Office Building, Floor 3",
+    description="There was a power outage affecting the entire floor.",
+    witnesses=[
+        WitnessDetail(name="John Doe", contact="john.doe@example.com"),
+        WitnessDetail(name="Jane Smith", contact="jane.smith@example.com"),
+    ]
+)
+
+def per_request_setup(service: IncidentService) -> None:
+    """ Work previously done for every request. """
+    service._build_example_messages(CLASSIFICATION_FIELDS)
+    service._build_tagging_chain(service.LLM, CLASSIFICATION_FIELDS)
+    service._build_chain_input(INCIDENT, {})
+
+def precompiled_setup(service: IncidentService) -> None:
+    """ Work done for every request by the long-lived service. """
+    service._build_chain_input(INCIDENT, {})
+
+def measure(func, service: IncidentService, iterations: int) -> tuple:
+    """ Returns (CPU microseconds per call, peak KiB allocated per call). """
+    func(service)  # Warm-up
+
+    start = time.process_time()
+    for _ in range(iterations):
+        func(service)
+    cpu_us = (time.process_time() - start) / iterations * 1e6
+
+    tracemalloc.start()
+    allocated = 0
+    for _ in range(iterations):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        func(service)
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - before
+    tracemalloc.stop()
+    return cpu_us, allocated / iterations / 1024
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    service = IncidentService()
+
+    results = {
+        "per-request setup": measure(per_request_setup, service, args.iterations),
+        "precompiled": measure(precompiled_setup, service, args.iterations),
+    }
+
+    print(f"{'variant':<20} {'cpu us/req':>12} {'peak KiB/req':>14}")
+    for name, (cpu_us, kib) in results.items():
+        print(f"{name:<20} {cpu_us:>12.1f} {kib:>14.2f}")
+
+    baseline_cpu, baseline_kib = results["per-request setup"]
+    cpu, kib = results["precompiled"]
+    print(f"\nSaved per request: {baseline_cpu - cpu:.1f} us CPU ({baseline_cpu / cpu:.1f}x), "
+          f"{baseline_kib - kib:.2f} KiB peak allocation")
+
+if __name__ == "__main__":
+    main()
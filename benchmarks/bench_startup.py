@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Startup benchmark: import time per module and time to the first successful /status.
+
+Each run starts a fresh interpreter, like a new pod:
+
+1. `python -X importtime -c "import server"` reports the import time of every
+   module; the slowest top-level packages and modules are listed.
+2. `uvicorn server:app` is started and GET /status is polled until it answers
+   200, after the application lifespan has built the services.
+
+The medians are checked against budgets, and the script exits with status 1 when
+one is exceeded, so it can guard cold start against regressions in CI.
+
+No API key or network access is required: the openai backend is given a dummy key,
+and no LLM call is made at startup.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs N] [--llm-backend fake|openai]
+                                       [--import-budget-ms MS] [--ready-budget-ms MS]
+                                       [--top N]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import httpx
+
+# Cold start budgets in milliseconds, also asserted by tests/test_startup.py
+IMPORT_BUDGET_MS = 2000
+READY_BUDGET_MS = 3500
+
+def build_env(llm_backend: str, data_directory: str) -> Dict[str, str]:
+    """ Environment of the server, writing its files to data_directory. """
+    env = dict(os.environ)
+    env["APP_LLM_BACKEND"] = llm_backend
+    env.setdefault("APP_OPENAI_API_KEY", "sk-benchmark")
+    env.setdefault("APP_OPENAI_LLM_MODEL", "gpt-4o-mini")
+    env["APP_INCIDENT_STORE_PATH"] = os.path.join(data_directory, "incidents.sqlite3")
+    return env
+
+def profile_imports(env: Dict[str, str]) -> Tuple[float, List[Tuple[str, float, int]]]:
+    """
+    Import the server module in a fresh interpreter with -X importtime.
+
+    Returns:
+    - Tuple[float, List[Tuple[str, float, int]]]: The cumulative import time of the
+      server module in milliseconds, and (module, self milliseconds, depth) per
+      imported module.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    modules = []
+    total_ms = 0.0
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        modules.append((name, int(self_us) / 1000, depth))
+        if name == "server":
+            total_ms = int(cumulative_us) / 1000
+    return total_ms, modules
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def time_to_status(env: Dict[str, str], timeout: float = 60) -> float:
+    """ Milliseconds from starting the server process to its first successful GET /status. """
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(timeout=1) as client:
+            while time.perf_counter() - started < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"The server exited with status {server.returncode}")
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/status").status_code == 200:
+                        return (time.perf_counter() - started) * 1000
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+        raise TimeoutError(f"/status did not answer within {timeout} seconds")
+    finally:
+        server.terminate()
+        server.wait()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--llm-backend", choices=("fake", "openai"), default="openai")
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS, help="Budget of the median import time of server")
+    parser.add_argument("--ready-budget-ms", type=float, default=READY_BUDGET_MS, help="Budget of the median time to the first /status")
+    parser.add_argument("--top", type=int, default=15, help="Number of packages and modules listed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_directory:
+        env = build_env(args.llm_backend, data_directory)
+        import_times = []
+        self_ms_by_module: Dict[str, List[float]] = defaultdict(list)
+        for _ in range(args.runs):
+            total_ms, modules = profile_imports(env)
+            import_times.append(total_ms)
+            for name, self_ms, _ in modules:
+                self_ms_by_module[name].append(self_ms)
+        ready_times = [time_to_status(env) for _ in range(args.runs)]
+
+    module_ms = {name: statistics.median(times) for name, times in self_ms_by_module.items()}
+    package_ms: Dict[str, float] = defaultdict(float)
+    for name, self_ms in module_ms.items():
+        package_ms[name.split(".")[0]] += self_ms
+
+    print(f"Slowest packages to import (self time summed over their modules, median of {args.runs} runs):")
+    for name, self_ms in sorted(package_ms.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<40} {self_ms:>8.1f} ms")
+    print("\nSlowest modules to import (self time):")
+    for name, self_ms in sorted(module_ms.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<60} {self_ms:>8.1f} ms")
+
+    import_ms = statistics.median(import_times)
+    ready_ms = statistics.median(ready_times)
+    print(f"\nLLM backend: {args.llm_backend}")
+    print(f"{'import server':<24} {import_ms:>8.0f} ms (budget {args.import_budget_ms:.0f} ms)")
+    print(f"{'first successful /status':<24} {ready_ms:>8.0f} ms (budget {args.ready_budget_ms:.0f} ms)")
+
+    exceeded = [
+        name for name, value, budget in (
+            ("import", import_ms, args.import_budget_ms),
+            ("ready", ready_ms, args.ready_budget_ms),
+        )
+        if value > budget
+    ]
+    if exceeded:
+        print(f"\nStartup budget exceeded: {', '.join(exceeded)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Local stub of the OpenAI chat completions API, for HTTP client benchmarks.
+
+POST /v1/chat/completions answers after --latency-ms with a chat.completion calling
+the first tool of the request, with arguments taking the first allowed value of
+each parameter, and token usage estimated from the request size. GET /v1/models
+lists the stub model, and is what the app requests to warm up its connections.
+
+The first request of each new connection is delayed by --handshake-ms, standing
+for the DNS, TCP and TLS setup a real API endpoint costs and localhost does not.
+
+Usage:
+    python -m benchmarks.stub_openai_server [--host 127.0.0.1] [--port 8100]
+                                            [--latency-ms MS] [--handshake-ms MS]
+
+    APP_LLM_BACKEND=openai APP_OPENAI_BASE_URL=http://127.0.0.1:8100/v1 \\
+    APP_OPENAI_API_KEY=stub APP_OPENAI_LLM_MODEL=stub python server.py
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Optional, Set, Tuple
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+MODEL = "stub"
+
+def example_value(schema: dict) -> Any:
+    """ The first allowed value of a JSON schema, or a placeholder of its type. """
+    if "enum" in schema:
+        return schema["enum"][0]
+    for key in ("anyOf", "allOf", "oneOf"):
+        for option in schema.get(key, ()):
+            if option.get("type") != "null":
+                return example_value(option)
+    return {"integer": 0, "number": 0, "boolean": False, "array": [], "object": {}}.get(schema.get("type"), "unknown")
+
+def make_app(latency: float, handshake: float) -> Starlette:
+    """
+    Parameters:
+    - latency (float): Seconds before a completion is answered.
+    - handshake (float): Extra seconds of the first request of each connection.
+    """
+    connections: Set[Tuple[str, int]] = set()
+
+    async def on_request(request: Request, delay: float) -> None:
+        client: Optional[Tuple[str, int]] = request.scope.get("client")
+        if client not in connections:
+            connections.add(client)
+            delay += handshake
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def chat_completions(request: Request) -> JSONResponse:
+        body = await request.json()
+        await on_request(request, latency)
+        message: dict = {"role": "assistant", "content": None}
+        tools = body.get("tools") or []
+        if tools:
+            function = tools[0]["function"]
+            arguments = {
+                name: example_value(schema)
+                for name, schema in function.get("parameters", {}).get("properties", {}).items()
+            }
+            message["tool_calls"] = [{
+                "id": f"call_{uuid.uuid4().hex[:24]}",
+                "type": "function",
+                "function": {"name": function["name"], "arguments": json.dumps(arguments)},
+            }]
+        else:
+            message["content"] = "stub"
+        prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+        completion_tokens = len(json.dumps(message)) // 4
+        return JSONResponse({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model") or MODEL,
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if tools else "stop",
+                "logprobs": None,
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    async def models(request: Request) -> JSONResponse:
+        await on_request(request, 0)
+        return JSONResponse({
+            "object": "list",
+            "data": [{"id": MODEL, "object": "model", "created": 0, "owned_by": "stub"}],
+        })
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/v1/models", models, methods=["GET"]),
+    ])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Latency of a completion")
+    parser.add_argument("--handshake-ms", type=float, default=0, help="Extra latency of a new connection")
+    args = parser.parse_args()
+
+    app = make_app(args.latency_ms / 1000, args.handshake_ms / 1000)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", backlog=4096)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Classifies incident reports from a JSONL file offline.
+
+Reads one IncidentReport JSON object per line, classifies the reports with N
+concurrent workers through IncidentService and appends one result per line to
+the output JSONL file:
+
+    {"line": 12, "incident_classification": {"language": "english", ...}}
+    {"line": 13, "error": "Could not classify incident report."}
+
+Progress is checkpointed next to the output file (<output>.checkpoint). Running
+the same command again after a crash resumes where it stopped, without
+classifying finished lines again. Reports that failed are recorded as errors
+and are not retried on resume.
+
+Usage:
+    python bulk_classify.py reports.jsonl classifications.jsonl [--workers 16]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Iterator, Optional, Set, Tuple
+
+from fastapi.exceptions import HTTPException
+from pydantic import ValidationError
+
+from app.schemas.incident_schema import IncidentReport
+from app.services.incident_service import IncidentService
+
+class Checkpoint(object):
+    """
+    Progress of a bulk classification run.
+
+    All lines below completed_below are finished, as well as the lines in
+    completed_above. Lines written to the output after output_offset were
+    finished after the checkpoint was saved.
+    """
+
+    def __init__(self, path: str, input_path: str):
+        self.path = path
+        self.input_path = os.path.abspath(input_path)
+        self.completed_below = 0
+        self.completed_above: Set[int] = set()
+        self.output_offset = 0
+
+    def complete(self, line: int) -> None:
+        """ Mark a line as finished and advance the low-water mark. """
+        self.completed_above.add(line)
+        while self.completed_below in self.completed_above:
+            self.completed_above.remove(self.completed_below)
+            self.completed_below += 1
+
+    def is_complete(self, line: int) -> bool:
+        return line < self.completed_below or line in self.completed_above
+
+    def save(self, output_offset: int) -> None:
+        """ Atomically write the checkpoint. """
+        self.output_offset = output_offset
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as checkpoint_file:
+            json.dump(
+                {
+                    "input": self.input_path,
+                    "completed_below": self.completed_below,
+                    "completed_above": sorted(self.completed_above),
+                    "output_offset": self.output_offset,
+                },
+                checkpoint_file
+            )
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary_path, self.path)
+
+    @classmethod
+    def resume(cls, path: str, input_path: str, output_path: str) -> "Checkpoint":
+        """
+        Load the checkpoint of an earlier run, if any, and add the lines that were
+        written to the output after it was saved.
+
+        Raises:
+        - ValueError: If the checkpoint belongs to another input file.
+        """
+        checkpoint = cls(path, input_path)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as checkpoint_file:
+                saved = json.load(checkpoint_file)
+            if saved["input"] != checkpoint.input_path:
+                raise ValueError(f"Checkpoint {path} belongs to another input file: {saved['input']}")
+            checkpoint.completed_below = saved["completed_below"]
+            checkpoint.completed_above = set(saved["completed_above"])
+            checkpoint.output_offset = saved["output_offset"]
+
+        if os.path.exists(output_path):
+            with open(output_path, "rb+") as output_file:
+                output_file.seek(checkpoint.output_offset)
+                offset = checkpoint.output_offset
+                for raw_line in output_file:
+                    if not raw_line.endswith(b"\n"):
+                        break  # Line torn by a crash, it is classified again
+                    checkpoint.complete(json.loads(raw_line)["line"])
+                    offset += len(raw_line)
+                output_file.truncate(offset)
+        return checkpoint
+
+def read_reports(path: str, checkpoint: Checkpoint) -> Iterator[Tuple[int, str]]:
+    """ Yields the line number and text of every unfinished input line. """
+    with open(path, encoding="utf-8") as input_file:
+        for line, text in enumerate(input_file):
+            if not checkpoint.is_complete(line):
+                yield line, text
+
+async def classify_line(incident_service: IncidentService, line: int, text: str) -> dict:
+    """ Classify one input line into an output record. """
+    if not text.strip():
+        return {"line": line, "error": "Empty line."}
+    try:
+        incident = IncidentReport.model_validate_json(text)
+    except ValidationError as e:
+        return {"line": line, "error": f"Invalid incident report: {e.error_count()} validation errors."}
+    try:
+        incident_classification = await incident_service.aclassify(incident)
+    except HTTPException as e:
+        return {"line": line, "error": e.detail}
+    return {"line": line, "incident_classification": incident_classification.dict()}
+
+class Progress(object):
+    """ Periodic throughput report on stderr. """
+
+    def __init__(self, incident_service: IncidentService, interval: float):
+        self.incident_service = incident_service
+        self.interval = interval
+        self.started = time.monotonic()
+        self.reported = self.started
+        self.completed = 0
+        self.errors = 0
+
+    def record(self, record: dict) -> None:
+        self.completed += 1
+        self.errors += "error" in record
+        if time.monotonic() - self.reported >= self.interval:
+            self.report()
+
+    def report(self) -> None:
+        self.reported = time.monotonic()
+        elapsed = max(self.reported - self.started, 1e-9)
+        tokens = self.incident_service.stats()["tokens"]
+        print(
+            f"{self.completed} reports ({self.errors} errors) in {elapsed:.0f} s: "
+            f"{self.completed / elapsed:.1f} reports/s, "
+            f"{(tokens['input'] + tokens['output']) / elapsed:.0f} tokens/s",
+            file=sys.stderr
+        )
+
+async def run(
+    input_path: str,
+    output_path: str,
+    workers: int,
+    checkpoint_every: int,
+    report_every: float
+) -> None:
+    """ Classify the unfinished lines of input_path into output_path. """
+    checkpoint = Checkpoint.resume(f"{output_path}.checkpoint", input_path, output_path)
+    if checkpoint.completed_below or checkpoint.completed_above:
+        print(f"Resuming: {checkpoint.completed_below + len(checkpoint.completed_above)} lines already done", file=sys.stderr)
+
+    incident_service = IncidentService()
+    progress = Progress(incident_service, report_every)
+    queue: "asyncio.Queue[Optional[Tuple[int, str]]]" = asyncio.Queue(maxsize=2 * workers)
+
+    with open(output_path, "ab") as output_file:
+        async def worker() -> None:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                record = await classify_line(incident_service, *item)
+                output_file.write(json.dumps(record).encode() + b"\n")
+                checkpoint.complete(record["line"])
+                progress.record(record)
+                if progress.completed % checkpoint_every == 0:
+                    output_file.flush()
+                    checkpoint.save(output_file.tell())
+
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+        for item in read_reports(input_path, checkpoint):
+            await queue.put(item)
+        for _ in tasks:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
+
+        output_file.flush()
+        checkpoint.save(output_file.tell())
+
+    progress.report()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file with one incident report per line")
+    parser.add_argument("output", help="JSONL file the classifications are appended to")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent classifications")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="Results between checkpoints")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress reports")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.input, args.output, args.workers, args.checkpoint_every, args.report_every))
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-""" Runs ASGI server """
+""" Runs ASGI server
+
+python server.py runs a single uvicorn process, for development. With --production,
+gunicorn runs pre-forked workers sharing the state built here (see app.core.serving).
+"""
+
+import sys
 
 import uvicorn
 from app import create_app
@@ -9,4 +15,12 @@ from app import create_app
 app = create_app()
 
 if __name__ == '__main__':
-    uvicorn.run(app, host='0.0.0.0', port=8000)
+    if '--production' in sys.argv[1:]:
+        from app.core.serving import run_production_server
+        from app.services.incident_service import IncidentService
+
+        # Built once in the master process and shared copy-on-write by the workers
+        IncidentService.preload()
+        run_production_server(app)
+    else:
+        uvicorn.run(app, host='0.0.0.0', port=8000)
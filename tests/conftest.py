@@ -0,0 +1,153 @@
+""" Test configuration: the app is configured from the environment at import time. """
+
+import os
+
+import pytest
+
+# Local fake LLM, nothing cached or resolved without it, unless a test says otherwise
+os.environ.setdefault("APP_LLM_BACKEND", "fake")
+os.environ.setdefault("APP_FAKE_LLM_LATENCY_MS", "0")
+os.environ.setdefault("APP_CLASSIFICATION_CACHE_BACKEND", "none")
+os.environ.setdefault("APP_LOCAL_CLASSIFIER_ENABLED", "false")
+os.environ.setdefault("APP_NEAR_DUPLICATE_ENABLED", "false")
+os.environ.setdefault("APP_INCIDENT_STORE_BACKEND", "none")
+os.environ.setdefault("APP_LOG_PAYLOAD_SAMPLE_RATE", "0")
+
+import socket
+import threading
+import time
+
+import uvicorn
+
+from app.config import config as app_config
+from app.core.environment import get_environment
+from app.core.fake_llm import FakeChatModel
+from app.core.retry import RetryPolicy
+
+class BadRequestError(Exception):
+    """ A client error, as the OpenAI client raises for a 400 answer. """
+    status_code = 400
+
+class ScriptedChatModel(FakeChatModel):
+    """ Fake LLM raising the errors of a list, one per call, then answering. """
+    errors: list = []
+
+    def _respond(self, messages, tools):
+        if self.errors:
+            raise self.errors.pop(0)
+        return super()._respond(messages, tools)
+
+def fake_llm(latency: float = 0.0, errors=()) -> ScriptedChatModel:
+    """ A fake LLM answering after a constant latency in seconds, once errors are raised. """
+    return ScriptedChatModel(latency_distribution="constant", latency_mean=latency, errors=list(errors))
+
+def make_report(index: int = 0, description: str = None, **fields):
+    """ A distinct incident report. """
+    from app.schemas.incident_schema import IncidentReport
+
+    return IncidentReport(
+        incident_datetime="2024-06-11T14:30:00",
+        location="Main Office Building, Floor 3",
+        description=description or f"Power outage number {index} affected the entire floor for an hour.",
+        **fields
+    )
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def env_config():
+    """ The configuration of the environment, whose attributes tests monkeypatch. """
+    return app_config[get_environment()]
+
+@pytest.fixture
+def llm_script(monkeypatch):
+    """
+    Scripts the answers of the application's fake LLM. Each call takes the next step
+    of the returned list: an exception to raise, a function editing the tool call
+    arguments, or None for a normal answer; calls past the end answer normally.
+    Returns (steps, prompts), prompts being the last message of every call.
+    """
+    steps, prompts = [], []
+    respond = FakeChatModel._respond
+
+    def scripted_respond(self, messages, tools):
+        prompts.append(messages[-1].content if messages else "")
+        step = steps.pop(0) if steps else None
+        if isinstance(step, Exception):
+            raise step
+        result = respond(self, messages, tools)
+        if step is not None:
+            step(result.generations[0].message.tool_calls[0]["args"])
+        return result
+
+    monkeypatch.setattr(FakeChatModel, "_respond", scripted_respond)
+    return steps, prompts
+
+@pytest.fixture
+def llm_calls(llm_script):
+    """ Records the prompt (last message) of every call to the fake LLM. """
+    return llm_script[1]
+
+@pytest.fixture
+def llm_latency(monkeypatch):
+    """ Sets the constant latency of the fake LLM, in seconds. """
+    from app.core.llm_session import get_llm
+
+    def set_latency(seconds: float) -> None:
+        monkeypatch.setattr(get_llm(), "latency_distribution", "constant")
+        monkeypatch.setattr(get_llm(), "latency_mean", seconds)
+    return set_latency
+
+@pytest.fixture(autouse=True)
+def fresh_llm_scheduler(monkeypatch):
+    """ The LLM scheduler binds to an event loop: each test gets its own. """
+    from app.services.llm_invoker import LLMInvoker
+
+    monkeypatch.setattr(LLMInvoker, "_scheduler", None)
+
+@pytest.fixture
+def incident_service():
+    """ A new IncidentService, retrying failed LLM calls a millisecond apart. """
+    from app.services.incident_service import IncidentService
+
+    incident_service = IncidentService()
+    incident_service.LLM_INVOKER.RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.001, deadline=5)
+    return incident_service
+
+@pytest.fixture
+def client():
+    """ A test client of a new app, running its lifespan (services, job workers). """
+    from fastapi.testclient import TestClient
+    from app import create_app
+
+    with TestClient(create_app()) as client:
+        yield client
+
+@pytest.fixture
+def stub_api():
+    """
+    Runs local stubs of the OpenAI API (benchmarks.stub_openai_server) in threads.
+    Returns start(latency, handshake) -> base URL of a new stub.
+    """
+    from benchmarks.stub_openai_server import make_app
+
+    servers = []
+
+    def start(latency: float = 0.0, handshake: float = 0.0) -> str:
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(make_app(latency, handshake), port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        deadline = time.monotonic() + 10
+        while not server.started and time.monotonic() < deadline:
+            time.sleep(0.01)
+        servers.append((server, thread))
+        return f"http://127.0.0.1:{port}/v1"
+
+    yield start
+    for server, thread in servers:
+        server.should_exit = True
+        thread.join(5)
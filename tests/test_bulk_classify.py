@@ -0,0 +1,70 @@
+""" Tests of the checkpointed bulk classification CLI. """
+
+import asyncio
+import json
+
+import pytest
+
+import bulk_classify
+
+from tests.conftest import make_report
+
+def write_input(path, lines):
+    path.write_text("".join(f"{line}\n" for line in lines), encoding="utf-8")
+
+def read_output(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+def run(input_path, output_path, checkpoint_every=2):
+    asyncio.run(bulk_classify.run(str(input_path), str(output_path), 3, checkpoint_every, 60))
+
+def test_every_line_gets_one_result(tmp_path, llm_calls):
+    input_path, output_path = tmp_path / "reports.jsonl", tmp_path / "classifications.jsonl"
+    write_input(input_path, [make_report(0).model_dump_json(), "", "{\"location\": 1}", make_report(3).model_dump_json()])
+
+    run(input_path, output_path)
+
+    records = {record["line"]: record for record in read_output(output_path)}
+    assert sorted(records) == [0, 1, 2, 3]
+    assert "incident_classification" in records[0] and "incident_classification" in records[3]
+    assert records[1]["error"] == "Empty line."
+    assert records[2]["error"].startswith("Invalid incident report")
+    assert len(llm_calls) == 2
+
+def test_resume_skips_finished_lines_and_reclassifies_torn_ones(tmp_path, llm_calls):
+    input_path, output_path = tmp_path / "reports.jsonl", tmp_path / "classifications.jsonl"
+    write_input(input_path, [make_report(index).model_dump_json() for index in range(6)])
+    run(input_path, output_path)
+    records = read_output(output_path)
+
+    # Crash: the checkpoint covers the first two results, two more were written after
+    # it, and the last one was torn mid-line
+    checkpoint = bulk_classify.Checkpoint(f"{output_path}.checkpoint", str(input_path))
+    for record in records[:2]:
+        checkpoint.complete(record["line"])
+    checkpointed = "".join(json.dumps(record) + "\n" for record in records[:2])
+    after_checkpoint = "".join(json.dumps(record) + "\n" for record in records[2:4])
+    checkpoint.save(len(checkpointed.encode()))
+    output_path.write_text(checkpointed + after_checkpoint + json.dumps(records[4])[:10], encoding="utf-8")
+    llm_calls.clear()
+
+    run(input_path, output_path)
+
+    resumed = read_output(output_path)
+    assert sorted(record["line"] for record in resumed) == list(range(6))
+    assert resumed[:4] == records[:4]
+    assert len(llm_calls) == 2  # Only the torn line and the missing one
+
+def test_checkpoint_of_another_input_is_rejected(tmp_path):
+    input_path, output_path = tmp_path / "reports.jsonl", tmp_path / "classifications.jsonl"
+    bulk_classify.Checkpoint(f"{output_path}.checkpoint", str(tmp_path / "other.jsonl")).save(0)
+
+    with pytest.raises(ValueError):
+        bulk_classify.Checkpoint.resume(f"{output_path}.checkpoint", str(input_path), str(output_path))
+
+def test_checkpoint_advances_low_water_mark():
+    checkpoint = bulk_classify.Checkpoint("unused", "unused")
+    for line in (1, 3, 0):
+        checkpoint.complete(line)
+    assert (checkpoint.completed_below, checkpoint.completed_above) == (2, {3})
+    assert [checkpoint.is_complete(line) for line in range(5)] == [True, True, False, True, False]
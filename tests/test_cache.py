@@ -0,0 +1,95 @@
+""" Tests of the classification cache backends. """
+
+import asyncio
+import time
+
+import pytest
+
+from app.core.cache import InMemoryCache, SQLiteCache, create_cache
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    def make(max_entries: int = 10, ttl_seconds: float = 60, namespace: str = "test"):
+        return create_cache(
+            request.param, max_entries, ttl_seconds, path=str(tmp_path / "cache.sqlite3"), namespace=namespace
+        )
+    return make
+
+def test_get_returns_set_value_and_counts_hits_and_misses(make_cache):
+    cache = make_cache()
+    assert cache.get("a") is None
+    cache.set("a", {"category": "Physical"})
+    assert cache.get("a") == {"category": "Physical"}
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 1)
+
+def test_set_replaces_value_without_growing(make_cache):
+    cache = make_cache()
+    cache.set("a", {"value": 1})
+    cache.set("a", {"value": 2})
+    assert cache.get("a") == {"value": 2}
+    assert len(cache) == 1
+
+def test_expired_entries_are_misses(make_cache):
+    cache = make_cache(ttl_seconds=0.05)
+    cache.set("a", {"value": 1})
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = InMemoryCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", {"value": 1})
+    cache.set("b", {"value": 2})
+    cache.get("a")  # b is now the least recently used
+    cache.set("c", {"value": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"value": 1}
+    assert cache.evictions == 1
+
+def test_sqlite_cache_evicts_least_recently_used_in_batches(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=100, ttl_seconds=60)
+    for index in range(100):
+        cache.set(f"key-{index}", {"value": index})
+    cache.get("key-0")  # The oldest write is now the most recently used
+    cache.set("key-100", {"value": 100})
+    # Evicted down to max_entries - eviction_batch, least recently used first
+    assert len(cache) == 100 - cache.eviction_batch == cache._count()
+    assert cache.evictions == cache.eviction_batch + 1
+    assert cache.get("key-0") == {"value": 0}
+    assert cache.get("key-1") is None
+    assert cache.get("key-100") == {"value": 100}
+
+def test_sqlite_cache_persists_and_keeps_namespaces_apart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    SQLiteCache(path, 10, 60, namespace="v1").set("a", {"value": 1})
+    assert SQLiteCache(path, 10, 60, namespace="v1").get("a") == {"value": 1}
+
+    # Another configuration sharing the file neither reads nor deletes the entries of v1
+    assert SQLiteCache(path, 10, 60, namespace="v2").get("a") is None
+    assert SQLiteCache(path, 10, 60, namespace="v1").get("a") == {"value": 1}
+
+def test_sqlite_cache_purges_expired_entries_when_opened(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    SQLiteCache(path, 10, 0.01, namespace="v1").set("a", {"value": 1})
+    time.sleep(0.05)
+
+    assert len(SQLiteCache(path, 10, 60, namespace="v2")) == 0
+
+def test_concurrent_lookups_are_all_counted(make_cache):
+    cache = make_cache()
+    cache.set("a", {"value": 1})
+
+    async def lookups():
+        await asyncio.gather(*(cache.aget("a" if index % 2 else "b") for index in range(200)))
+
+    asyncio.run(lookups())
+    assert (cache.hits, cache.misses) == (100, 100)
+
+def test_async_methods_match_sync_ones(make_cache):
+    cache = make_cache()
+
+    async def roundtrip():
+        await cache.aset("a", {"value": 1})
+        return await cache.aget("a"), await cache.aget("b")
+
+    assert asyncio.run(roundtrip()) == ({"value": 1}, None)
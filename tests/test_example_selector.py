@@ -0,0 +1,46 @@
+""" Selection of the few-shot examples most similar to a report. """
+
+import numpy as np
+
+from app.utils.example_selector import ExampleSelector, HashedNgramVectorizer
+
+TEXTS = [
+    "A laptop was stolen from the reception desk overnight.",
+    "Ransomware encrypted the file server and demanded payment.",
+    "The power went out on the third floor for an hour.",
+    "An employee received a phishing email asking for their password.",
+    "Someone broke into the storage room and took the spare laptops.",
+]
+
+def test_top_k_are_selected_least_similar_first():
+    selector = ExampleSelector(TEXTS)
+
+    selected = selector.select("Thieves broke into the storage room and stole laptops.", k=2)
+
+    # The most similar example is last, closest to the report in the prompt
+    assert selected == [0, 4]
+    assert selector.select("Ransomware encrypted our file server.", k=1) == [1]
+
+def test_k_at_or_beyond_the_pool_size_selects_every_example():
+    selector = ExampleSelector(TEXTS)
+
+    assert selector.select("anything", k=0) == []
+    assert selector.select("anything", k=len(TEXTS)) == list(range(len(TEXTS)))
+    assert selector.select("anything", k=100) == list(range(len(TEXTS)))
+
+def test_added_examples_can_be_selected():
+    selector = ExampleSelector(TEXTS[:2])
+    selector.add([])
+    selector.add(TEXTS[2:])
+
+    assert len(selector) == len(TEXTS)
+    assert selector.select("A phishing email asked staff for their password.", k=1) == [3]
+
+def test_vectors_are_sublinear_term_frequencies():
+    vectorizer = HashedNgramVectorizer(n_features=64, ngram_range=(3, 3))
+
+    once, twice = vectorizer.transform("fire"), vectorizer.transform("fire fire")
+
+    assert once.shape == (64,)
+    assert np.allclose(twice[once > 0], np.log1p(2 * np.expm1(once[once > 0])))
+    assert not vectorizer.transform("").any()
@@ -0,0 +1,70 @@
+""" Mapping of the classification errors to HTTP answers. """
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi.exceptions import HTTPException
+from langchain_core.exceptions import OutputParserException
+
+from app.core import exceptions
+from app.core.exceptions import raise_with_log, runner_info, to_classification_error
+
+from tests.conftest import make_report
+
+class UpstreamError(Exception):
+    """ An error answer of the LLM provider, as the OpenAI client raises. """
+
+    def __init__(self, status_code: int, headers: dict = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = httpx.Response(status_code, headers=headers)
+
+@pytest.fixture
+def single_attempt_client(env_config, monkeypatch):
+    """ A test client whose LLM calls are neither retried nor requeued. """
+    from fastapi.testclient import TestClient
+    from app import create_app
+
+    monkeypatch.setattr(env_config, "LLM_RETRY_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(env_config, "LLM_RATE_LIMIT_RETRIES", 0)
+    with TestClient(create_app()) as client:
+        yield client
+
+@pytest.mark.parametrize("error, status_code, headers", [
+    (asyncio.TimeoutError(), 504, {}),
+    (UpstreamError(429, {"Retry-After": "7"}), 429, {"retry-after": "7"}),
+    (UpstreamError(502), 503, {}),
+    (OutputParserException("not a tool call"), 422, {}),
+    (ValueError("a bug"), 500, {}),
+])
+def test_classification_errors_map_to_http_answers(single_attempt_client, llm_script, error, status_code, headers):
+    steps, _ = llm_script
+    steps.append(error)
+
+    response = single_attempt_client.post("/report-incident", json=make_report().model_dump(mode="json"))
+
+    assert response.status_code == status_code
+    for name, value in headers.items():
+        assert response.headers[name] == value
+
+def test_only_parsing_errors_are_invalid_outputs():
+    assert to_classification_error(OutputParserException("bad")).kind == "invalid_output"
+    assert to_classification_error(ValueError("bad")).kind == "unknown"
+    assert to_classification_error(ValueError("bad")).status_code == 500
+
+def test_runner_info_names_the_caller_outside_the_module():
+    def caller():
+        return runner_info()
+
+    assert ":test_runner_info_names_the_caller_outside_the_module:" in runner_info()
+    assert ":caller:" in caller()
+
+def test_raise_with_log_logs_its_caller(monkeypatch):
+    logged = []
+    monkeypatch.setattr(exceptions.logger, "info", lambda message, *args: logged.append(message % args))
+
+    with pytest.raises(HTTPException):
+        raise_with_log(418, "teapot")
+
+    assert ":test_raise_with_log_logs_its_caller:" in logged[0]
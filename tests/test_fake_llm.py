@@ -0,0 +1,59 @@
+""" The fake LLM backend: deterministic answers, latencies and injected failures. """
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from app.core.fake_llm import FakeChatModel, FakeLLMError, FakeRateLimitError
+from app.schemas.classification_schema import CLASSIFICATION_FIELDS, IncidentClassification
+from app.utils.classification_repair import get_field_enum
+
+def classify(llm: FakeChatModel, prompt: str = "Power outage on floor 3") -> dict:
+    """ The tool call arguments of the fake LLM's answer to prompt. """
+    message = llm.bind_tools([IncidentClassification]).invoke([HumanMessage(prompt)])
+    return message.tool_calls[0]["args"]
+
+def make_llm(**fields) -> FakeChatModel:
+    return FakeChatModel(**{"latency_distribution": "constant", "latency_mean": 0, "seed": 1, **fields})
+
+def test_answers_are_valid_and_depend_only_on_the_prompt():
+    args = classify(make_llm())
+
+    assert list(args) == list(CLASSIFICATION_FIELDS)
+    assert all(value in get_field_enum(field_name) for field_name, value in args.items())
+    assert classify(make_llm(seed=2)) == args
+    assert classify(make_llm(), "A laptop was stolen") != args
+
+def test_error_rate_fails_that_fraction_of_calls():
+    assert pytest.raises(FakeLLMError, classify, make_llm(error_rate=1.0)).value.status_code == 500
+
+    llm = make_llm(error_rate=0.3)
+    failures = 0
+    for _ in range(1000):
+        try:
+            classify(llm)
+        except FakeLLMError:
+            failures += 1
+    assert 250 <= failures <= 350
+
+def test_invalid_outputs_misspell_or_leave_out_a_field():
+    expected = classify(make_llm())
+    llm = make_llm(invalid_output_rate=1.0)
+
+    for _ in range(20):
+        args = classify(llm)
+        differing = [field_name for field_name in expected if args.get(field_name) != expected[field_name]]
+        assert len(differing) == 1
+        value = args.get(differing[0])
+        assert value is None or value not in get_field_enum(differing[0])
+
+def test_calls_above_the_quota_are_rate_limited():
+    llm = make_llm(requests_per_minute=2)
+    classify(llm)
+    classify(llm)
+
+    error = pytest.raises(FakeRateLimitError, classify, llm).value
+    assert error.status_code == 429
+
+def test_unknown_latency_distributions_are_rejected():
+    with pytest.raises(ValueError):
+        FakeChatModel(latency_distribution="normal")
@@ -0,0 +1,57 @@
+""" The classification endpoints, single and batch, against the fake LLM. """
+
+from app.schemas.classification_schema import IncidentClassification
+
+from tests.conftest import BadRequestError, make_report
+
+def test_report_incident_returns_the_classification(client, llm_calls):
+    report = make_report(classification_hints={"language": "norwegian"})
+
+    response = client.post("/report-incident", json=report.model_dump(mode="json"))
+
+    assert response.status_code == 200
+    classification = response.json()
+    assert set(classification) == set(IncidentClassification.__fields__)
+    assert classification["language"] == "norwegian"
+    assert len(llm_calls) == 1
+    assert report.description in llm_calls[0]
+
+def test_report_incident_rejects_invalid_reports(client, llm_calls):
+    missing = client.post("/report-incident", json={"location": "Oslo"})
+    assert missing.status_code == 422
+    assert {tuple(error["loc"]) for error in missing.json()["detail"]} == {
+        ("body", "incident_datetime"), ("body", "description")
+    }
+
+    hints = make_report().model_dump(mode="json") | {"classification_hints": {"category": "Weather"}}
+    assert client.post("/report-incident", json=hints).status_code == 422
+    assert llm_calls == []
+
+def test_batch_returns_one_result_per_report_in_order(client, llm_script):
+    steps, prompts = llm_script
+    steps.extend([None, BadRequestError("bad request")])
+    reports = [make_report(index).model_dump(mode="json") for index in range(3)]
+
+    response = client.post("/report-incidents/batch", params={"max_concurrency": 1}, json=reports)
+
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert results[0]["incident_classification"] and results[0]["error"] is None
+    assert results[1]["incident_classification"] is None
+    assert results[1]["error"] == "Could not classify incident report."
+    assert results[2]["incident_classification"] and results[2]["error"] is None
+    assert len(prompts) == 3
+
+def test_batch_limits(client, env_config, monkeypatch, llm_calls):
+    monkeypatch.setattr(env_config, "LLM_BATCH_MAX_SIZE", 2)
+    reports = [make_report(index).model_dump(mode="json") for index in range(3)]
+
+    too_large = client.post("/report-incidents/batch", json=reports)
+    assert too_large.status_code == 413
+    assert "at most 2" in too_large.json()["detail"]
+
+    no_concurrency = client.post("/report-incidents/batch", params={"max_concurrency": 0}, json=reports[:2])
+    assert no_concurrency.status_code == 422
+    assert client.post("/report-incidents/batch", json=[]).json() == []
+    assert llm_calls == []
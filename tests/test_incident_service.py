@@ -0,0 +1,82 @@
+""" Tests of IncidentService with the fake LLM backend. """
+
+import asyncio
+
+from app.core.cache import SQLiteCache
+
+from tests.conftest import make_report
+
+def test_aclassify_answers_repeated_report_from_sqlite_cache(incident_service, llm_calls, tmp_path):
+    cache = incident_service.CLASSIFICATION_CACHE
+    cache.CACHE = SQLiteCache(str(tmp_path / "cache.sqlite3"), 100, 60, cache.NAMESPACE)
+
+    async def classify_twice():
+        return [await incident_service.aclassify(make_report()) for _ in range(2)]
+
+    first, second = asyncio.run(classify_twice())
+    assert first == second
+    assert len(llm_calls) == 1
+    assert cache.CACHE.hits == 1
+
+def test_concurrent_identical_reports_share_one_llm_call(incident_service, llm_calls, llm_latency):
+    llm_latency(0.05)
+
+    async def classify_concurrently():
+        return await asyncio.gather(*(incident_service.aclassify(make_report()) for _ in range(5)))
+
+    classifications = asyncio.run(classify_concurrently())
+    assert len(llm_calls) == 1
+    assert all(classification == classifications[0] for classification in classifications)
+    assert incident_service.stats()["coalescing"] == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+def test_batch_sends_identical_reports_once(incident_service, llm_calls):
+    incidents = [make_report(0), make_report(1), make_report(0), make_report(1), make_report(0)]
+
+    results = asyncio.run(incident_service.abatch_classify(incidents))
+    assert len(llm_calls) == 2
+    assert [result.index for result in results] == [0, 1, 2, 3, 4]
+    assert results[0].incident_classification == results[2].incident_classification == results[4].incident_classification
+
+    llm_calls.clear()
+    results = incident_service.batch_classify(incidents)
+    assert len(llm_calls) == 2
+    assert results[1].incident_classification == results[3].incident_classification
+
+def test_batch_joins_the_call_in_flight_for_a_single_report(incident_service, llm_calls, llm_latency):
+    llm_latency(0.05)
+
+    async def classify_alongside():
+        single = asyncio.create_task(incident_service.aclassify(make_report(0)))
+        await asyncio.sleep(0.01)  # The single report's call is in flight
+        results = await incident_service.abatch_classify([make_report(0), make_report(1)])
+        return await single, results
+
+    classification, results = asyncio.run(classify_alongside())
+    assert len(llm_calls) == 2
+    assert results[0].incident_classification == classification
+
+def test_reports_of_different_priorities_do_not_share_a_call(incident_service, llm_calls, llm_latency):
+    llm_latency(0.05)
+
+    async def classify_concurrently():
+        return await asyncio.gather(
+            incident_service.aclassify(make_report(priority="low")),
+            incident_service.aclassify(make_report(priority="critical")),
+            incident_service.aclassify(make_report(priority="critical"))
+        )
+
+    low, critical, _ = asyncio.run(classify_concurrently())
+    assert low == critical
+    assert len(llm_calls) == 2
+    assert not any("critical" in prompt for prompt in llm_calls)
+
+def test_queue_wait_does_not_count_against_the_deadline(incident_service, llm_latency, env_config, monkeypatch):
+    monkeypatch.setattr(env_config, "LLM_MAX_CONCURRENCY", 1)
+    incident_service.LLM_INVOKER.RETRY_POLICY.deadline = 0.15
+    llm_latency(0.1)
+
+    async def classify_concurrently():
+        return await asyncio.gather(*(incident_service.aclassify(make_report(index)) for index in range(3)))
+
+    # The last report waits 0.2 s for the other two, then its call takes 0.1 s
+    assert len(asyncio.run(classify_concurrently())) == 3
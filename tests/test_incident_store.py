@@ -0,0 +1,114 @@
+""" The incident store: keyset pagination, filters, counts and batched writes. """
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.core import metrics
+from app.core.incident_repository import SQLiteIncidentRepository, build_incident_row, decode_cursor, encode_cursor
+from app.schemas.classification_schema import IncidentClassification
+from app.services.incident_store_service import IncidentStoreService
+
+from tests.conftest import make_report
+
+def classification(**fields) -> dict:
+    return {
+        "language": "english", "urgency": "low", "breach": "availability",
+        "category": "Technology", "asset": "Hardware", **fields
+    }
+
+def row(day: int, hour: int = 12, **fields) -> dict:
+    incident = make_report(description=f"Incident of day {day} at {hour}").model_dump(mode="json")
+    return build_incident_row(incident, datetime(2024, 6, day, hour), classification(**fields))
+
+@pytest.fixture
+def repository(tmp_path):
+    return SQLiteIncidentRepository(str(tmp_path / "incidents.sqlite3"))
+
+def all_pages(repository, limit: int, filters=None, **kwargs) -> list:
+    incidents, cursor, pages = [], None, 0
+    while True:
+        page, cursor = repository.list(filters or {}, limit=limit, cursor=cursor, **kwargs)
+        incidents.extend(page)
+        pages += 1
+        if cursor is None:
+            return incidents
+        assert pages < 100
+
+def test_pages_cover_incidents_of_equal_datetime_once(repository):
+    # Seven incidents at the same time, between two others
+    repository.add_many([row(1)] + [row(2) for _ in range(7)] + [row(3)])
+
+    incidents = all_pages(repository, limit=2)
+
+    assert len({incident["id"] for incident in incidents}) == len(incidents) == 9
+    keys = [(incident["incident_datetime"], incident["id"]) for incident in incidents]
+    assert keys == sorted(keys, reverse=True)
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2024-06-11T14:30:00.000000", 42)
+
+    assert decode_cursor(cursor) == ("2024-06-11T14:30:00.000000", 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+
+def test_filters_and_time_range(repository):
+    repository.add_many([
+        row(1, category="Physical"), row(2, category="Physical"), row(3), row(4, category="Physical", urgency="high")
+    ])
+
+    physical = all_pages(repository, limit=1, filters={"category": "Physical"})
+    assert [incident["incident_datetime"][:10] for incident in physical] == ["2024-06-04", "2024-06-02", "2024-06-01"]
+    urgent = repository.list({"category": "Physical", "urgency": "high"})[0]
+    assert len(urgent) == 1
+    in_range = repository.list({}, since=datetime(2024, 6, 2), until=datetime(2024, 6, 4))[0]
+    assert [incident["incident_datetime"][:10] for incident in in_range] == ["2024-06-03", "2024-06-02"]
+    with pytest.raises(ValueError):
+        repository.list({"description": "fire"})
+
+def test_counts(repository):
+    repository.add_many([row(1, category="Physical"), row(1, 13), row(2), row(3, category="People")])
+
+    assert repository.count("category", {}) == [("Technology", 2), ("People", 1), ("Physical", 1)]
+    assert repository.count("day", {"category": "Technology"}) == [("2024-06-01", 1), ("2024-06-02", 1)]
+
+def test_rows_are_written_in_batches(repository, env_config, monkeypatch):
+    monkeypatch.setattr(env_config, "INCIDENT_STORE_BATCH_SIZE", 3)
+    monkeypatch.setattr(env_config, "INCIDENT_STORE_FLUSH_INTERVAL", 60)
+    written = metrics.INCIDENTS_STORED.labels("written").value
+    batches = []
+    add_many = repository.add_many
+    monkeypatch.setattr(repository, "add_many", lambda rows: batches.append(len(rows)) or add_many(rows))
+
+    async def scenario():
+        incident_store_service = IncidentStoreService(repository)
+        incident_store_service.start()
+        for index in range(4):
+            incident_store_service.record(make_report(index), IncidentClassification(**classification()))
+            if index == 2:
+                await asyncio.sleep(0.05)  # The full batch is written without waiting for the interval
+        written_before_stop = sum(batches)
+        await incident_store_service.stop()  # Writes the rest
+        return written_before_stop
+
+    assert asyncio.run(scenario()) == 3
+    assert batches == [3, 1]
+    assert metrics.INCIDENTS_STORED.labels("written").value == written + 4
+    assert len(repository.list({})[0]) == 4
+
+def test_rows_are_dropped_when_the_store_falls_behind(repository, env_config, monkeypatch):
+    monkeypatch.setattr(env_config, "INCIDENT_STORE_MAX_PENDING", 2)
+    dropped = metrics.INCIDENTS_STORED.labels("dropped").value
+    incident_store_service = IncidentStoreService(repository)
+
+    for index in range(3):
+        incident_store_service.record(make_report(index), IncidentClassification(**classification()))
+
+    assert metrics.INCIDENTS_STORED.labels("dropped").value == dropped + 1
+    asyncio.run(incident_store_service.flush())
+    assert len(repository.list({})[0]) == 2
+
+def test_store_endpoints_are_off_by_default(client):
+    assert client.get("/incidents").status_code == 404
+    assert client.get("/incidents/counts", params={"group_by": "category"}).status_code == 404
@@ -0,0 +1,202 @@
+""" Job queues, the job workers and their callbacks. """
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.core.exceptions import LLMUpstreamError
+from app.core.job_queue import InMemoryJobQueue, SQLiteJobQueue
+from app.core.retry import RetryPolicy
+from app.services.job_service import JobService, check_callback_url
+
+from tests.conftest import make_report
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_queue(request, tmp_path):
+    """ Builds job queues of both backends: make_queue(max_size, result_ttl). """
+    def make(max_size: int = 0, result_ttl: float = 60) -> object:
+        if request.param == "memory":
+            return InMemoryJobQueue(max_size, result_ttl)
+        return SQLiteJobQueue(str(tmp_path / "jobs.sqlite3"), max_size, result_ttl)
+    return make
+
+class FailingIncidentService(object):
+    """ Incident service whose LLM is unavailable. """
+
+    async def aclassify(self, incident):
+        raise LLMUpstreamError("down")
+
+async def run_job(job_service: JobService, callback_url: str = None) -> dict:
+    """ Submit a report and wait for its job to finish. """
+    job = await job_service.submit(make_report(), callback_url)
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        job = await job_service.get(job["id"])
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"Job still {job['status']}")
+
+def test_job_lifecycle(make_queue):
+    queue = make_queue()
+
+    queued = queue.put("a", {"description": "fire"}, callback_url="https://example.com/hook")
+    assert queued["status"] == "queued"
+    running = queue.claim()
+    assert running["id"] == "a" and running["status"] == "running"
+    assert queue.claim() is None
+
+    finished = queue.finish("a", result={"severity": "high"})
+    assert finished["status"] == "succeeded"
+    assert queue.get("a")["result"] == {"severity": "high"}
+    assert queue.get("a")["payload"] == {"description": "fire"}
+    assert queue.counts() == {"queued": 0, "running": 0, "succeeded": 1, "failed": 0}
+
+def test_async_methods_match_the_sync_ones(make_queue):
+    queue = make_queue()
+
+    async def lifecycle():
+        await queue.aput("a", {})
+        job = await queue.aclaim()
+        await queue.afinish(job["id"], error="failed", status_code=503)
+        return await queue.aget("a"), await queue.acounts()
+
+    job, counts = asyncio.run(lifecycle())
+    assert (job["status"], job["error"], job["status_code"]) == ("failed", "failed", 503)
+    assert counts["failed"] == 1
+
+def test_jobs_are_claimed_by_priority_then_in_order(make_queue):
+    queue = make_queue()
+    for job_id, priority in [("low", 0), ("normal-1", 1), ("critical", 3), ("normal-2", 1)]:
+        queue.put(job_id, {}, priority=priority)
+
+    assert [queue.claim()["id"] for _ in range(4)] == ["critical", "normal-1", "normal-2", "low"]
+
+def test_full_queue_rejects_jobs(make_queue):
+    queue = make_queue(max_size=1)
+    queue.put("a", {})
+
+    with pytest.raises(OverflowError):
+        queue.put("b", {})
+
+def test_finished_jobs_expire_after_the_ttl(make_queue):
+    queue = make_queue(result_ttl=0.05)
+    queue.put("a", {})
+    queue.finish(queue.claim()["id"], result={})
+    assert queue.get("a") is not None
+
+    time.sleep(0.1)
+    assert queue.get("a") is None
+
+def test_stale_running_jobs_are_queued_again(make_queue):
+    queue = make_queue()
+    queue.put("a", {})
+    queue.claim()
+
+    assert queue.requeue_stale(60) == 0
+    time.sleep(0.01)
+    assert queue.requeue_stale(0.005) == 1
+    assert queue.get("a")["status"] == "queued"
+    assert queue.claim()["id"] == "a"
+
+def test_failed_jobs_record_the_error_and_status_code():
+    async def scenario():
+        job_service = JobService(FailingIncidentService(), queue=InMemoryJobQueue(0, 60), workers=1)
+        job_service.start()
+        try:
+            return await run_job(job_service)
+        finally:
+            await job_service.stop()
+
+    job = asyncio.run(scenario())
+    assert job["status"] == "failed"
+    assert job["status_code"] == 503
+    assert job["error"] == LLMUpstreamError.detail
+
+def test_workers_survive_queue_errors():
+    class FlakyQueue(InMemoryJobQueue):
+        claims = 0
+
+        def claim(self):
+            self.claims += 1
+            if self.claims == 1:
+                raise RuntimeError("database is locked")
+            return super().claim()
+
+    async def scenario():
+        job_service = JobService(FailingIncidentService(), queue=FlakyQueue(0, 60), workers=1)
+        job_service.start()
+        try:
+            return await run_job(job_service)
+        finally:
+            await job_service.stop()
+
+    assert asyncio.run(scenario())["status"] == "failed"
+
+def test_callbacks_are_retried_on_server_errors(env_config, monkeypatch):
+    monkeypatch.setattr(env_config, "JOB_CALLBACK_ALLOWED_HOSTS", "hooks.test")
+    answers, bodies = [500, 200], []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(json.loads(request.content))
+        return httpx.Response(answers.pop(0))
+
+    async def scenario():
+        job_service = JobService(FailingIncidentService(), queue=InMemoryJobQueue(0, 60), workers=1)
+        job_service.CALLBACK_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.001, deadline=0)
+        job_service.start()
+        job_service._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            job = await run_job(job_service, "https://hooks.test/jobs")
+            while job_service._callbacks:
+                await asyncio.sleep(0.01)
+            return job
+        finally:
+            await job_service.stop()
+
+    job = asyncio.run(scenario())
+    assert answers == []
+    assert [body["job_id"] for body in bodies] == [job["id"]] * 2
+    assert bodies[-1]["status"] == "failed"
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:8000/hook",
+    "http://localhost/hook",
+    "http://10.0.0.5/hook",
+    "http://169.254.169.254/latest/meta-data",
+    "http://[::1]/hook",
+    "http://[::ffff:192.168.0.1]/hook",
+    "ftp://example.com/hook",
+])
+def test_callbacks_to_internal_addresses_are_rejected(url):
+    with pytest.raises(ValueError):
+        asyncio.run(check_callback_url(url, []))
+
+def test_callback_hosts_can_be_allowed():
+    asyncio.run(check_callback_url("http://93.184.216.34/hook", []))
+    asyncio.run(check_callback_url("http://hooks.internal/hook", ["internal"]))
+    asyncio.run(check_callback_url("http://10.0.0.5/hook", ["10.0.0.5"]))
+    with pytest.raises(ValueError):
+        asyncio.run(check_callback_url("http://example.com/hook", ["internal"]))
+
+def test_jobs_api(client):
+    report = make_report().model_dump(mode="json")
+
+    rejected = client.post("/incidents/jobs", params={"callback_url": "http://127.0.0.1/hook"}, json=report)
+    assert rejected.status_code == 422
+
+    submitted = client.post("/incidents/jobs", json=report)
+    assert submitted.status_code == 202
+    deadline = time.monotonic() + 5
+    while True:
+        job = client.get(submitted.headers["Location"]).json()
+        if job["status"] == "succeeded" or time.monotonic() > deadline:
+            break
+        time.sleep(0.01)
+    assert job["status"] == "succeeded"
+    assert job["incident_classification"]
+    assert client.get("/incidents/jobs/unknown").status_code == 404
+    assert client.get("/status/jobs").json()["succeeded"] >= 1
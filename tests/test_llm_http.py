@@ -0,0 +1,67 @@
+""" Shared LLM HTTP clients against the local stub of the OpenAI API. """
+
+import asyncio
+import time
+
+import pytest
+
+from app.core import llm_http, metrics
+
+from tests.conftest import free_port
+
+@pytest.fixture
+def clients(monkeypatch):
+    """ New shared clients and registered origins, so that each test starts with empty pools. """
+    monkeypatch.setattr(llm_http, "_clients", None)
+    monkeypatch.setattr(llm_http, "_origins", {})
+
+def connections(state: str) -> float:
+    return metrics.LLM_HTTP_CONNECTIONS.labels("async", state).value
+
+def test_warm_up_opens_connections(stub_api, clients):
+    llm_http.register_llm_origin(stub_api(), "stub")
+
+    async def warm_up_and_request():
+        warmed = await llm_http.warm_up_llm_http_clients(connections=3, timeout=5)
+        _, async_client = llm_http.get_llm_http_clients()
+        response = await async_client.get(f"{next(iter(llm_http._origins))}/models")
+        return warmed, response.status_code
+
+    assert asyncio.run(warm_up_and_request()) == (3, 200)
+    assert connections("idle") + connections("active") == 3
+    assert metrics.LLM_HTTP_REQUESTS_IN_FLIGHT.labels("async").value == 0
+
+def test_warm_up_is_given_up_after_the_timeout(stub_api, clients):
+    # Every new connection takes a second to answer
+    llm_http.register_llm_origin(stub_api(handshake=1.0), "stub")
+
+    started = time.monotonic()
+    warmed = asyncio.run(llm_http.warm_up_llm_http_clients(connections=2, timeout=0.1))
+    assert warmed == 0
+    assert time.monotonic() - started < 0.5
+    assert metrics.LLM_HTTP_REQUESTS_IN_FLIGHT.labels("async").value == 0
+
+def test_unreachable_origin_is_logged_not_raised(clients):
+    llm_http.register_llm_origin(f"http://127.0.0.1:{free_port()}/v1", "stub")
+
+    assert asyncio.run(llm_http.warm_up_llm_http_clients(connections=1, timeout=5)) == 0
+
+def test_pool_metrics_without_a_pool_are_left_unchanged():
+    metrics.LLM_HTTP_CONNECTIONS.labels("async", "idle").set(7)
+
+    # As if a version of httpx stored the pool of its transports differently
+    llm_http._update_pool_metrics("async", object())
+    assert connections("idle") == 7
+
+def test_openai_backend_requests_are_metered(stub_api, clients, monkeypatch):
+    from app.config.llm_config import OpenAIConfig
+
+    config = OpenAIConfig()
+    monkeypatch.setattr(config, "OPENAI_BASE_URL", stub_api())
+    monkeypatch.setattr(config, "OPENAI_API_KEY", "stub")
+    monkeypatch.setattr(config, "OPENAI_LLM_MODEL", "stub")
+
+    message = asyncio.run(config.llm.ainvoke("Power outage on floor 3"))
+    assert message.content == "stub"
+    assert metrics.LLM_HTTP_REQUESTS_IN_FLIGHT.labels("async").value == 0
+    assert connections("idle") == 1
@@ -0,0 +1,141 @@
+""" Failover, hedging and circuit breakers of the LLM router, over local fake backends. """
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.core.exceptions import LLMUpstreamError
+from app.core.fake_llm import FakeLLMError, FakeRateLimitError
+from app.core.llm_router import CircuitBreaker, RoutedChatModel, RouterBackend
+
+from tests.conftest import BadRequestError, fake_llm
+
+MESSAGES = [HumanMessage(content="Power outage on floor 3")]
+
+def backend(name: str, latency: float = 0.0, errors: list = (), **kwargs) -> RouterBackend:
+    return RouterBackend(name, fake_llm(latency, errors), **kwargs)
+
+def router(*backends: RouterBackend, **kwargs) -> RoutedChatModel:
+    return RoutedChatModel(backends=list(backends), seed=0, **kwargs)
+
+def by_name(model: RoutedChatModel) -> dict:
+    return {stats["name"]: stats for stats in model.stats()["backends"]}
+
+@pytest.mark.parametrize("error", [FakeLLMError("down"), FakeRateLimitError("quota")])
+def test_fails_over_on_transient_errors(error):
+    # All the weight on the failing backend, so that it is tried first
+    model = router(backend("a", errors=[error], weight=1e9), backend("b"))
+
+    asyncio.run(model.ainvoke(MESSAGES))
+
+    stats = by_name(model)
+    assert model.stats()["failovers"] == 1
+    assert stats["a"]["failures"] == 1
+    assert stats["b"]["wins"] == 1
+
+def test_client_errors_are_raised_without_failover():
+    model = router(backend("a", errors=[BadRequestError("context length exceeded")], weight=1e9), backend("b"))
+
+    with pytest.raises(BadRequestError):
+        asyncio.run(model.ainvoke(MESSAGES))
+
+    stats = by_name(model)
+    assert model.stats()["failovers"] == 0
+    assert stats["a"]["failures"] == 0
+    assert stats["a"]["state"] == CircuitBreaker.CLOSED
+    assert stats["b"]["calls"] == 0
+
+def test_sync_client_errors_are_raised_without_failover():
+    model = router(backend("a", errors=[BadRequestError("bad request")], weight=1e9), backend("b"))
+
+    with pytest.raises(BadRequestError):
+        model.invoke(MESSAGES)
+
+    assert model.stats()["failovers"] == 0
+    assert by_name(model)["b"]["calls"] == 0
+
+def test_breaker_opens_and_recovers_after_a_trial_call():
+    errors = [FakeLLMError("down")] * 2
+    model = router(backend("a", errors=errors, failure_threshold=2, reset_timeout=0.2))
+
+    for _ in range(2):
+        with pytest.raises(FakeLLMError):
+            model.invoke(MESSAGES)
+    assert by_name(model)["a"]["state"] == CircuitBreaker.OPEN
+
+    # Open: no call reaches the backend
+    with pytest.raises(LLMUpstreamError):
+        model.invoke(MESSAGES)
+    assert by_name(model)["a"]["calls"] == 2
+
+    # After reset_timeout, a successful trial call closes the breaker
+    time.sleep(0.25)
+    model.invoke(MESSAGES)
+    assert by_name(model)["a"]["state"] == CircuitBreaker.CLOSED
+
+def test_slow_backend_is_hedged():
+    slow = backend("slow", latency=1.0, weight=1e9)
+    slow.latencies.extend([0.01] * 20)
+    model = router(slow, backend("fast"), hedge_min_delay=0.01)
+
+    started = time.monotonic()
+    asyncio.run(model.ainvoke(MESSAGES))
+
+    assert time.monotonic() - started < 0.5
+    assert model.stats()["hedged"] == 1
+    assert by_name(model)["fast"]["wins"] == 1
+    assert by_name(model)["slow"]["failures"] == 0
+
+def test_sync_calls_fail_over_after_the_timeout():
+    model = router(backend("slow", latency=1.0, weight=1e9), backend("fast"), timeout=0.1)
+
+    started = time.monotonic()
+    model.invoke(MESSAGES)
+
+    assert time.monotonic() - started < 0.5
+    assert model.stats()["failovers"] == 1
+    assert by_name(model)["slow"]["failures"] == 1
+    assert by_name(model)["fast"]["wins"] == 1
+
+def test_sync_calls_waiting_for_a_thread_are_not_timed_out():
+    # One thread: the second call waits 0.2s for it, then runs within the timeout
+    model = router(backend("a", latency=0.2), timeout=0.3, max_concurrency=1)
+
+    with ThreadPoolExecutor(2) as executor:
+        list(executor.map(lambda _: model.invoke(MESSAGES), range(2)))
+
+    assert by_name(model)["a"]["failures"] == 0
+    assert by_name(model)["a"]["wins"] == 2
+
+def test_an_answer_wins_over_an_error_of_the_same_wakeup(monkeypatch):
+    finished = asyncio.Event()
+
+    async def call_backend(self, backend, messages, tools, tool_kwargs, stop):
+        if backend.name == "failing":
+            asyncio.get_running_loop().call_later(0.05, finished.set)
+        await finished.wait()
+        if backend.name == "failing":
+            raise BadRequestError("bad request")
+        return AIMessage(content="answer")
+
+    wait = asyncio.wait
+
+    async def wait_errors_first(*args, **kwargs):
+        done, pending = await wait(*args, **kwargs)
+        return sorted(done, key=lambda task: task.exception() is None), pending
+
+    monkeypatch.setattr(RoutedChatModel, "_acall_backend", call_backend)
+    monkeypatch.setattr(asyncio, "wait", wait_errors_first)
+    failing = backend("failing", weight=1e9)
+    failing.latencies.extend([0.01] * 20)
+    model = router(failing, backend("answering"), hedge_min_delay=0.01)
+
+    # Both calls finish when finished is set; the hedge's answer is returned
+    result = asyncio.run(model.ainvoke(MESSAGES))
+
+    assert result.content == "answer"
+    assert model.stats()["hedged"] == 1
+    assert by_name(model)["answering"]["wins"] == 1
@@ -0,0 +1,101 @@
+""" Tests of the LLM call scheduler: budgets, priorities and AIMD concurrency. """
+
+import asyncio
+import time
+
+import pytest
+
+from app.core.llm_scheduler import LLMScheduler, TokenBucket
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(rate_per_minute=60, capacity=2)
+    now = bucket.updated
+    bucket.take(2, now)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1) == 0.0
+    assert bucket.level == pytest.approx(1.0)
+
+def test_token_bucket_admits_oversized_takes_when_full_and_goes_into_debt():
+    bucket = TokenBucket(rate_per_minute=60, capacity=2)
+    now = bucket.updated
+    assert bucket.wait_time(5, now) == 0.0
+    bucket.take(5, now)
+    assert bucket.wait_time(1, now) == pytest.approx(4.0)
+
+def test_calls_are_admitted_by_priority_within_the_concurrency_limit():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1)
+        first = await scheduler.acquire(10)
+        waiting = [asyncio.create_task(scheduler.acquire(10, priority)) for priority in (0, 3, 1)]
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queued"] == 3
+
+        admitted = []
+        scheduler.release(first)
+        for _ in waiting:
+            done, _ = await asyncio.wait([task for task in waiting if not task.done()], return_when=asyncio.FIRST_COMPLETED)
+            ticket = done.pop().result()
+            admitted.append(ticket.priority)
+            scheduler.release(ticket)
+        return admitted
+
+    assert asyncio.run(scenario()) == [3, 1, 0]
+
+def test_request_budget_delays_calls_beyond_the_burst():
+    async def scenario():
+        # 600 requests per minute with a burst of one request: one every 0.1 s
+        scheduler = LLMScheduler(max_concurrency=10, requests_per_minute=600, burst_seconds=0.1)
+        started = time.monotonic()
+        for _ in range(3):
+            scheduler.release(await scheduler.acquire(1))
+        return time.monotonic() - started
+
+    assert 0.18 <= asyncio.run(scenario()) < 1.0
+
+def test_unused_estimated_tokens_are_given_back():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=10, tokens_per_minute=6000, burst_seconds=1)
+        ticket = await scheduler.acquire(100)
+        level = scheduler.tokens.level
+        scheduler.release(ticket, used_tokens=40)
+        return level, scheduler.tokens.level
+
+    before, after = asyncio.run(scenario())
+    assert after - before == pytest.approx(60, abs=1)
+
+def test_rate_limits_halve_the_limit_once_per_round_and_successes_grow_it():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=8, min_concurrency=2)
+        tickets = [await scheduler.acquire(1) for _ in range(4)]
+        limits = []
+        # Calls of the same round: only the first 429 halves the limit
+        for ticket in tickets[:3]:
+            scheduler.release(ticket, rate_limited=True)
+            limits.append(scheduler.limit)
+        # A success adds 1 / limit
+        scheduler.release(tickets[3])
+        limits.append(scheduler.limit)
+        # Calls of later rounds halve it again, down to min_concurrency
+        for _ in range(3):
+            scheduler.release(await scheduler.acquire(1), rate_limited=True)
+        limits.append(scheduler.limit)
+        return limits, scheduler.stats()["rate_limited"]
+
+    limits, rate_limited = asyncio.run(scenario())
+    assert limits == [4.0, 4.0, 4.0, 4.25, 2.0]
+    assert rate_limited == 6
+
+def test_cancelled_waiters_do_not_hold_a_slot():
+    async def scenario():
+        scheduler = LLMScheduler(max_concurrency=1)
+        first = await scheduler.acquire(1)
+        cancelled = asyncio.create_task(scheduler.acquire(1))
+        waiting = asyncio.create_task(scheduler.acquire(1))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        scheduler.release(first)
+        ticket = await asyncio.wait_for(waiting, 1)
+        scheduler.release(ticket)
+        return scheduler.stats()
+
+    assert asyncio.run(scenario())["in_flight"] == 0
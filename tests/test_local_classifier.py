@@ -0,0 +1,45 @@
+""" Tests of the local pre-classifier. """
+
+import pytest
+
+from app.config import config as app_config
+from app.core.environment import get_environment
+from app.services.local_classifier import KEYWORD_CONFIDENCE, LocalClassifier
+
+from tests.conftest import make_report
+
+DEFAULT_THRESHOLD = app_config[get_environment()].LOCAL_CLASSIFIER_THRESHOLD
+
+@pytest.mark.parametrize("description", [
+    "Breaking news screen in the lobby stopped working.",
+    "Several employees reported coronavirus symptoms.",
+    "A virus is spreading among the staff of the canteen.",
+    "A stolen password was used to log in to the intranet.",
+])
+def test_ambiguous_or_partial_words_do_not_match(description):
+    prediction = LocalClassifier().predict(make_report(description=description))
+    assert "category" not in prediction.values
+
+@pytest.mark.parametrize("description, category", [
+    ("A break-in at the warehouse was discovered this morning.", "Physical"),
+    ("Ransomware encrypted the file server.", "Technology"),
+    ("Innbruddet ble oppdaget i morges.", "Physical"),
+    ("Several employees received a phishing message asking for their credentials.", "People"),
+])
+def test_keyword_hits_answer_their_field(description, category):
+    prediction = LocalClassifier().predict(make_report(description=description))
+    assert prediction.confidences["category"] == KEYWORD_CONFIDENCE >= DEFAULT_THRESHOLD
+    assert prediction.confident_fields(DEFAULT_THRESHOLD)["category"] == category
+
+def test_llm_is_only_asked_for_the_fields_not_answered_locally(incident_service, llm_script):
+    steps, _ = llm_script
+    asked = []
+    steps.append(lambda args: asked.append(set(args)))
+    incident_service.LOCAL_CLASSIFIER = LocalClassifier()
+    report = make_report(description="Ransomware encrypted the file server of the accounting department.")
+
+    incident_classification = incident_service.classify(report)
+
+    assert incident_classification.category == "Technology"
+    assert asked and "category" not in asked[0]
+    assert incident_service.stats()["local_classifier"]["partial"] >= 1
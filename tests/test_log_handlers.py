@@ -0,0 +1,100 @@
+""" Queued logging, its bounded queue, the sampling filter and the writer after fork. """
+
+import logging
+import os
+import time
+
+import pytest
+
+from app.core import log_handlers, metrics
+from app.core.log_handlers import SamplingFilter, start_queue_logging, stop_queue_logging
+
+class ListHandler(logging.Handler):
+    """ Keeps the messages of the records it handles. """
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__()
+        self.delay = delay
+        self.messages = []
+
+    def emit(self, record):
+        time.sleep(self.delay)
+        self.messages.append(record.getMessage())
+
+@pytest.fixture
+def queued_logger(monkeypatch):
+    """ Builds loggers writing to a ListHandler through the queue; restores the app's logging after. """
+    monkeypatch.setattr(log_handlers, "_listener", None)
+    monkeypatch.setattr(log_handlers, "_queue_handler", None)
+
+    def make(delay: float = 0.0, max_size: int = 10000):
+        handler = ListHandler(delay)
+        logger = logging.getLogger(f"tests.log_handlers.{delay}.{max_size}")
+        logger.handlers = [handler]
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        start_queue_logging(logger, max_size)
+        return logger, handler
+
+    yield make
+    stop_queue_logging()
+
+def record(message: str = "payload") -> logging.LogRecord:
+    return logging.LogRecord("payload", logging.INFO, __file__, 0, message, None, None)
+
+def test_sampling_filter_keeps_the_sample_rate():
+    sampling_filter = SamplingFilter(sample_rate=0.25)
+
+    kept = sum(sampling_filter.filter(record()) for _ in range(4000))
+
+    assert 800 < kept < 1200
+
+def test_sampling_filter_caps_records_per_second():
+    sampling_filter = SamplingFilter(max_per_second=5)
+
+    assert sum(sampling_filter.filter(record()) for _ in range(100)) <= 10  # At most two one-second windows
+
+def test_records_are_written_by_the_background_writer(queued_logger):
+    logger, handler = queued_logger()
+
+    logger.info("first")
+    logger.info("second")
+    stop_queue_logging()
+
+    assert handler.messages == ["first", "second"]
+
+def test_full_queue_drops_and_counts_records(queued_logger):
+    logger, handler = queued_logger(delay=0.05, max_size=2)
+    dropped = metrics.LOG_RECORDS_DROPPED.labels().value
+
+    started = time.monotonic()
+    for index in range(20):
+        logger.info(f"record {index}")
+
+    assert time.monotonic() - started < 0.5  # The slow writer never blocked the logging calls
+    assert log_handlers._queue_handler.dropped > 0
+    assert metrics.LOG_RECORDS_DROPPED.labels().value == dropped + log_handlers._queue_handler.dropped
+    stop_queue_logging()
+    assert len(handler.messages) == 20 - log_handlers._queue_handler.dropped
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork is not available")
+def test_forked_child_writes_its_records(queued_logger, tmp_path):
+    logger, _ = queued_logger()
+    output = tmp_path / "child.log"
+
+    pid = os.fork()
+    if pid == 0:  # Child: its records must reach a handler, written by a new writer thread
+        status = 1
+        try:
+            handler = logging.FileHandler(output)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            log_handlers._listener.handlers = (handler,)
+            logger.info("from the child")
+            stop_queue_logging()
+            status = 0
+        finally:
+            os._exit(status)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert output.read_text() == "from the child\n"
@@ -0,0 +1,58 @@
+""" The /metrics endpoint and the counters read from the metrics. """
+
+from app.core import metrics
+from app.core.fake_llm import FakeLLMError
+
+from tests.conftest import make_report
+
+HINTS = {"language": "english", "urgency": "low", "breach": "availability", "category": "Physical", "asset": "Offices"}
+
+def samples(client) -> dict:
+    """ Samples of the /metrics exposition by series. """
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    return dict(
+        line.rsplit(" ", 1) for line in response.text.splitlines() if not line.startswith("#")
+    )
+
+def test_requests_are_timed_by_method_and_route(client):
+    client.get("/status")
+    client.get("/wp-login.php")
+    client.request("PROPFIND", "/status")
+
+    exposition = samples(client)
+    assert float(exposition['incident_http_request_duration_seconds_count{method="GET",route="/status"}']) >= 1
+    assert float(exposition['incident_http_request_duration_seconds_count{method="GET",route="unmatched"}']) >= 1
+    assert float(exposition['incident_http_request_duration_seconds_count{method="other",route="/status"}']) >= 1
+    assert not any('method="PROPFIND"' in series for series in exposition)
+
+def test_histograms_have_cumulative_buckets(client):
+    client.get("/status")
+
+    exposition = samples(client)
+    series = 'incident_http_request_duration_seconds_bucket{method="GET",route="/status",le="%s"}'
+    counts = [int(exposition[series % metrics._format_value(bound)]) for bound in metrics.LATENCY_BUCKETS + (float("inf"),)]
+    assert counts == sorted(counts)
+    assert counts[-1] == int(exposition['incident_http_request_duration_seconds_count{method="GET",route="/status"}'])
+
+def test_sync_llm_calls_are_timed_per_attempt(incident_service, llm_script):
+    steps, _ = llm_script
+    steps.append(FakeLLMError("down"))
+    attempts = metrics.LLM_CALL_SECONDS.labels().count
+
+    incident_service.classify(make_report())
+    assert metrics.LLM_CALL_SECONDS.labels().count == attempts + 2
+    assert metrics.LLM_CALLS_IN_FLIGHT.labels().value == 0
+
+def test_classification_status_is_read_from_the_metrics(client, llm_calls):
+    before = client.get("/status/classification").json()
+
+    for report in [make_report(0, classification_hints=HINTS), make_report(1, classification_hints={"language": "english"})]:
+        assert client.post("/report-incident", json=report.model_dump(mode="json")).status_code == 200
+
+    after = client.get("/status/classification").json()
+    assert after["local_classifier"]["resolved"] == before["local_classifier"]["resolved"] + 1
+    assert after["local_classifier"]["partial"] == before["local_classifier"]["partial"] + 1
+    assert after["local_classifier"]["deferred"] == before["local_classifier"]["deferred"] + 1
+    assert after["tokens"]["input"] > before["tokens"]["input"]
+    assert len(llm_calls) == 1
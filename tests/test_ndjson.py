@@ -0,0 +1,90 @@
+""" NDJSON parsing and the streaming classification endpoint. """
+
+import asyncio
+import json
+
+from app.utils.ndjson_utils import NDJSON_MEDIA_TYPE, NDJSONStreamingResponse, iter_ndjson_lines
+
+from tests.conftest import make_report
+
+def split_lines(chunks, max_line_bytes=100) -> list:
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [line async for line in iter_ndjson_lines(stream(), max_line_bytes)]
+    return asyncio.run(collect())
+
+def test_lines_are_split_across_chunks():
+    chunks = [b'{"a": 1}\n{"b"', b": 2}\n\n  \n", b'{"c": 3}\r\n{"d"', b": 4}"]
+
+    assert split_lines(chunks) == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}\r', b'{"d": 4}']
+
+def test_over_long_lines_are_skipped():
+    long_line = b"x" * 25
+
+    # In one chunk, over several chunks, and unterminated at the end of the stream
+    assert split_lines([long_line + b"\nok\n"], 10) == [None, b"ok"]
+    assert split_lines([long_line[:8], long_line[8:16], long_line[16:] + b"\nok\n"], 10) == [None, b"ok"]
+    assert split_lines([b"ok\n", long_line], 10) == [b"ok", None]
+
+def test_many_lines_in_one_chunk():
+    lines = [json.dumps({"index": index}).encode() for index in range(10000)]
+
+    assert split_lines([b"\n".join(lines)]) == lines
+
+def test_stream_endpoint_classifies_every_line(client):
+    lines = [make_report(index).model_dump_json() for index in range(3)] + ['{"location": "Oslo"}']
+
+    response = client.post(
+        "/report-incidents/stream",
+        content="\n".join(lines) + "\n",
+        headers={"Content-Type": NDJSON_MEDIA_TYPE}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(NDJSON_MEDIA_TYPE)
+    results = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda result: result["index"])
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert all(result["incident_classification"] for result in results[:3])
+    assert results[3]["incident_classification"] is None
+    assert "Invalid incident report" in results[3]["error"]
+
+def test_stream_endpoint_rejects_other_content_types(client):
+    response = client.post("/report-incidents/stream", json=make_report().model_dump(mode="json"))
+
+    assert response.status_code == 415
+
+def test_disconnect_cancels_the_response():
+    received, cancelled = [], asyncio.Event()
+
+    async def content(body):
+        async for chunk in body:
+            received.append(chunk)
+        try:
+            await asyncio.sleep(60)  # A classification still running
+            yield "never\n"
+        finally:
+            cancelled.set()
+
+    async def scenario():
+        messages = [
+            {"type": "http.request", "body": b"first\n", "more_body": True},
+            {"type": "http.request", "body": b"second\n", "more_body": False},
+        ]
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.sleep(0.05)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            pass
+
+        await asyncio.wait_for(NDJSONStreamingResponse(content)({"type": "http"}, receive, send), 5)
+        return cancelled.is_set()
+
+    assert asyncio.run(scenario())
+    assert received == [b"first\n", b"second\n"]
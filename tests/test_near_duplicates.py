@@ -0,0 +1,92 @@
+""" Near-duplicate index of recent reports and its use by IncidentService. """
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from app.services.incident_service import IncidentService
+from app.utils.near_duplicate_index import NearDuplicateIndex
+
+from tests.conftest import make_report
+
+REPORT = "Power outage on floor 3 affected the entire office for about an hour this afternoon."
+REWORDED = "Power outage on floor 3 affected the whole office for about one hour this afternoon."
+UNRELATED = "A laptop was stolen from the reception desk overnight."
+
+def test_reworded_texts_are_found_and_unrelated_ones_are_not():
+    index = NearDuplicateIndex(threshold=0.5)
+    index.add("outage", REPORT, {"category": "Technology"})
+
+    same = index.query(REPORT.upper() + "  ")
+    assert same.key == "outage" and same.similarity == 1.0
+    reworded = index.query(REWORDED)
+    assert reworded.key == "outage" and reworded.value == {"category": "Technology"}
+    assert 0.5 <= reworded.similarity < 1.0
+    assert index.query(UNRELATED) is None
+    assert index.stats() == {"hits": 2, "misses": 1, "size": 1}
+
+def test_texts_below_the_threshold_are_not_near_duplicates():
+    similarity = NearDuplicateIndex(threshold=0.0)
+    similarity.add("outage", REPORT, None)
+    estimate = similarity.query(REWORDED).similarity
+
+    index = NearDuplicateIndex(threshold=estimate + 0.01)
+    index.add("outage", REPORT, None)
+    assert index.query(REWORDED) is None
+    assert index.query(REPORT) is not None
+
+def test_the_most_similar_text_wins():
+    index = NearDuplicateIndex(threshold=0.5)
+    index.add("reworded", REWORDED, None)
+    index.add("same", REPORT, None)
+
+    assert index.query(REPORT).key == "same"
+
+def test_old_texts_and_texts_beyond_the_capacity_are_forgotten():
+    index = NearDuplicateIndex(window_seconds=0.05)
+    index.add("outage", REPORT, None)
+    time.sleep(0.1)
+    assert index.query(REPORT) is None
+    assert len(index) == 0
+
+    index = NearDuplicateIndex(max_entries=1)
+    index.add("outage", REPORT, None)
+    index.add("theft", UNRELATED, None)
+    assert index.query(REPORT) is None
+    assert index.query(UNRELATED).key == "theft"
+
+def test_near_duplicate_reports_reuse_the_classification(env_config, monkeypatch, llm_calls):
+    monkeypatch.setattr(env_config, "NEAR_DUPLICATE_ENABLED", True)
+    monkeypatch.setattr(env_config, "NEAR_DUPLICATE_THRESHOLD", 0.5)
+    incident_service = IncidentService()
+
+    async def classify_both():
+        return [
+            await incident_service.aclassify(make_report(description=description))
+            for description in (REPORT, REWORDED)
+        ]
+
+    first, second = asyncio.run(classify_both())
+    assert len(llm_calls) == 1
+    assert second == first
+    assert incident_service.stats()["near_duplicates"]["hits"] == 1
+
+def test_near_duplicates_are_disabled_by_default(incident_service, llm_calls):
+    # Without the variable the tests set, the configuration leaves the index off
+    environ = {name: value for name, value in os.environ.items() if name != "APP_NEAR_DUPLICATE_ENABLED"}
+    enabled = subprocess.run(
+        [sys.executable, "-c", "from app.config import config; print(config['development'].NEAR_DUPLICATE_ENABLED)"],
+        env=environ, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    assert enabled == "False"
+    assert incident_service.CLASSIFICATION_CACHE.NEAR_DUPLICATE_INDEX is None
+
+    async def classify_both():
+        for description in (REPORT, REWORDED):
+            await incident_service.aclassify(make_report(description=description))
+
+    asyncio.run(classify_both())
+    assert len(llm_calls) == 2
+    assert incident_service.stats()["near_duplicates"] is None
@@ -0,0 +1,60 @@
+""" Classification of only the fields that are not known yet, merged with the known ones. """
+
+import asyncio
+
+from app.schemas.classification_schema import (
+    CLASSIFICATION_FIELDS,
+    IncidentClassification,
+    get_partial_classification_schema,
+)
+
+from tests.conftest import make_report
+
+HINTS = {"language": "norwegian", "category": "People"}
+
+def test_partial_schemas_keep_the_name_and_only_the_requested_fields():
+    schema = get_partial_classification_schema(("urgency", "asset"))
+
+    assert schema.__name__ == "IncidentClassification"
+    assert list(schema.__fields__) == ["urgency", "asset"]
+    assert schema.__fields__["asset"].field_info.extra == IncidentClassification.__fields__["asset"].field_info.extra
+    assert get_partial_classification_schema(CLASSIFICATION_FIELDS) is IncidentClassification
+
+def test_the_llm_is_asked_only_for_the_unknown_fields(incident_service, llm_script):
+    steps, _ = llm_script
+    asked = []
+    steps.append(lambda args: asked.append(set(args)))
+
+    classification = asyncio.run(incident_service.aclassify(make_report(classification_hints=HINTS)))
+
+    assert asked == [set(CLASSIFICATION_FIELDS) - set(HINTS)]
+    assert classification.language == "norwegian" and classification.category == "People"
+    assert all(getattr(classification, field_name) for field_name in CLASSIFICATION_FIELDS)
+
+def test_known_fields_win_over_the_llm_answer(incident_service):
+    answer = {"urgency": "high", "breach": "integrity", "asset": "Services", "language": "english"}
+
+    classification = incident_service._parse_classification(answer, HINTS)
+
+    assert classification == IncidentClassification(**{**answer, **HINTS})
+
+def test_fully_known_reports_are_not_sent_to_the_llm(incident_service, llm_calls):
+    hints = {"language": "english", "urgency": "high", "breach": "availability",
+             "category": "Physical", "asset": "Services"}
+
+    classification = asyncio.run(incident_service.aclassify(make_report(classification_hints=hints)))
+
+    assert classification == IncidentClassification(**hints)
+    assert llm_calls == []
+
+def test_batches_mix_field_combinations(incident_service, llm_script):
+    steps, _ = llm_script
+    asked = []
+    steps.extend([lambda args: asked.append(set(args))] * 2)
+    incidents = [make_report(0), make_report(1, classification_hints=HINTS)]
+
+    results = incident_service.batch_classify(incidents)
+
+    assert sorted(map(len, asked)) == [3, 5]
+    assert results[1].incident_classification.category == "People"
+    assert all(result.incident_classification for result in results)
@@ -0,0 +1,71 @@
+""" Fitting of prompts in a token budget: examples dropped first, then the description cut. """
+
+import asyncio
+
+from app.utils.prompt_budget import TRUNCATION_MARKER, PromptBudget, PromptPlan, truncate_middle
+from app.utils.token_utils import TokenCounter
+
+from tests.conftest import make_report
+
+# Without a tokenizer, a token is four characters
+DESCRIPTION = " ".join(f"word{index:03d}" for index in range(100))  # 799 characters, 200 tokens
+
+def test_everything_fits_an_unlimited_budget():
+    plan = PromptBudget(0, TokenCounter()).fit(100, [30, 20, 10], 50, DESCRIPTION)
+
+    assert plan == PromptPlan(examples=3, description=None, tokens=210)
+
+def test_least_similar_examples_are_dropped_first():
+    budget = PromptBudget(175, TokenCounter())
+
+    # 210 tokens: without the first (least similar) example 180, without the second 160
+    assert budget.fit(100, [30, 20, 10], 50, DESCRIPTION) == PromptPlan(1, None, 160)
+    assert budget.fit(100, [30, 20, 10], 50, DESCRIPTION).tokens <= budget.max_tokens
+    assert PromptBudget(210, TokenCounter()).fit(100, [30, 20, 10], 50, DESCRIPTION) == PromptPlan(3, None, 210)
+
+def test_the_description_is_cut_once_every_example_is_dropped():
+    counter = TokenCounter()
+    report_tokens = 10 + counter.count(DESCRIPTION)
+
+    plan = PromptBudget(200, counter).fit(100, [30, 20], report_tokens, DESCRIPTION)
+
+    assert plan.examples == 0
+    assert plan.description.startswith("word000") and plan.description.endswith("word099")
+    assert TRUNCATION_MARKER in plan.description
+    assert plan.tokens == 110 + counter.count(plan.description) <= 200
+
+def test_calibrated_counts_shrink_the_budget():
+    counter = TokenCounter()
+    counter.ratio = 2.0
+
+    # 175 tokens are 87 raw tokens, and each raw token counts twice
+    assert PromptBudget(175, counter).fit(40, [30, 20, 10], 30, DESCRIPTION) == PromptPlan(1, None, 160)
+
+def test_truncate_middle():
+    counter = TokenCounter()
+
+    assert truncate_middle(DESCRIPTION, 200, counter) == DESCRIPTION
+    truncated = truncate_middle(DESCRIPTION, 50, counter)
+    head, tail = truncated.split(TRUNCATION_MARKER)
+    assert DESCRIPTION.startswith(head) and DESCRIPTION.endswith(tail)
+    assert 45 <= counter.count(truncated) <= 50
+    assert truncate_middle(DESCRIPTION, 1, counter) == ""
+
+def test_service_prompts_drop_examples_then_cut_the_description(incident_service, llm_calls):
+    counter = incident_service.TOKEN_COUNTER
+    report = make_report(description=DESCRIPTION)
+    full = incident_service._build_chain_input(report, {})
+
+    incident_service.PROMPT_BUDGET = PromptBudget(full["tokens"] - 1, counter)
+    shrunk = incident_service._build_chain_input(report, {})
+    # The least similar example (its messages come first) is dropped, the report is untouched
+    per_example = len(full["examples"]) // incident_service.FEW_SHOT_EXAMPLES_K
+    assert shrunk["examples"] == full["examples"][per_example:]
+    assert shrunk["input"] == full["input"]
+
+    without_examples = full["tokens"] - counter.scale(counter.count_messages(full["examples"]))
+    incident_service.PROMPT_BUDGET = PromptBudget(without_examples - 50, counter)
+    asyncio.run(incident_service.aclassify(report))
+    assert len(llm_calls) == 1
+    assert TRUNCATION_MARKER in llm_calls[0]
+    assert "word000" in llm_calls[0] and "word099" in llm_calls[0]
@@ -0,0 +1,68 @@
+""" Rendering of incident reports in prompts: field projection and formats. """
+
+import json
+
+import pytest
+
+from app.schemas.incident_schema import WitnessDetail
+from app.utils.prompt_serializer import PromptSerializer, parse_field_projection
+
+from tests.conftest import make_report
+
+REPORT = make_report(
+    description="Smoke in the server room",
+    witnesses=[WitnessDetail(name="Kari", contact="kari@example.com"), WitnessDetail(name="Ola", contact="555")],
+    classification_hints={"language": "english"}
+)
+
+def test_field_paths_become_a_pydantic_include():
+    assert parse_field_projection("*") is None
+    assert parse_field_projection(" , ") is None
+    assert parse_field_projection(["location", "*"]) is None
+    assert parse_field_projection("location, witnesses.name") == {
+        "location": True, "witnesses": {"__all__": {"name": True}}
+    }
+    # A whole field wins over paths into it
+    assert parse_field_projection("witnesses,witnesses.name") == {"witnesses": True}
+
+def test_json_is_compact_and_projected():
+    serializer = PromptSerializer("location,description,witnesses.name", exclude=["classification_hints"])
+
+    text = serializer.serialize(REPORT)
+
+    assert text == json.dumps({
+        "location": REPORT.location,
+        "description": REPORT.description,
+        "witnesses": [{"name": "Kari"}, {"name": "Ola"}],
+    }, separators=(",", ":"))
+    assert "kari@example.com" not in text
+
+def test_text_has_one_line_per_field():
+    serializer = PromptSerializer("incident_datetime,description,witnesses.name", format="text")
+
+    assert serializer.serialize(REPORT).splitlines() == [
+        "incident_datetime: 2024-06-11T14:30:00",
+        "description: Smoke in the server room",
+        'witnesses: [{"name":"Kari"},{"name":"Ola"}]',
+    ]
+
+def test_none_and_excluded_fields_are_left_out():
+    serializer = PromptSerializer(exclude=["classification_hints", "location"])
+
+    fields = serializer.dump(make_report())
+
+    assert set(fields) == {"incident_datetime", "description"}
+
+def test_fingerprint_changes_with_the_rendering():
+    fingerprints = [
+        PromptSerializer().fingerprint(),
+        PromptSerializer(format="text").fingerprint(),
+        PromptSerializer("description").fingerprint(),
+        PromptSerializer(exclude=["location"]).fingerprint(),
+    ]
+
+    assert len({json.dumps(fingerprint, sort_keys=True) for fingerprint in fingerprints}) == len(fingerprints)
+
+def test_unknown_formats_are_rejected():
+    with pytest.raises(ValueError):
+        PromptSerializer(format="yaml")
@@ -0,0 +1,103 @@
+""" Retries of failed LLM calls and repair of answers that do not match the schema. """
+
+import asyncio
+
+import pytest
+from fastapi.exceptions import HTTPException
+
+from app.core import metrics
+from app.core.fake_llm import FakeLLMError, FakeRateLimitError
+from app.core.retry import RetryPolicy, is_transient_error
+from app.services.llm_invoker import LLMInvoker
+
+from tests.conftest import BadRequestError, make_report
+
+def set_category(value):
+    def edit(args):
+        args["category"] = value
+    return edit
+
+def test_retry_policy_backoff_and_deadline():
+    policy = RetryPolicy(base_delay=0.5, max_delay=1.0, deadline=10, seed=0)
+    assert all(0 <= policy.backoff(1) <= 0.5 for _ in range(100))
+    assert all(0 <= policy.backoff(5) <= 1.0 for _ in range(100))
+
+    deadline_at = policy.start()
+    assert policy.allows(deadline_at, 1.0)
+    assert not policy.allows(deadline_at, 11.0)
+    assert RetryPolicy(deadline=0).start() is None
+
+def test_transient_errors():
+    assert is_transient_error(FakeLLMError("server error"))
+    assert is_transient_error(FakeRateLimitError("quota"))
+    assert is_transient_error(asyncio.TimeoutError())
+    assert not is_transient_error(BadRequestError("bad request"))
+    assert not is_transient_error(ValueError("invalid output"))
+
+def test_transient_errors_are_retried(incident_service, llm_script):
+    steps, prompts = llm_script
+    steps.extend([FakeLLMError("server error"), FakeLLMError("server error")])
+    retries = metrics.LLM_RETRIES.labels().value
+
+    asyncio.run(incident_service.aclassify(make_report()))
+    assert len(prompts) == 3
+    assert metrics.LLM_RETRIES.labels().value == retries + 2
+
+    steps.extend([FakeLLMError("server error")])
+    incident_service.classify(make_report(1))
+    assert len(prompts) == 5
+
+def test_retries_stop_after_max_attempts(incident_service, llm_script):
+    steps, prompts = llm_script
+    steps.extend([FakeLLMError("server error")] * 5)
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(incident_service.aclassify(make_report()))
+    assert excinfo.value.status_code == 503
+    assert len(prompts) == 3
+
+def test_client_errors_are_not_retried(incident_service, llm_script):
+    steps, prompts = llm_script
+    steps.append(BadRequestError("context length exceeded"))
+
+    with pytest.raises(HTTPException):
+        asyncio.run(incident_service.aclassify(make_report()))
+    assert len(prompts) == 1
+
+def test_rate_limited_calls_are_queued_again(incident_service, llm_script):
+    steps, prompts = llm_script
+    steps.append(FakeRateLimitError("quota"))
+
+    asyncio.run(incident_service.aclassify(make_report()))
+    assert len(prompts) == 2
+    assert LLMInvoker.get_scheduler().rate_limited == 1
+
+def test_misspelled_values_are_snapped_without_llm_call(incident_service, llm_script):
+    steps, prompts = llm_script
+    steps.append(set_category("technolgy"))
+
+    classification = asyncio.run(incident_service.aclassify(make_report()))
+    assert classification.category == "Technology"
+    assert len(prompts) == 1
+
+def test_invalid_fields_are_asked_again(incident_service, llm_script):
+    steps, prompts = llm_script
+    steps.append(set_category("unknown"))
+    prompted = metrics.LLM_REPAIRS_PROMPTED.value
+
+    classification = asyncio.run(incident_service.aclassify(make_report()))
+    assert len(prompts) == 2
+    assert "previous answer, invalid for category" in prompts[1]
+    assert classification.category in ("Organisational", "People", "Physical", "Technology")
+    assert metrics.LLM_REPAIRS_PROMPTED.value == prompted + 1
+
+def test_failed_repair_is_an_invalid_output(incident_service, llm_script):
+    steps, prompts = llm_script
+    steps.extend([set_category("unknown"), set_category("unknown")])
+    failed = metrics.LLM_REPAIRS_FAILED.value
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(incident_service.aclassify(make_report()))
+    assert excinfo.value.status_code == 422
+    assert len(prompts) == 2
+    assert metrics.LLM_REPAIRS_FAILED.value == failed + 1
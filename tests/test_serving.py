@@ -0,0 +1,36 @@
+""" Several worker processes: shares of the LLM rate limits and worker labels of the metrics. """
+
+import gc
+import os
+
+from app.core import metrics, serving
+from app.services.llm_invoker import LLMInvoker
+
+def test_production_server_passes_on_the_worker_count(env_config, monkeypatch):
+    monkeypatch.setattr(env_config, "SERVER_WORKERS", 4)
+    monkeypatch.setattr(serving.ProductionServer, "run", lambda self: None)
+    monkeypatch.setattr(gc, "freeze", lambda: None)
+    monkeypatch.delenv("APP_SERVER_WORKER_PROCESSES", raising=False)
+
+    serving.run_production_server(object())
+    assert os.environ["APP_SERVER_WORKER_PROCESSES"] == "4"
+
+def test_workers_share_the_rate_limits(env_config, monkeypatch):
+    monkeypatch.setattr(env_config, "LLM_REQUESTS_PER_MINUTE", 600)
+    monkeypatch.setattr(env_config, "LLM_TOKENS_PER_MINUTE", 100000)
+    monkeypatch.setenv("APP_SERVER_WORKER_PROCESSES", "4")
+
+    scheduler = LLMInvoker.get_scheduler()
+    assert scheduler.requests.rate * 60 == 150
+    assert scheduler.tokens.rate * 60 == 25000
+
+def test_metrics_have_a_worker_label_with_several_workers(monkeypatch):
+    monkeypatch.delenv("APP_SERVER_WORKER_PROCESSES", raising=False)
+    assert "worker=" not in metrics.render_metrics()
+
+    monkeypatch.setenv("APP_SERVER_WORKER_PROCESSES", "2")
+    rendered = metrics.render_metrics()
+    worker = f'worker="{os.getpid()}"'
+    assert f"incident_llm_retries_total{{{worker}}}" in rendered
+    assert f'incident_llm_tokens_total{{direction="input",{worker}}}' in rendered
+    assert f'incident_llm_call_duration_seconds_bucket{{{worker},le="+Inf"}}' in rendered
@@ -0,0 +1,41 @@
+""" Cold start budgets: import time of the server and time to the first /status. """
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_startup import (
+    IMPORT_BUDGET_MS, READY_BUDGET_MS, build_env, profile_imports, time_to_status
+)
+
+RUNS = 3
+
+@pytest.fixture(scope="module")
+def env(tmp_path_factory):
+    """ Environment of a production-like server: the openai backend, with a dummy key. """
+    return build_env("openai", str(tmp_path_factory.mktemp("startup")))
+
+def test_import_time_within_budget(env):
+    profiles = [profile_imports(env) for _ in range(RUNS)]
+    assert statistics.median(total_ms for total_ms, _ in profiles) <= IMPORT_BUDGET_MS
+
+    # The LLM clients are only built in the lifespan, after the import
+    imported = {name for name, _, _ in profiles[0][1]}
+    assert "langchain_openai" not in imported
+    assert "openai" not in imported
+
+def test_time_to_first_status_within_budget(env):
+    assert statistics.median(time_to_status(env) for _ in range(RUNS)) <= READY_BUDGET_MS
+
+def test_router_of_fake_backends_does_not_import_openai():
+    env = dict(os.environ)
+    env["APP_LLM_BACKEND"] = "router"
+    env["APP_LLM_ROUTER_BACKENDS"] = json.dumps([{"provider": "fake"}, {"provider": "fake"}])
+    code = "import sys; from app.core.llm_session import get_llm; get_llm(); print('langchain_openai' in sys.modules)"
+
+    completed = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert completed.stdout.strip() == "False"